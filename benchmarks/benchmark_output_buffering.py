@@ -0,0 +1,70 @@
+"""Compare printing speed in processes with line and block buffered outputs
+
+Run: python benchmarks/benchmark_output_buffering.py [number of lines]
+"""
+from __future__ import print_function
+# Standard library imports
+import sys
+import time
+import tempfile
+
+# Third party imports
+import psutil
+
+# Local imports
+from jupyter_process_manager import JupyterProcessesManager
+
+INT_LINES_TO_PRINT = 200000
+
+
+def print_lines(int_lines):
+    """Print lines and get (seconds spent, number of write syscalls)"""
+    process_obj = psutil.Process()
+    int_writes_before = _get_write_syscalls(process_obj)
+    float_start = time.perf_counter()
+    for int_line in range(int_lines):
+        print("Line number", int_line, "of the benchmark output")
+    sys.stdout.flush()
+    float_seconds = time.perf_counter() - float_start
+    int_writes_after = _get_write_syscalls(process_obj)
+    if int_writes_before is None or int_writes_after is None:
+        return float_seconds, None
+    return float_seconds, int_writes_after - int_writes_before
+
+
+def _get_write_syscalls(process_obj):
+    """Get number of write syscalls of the process (None if unknown)"""
+    try:
+        return process_obj.io_counters().write_count
+    except (AttributeError, psutil.Error):
+        return None
+
+
+def main():
+    """"""
+    int_lines = int(sys.argv[1]) if len(sys.argv) > 1 else INT_LINES_TO_PRINT
+    list_modes = [
+        ("line buffering", None),
+        ("64 KB buffer", 64 * 1024),
+        ("1 MB buffer", 1024 * 1024),
+    ]
+    dict_results = {}
+    for str_mode, int_buffer_bytes in list_modes:
+        process_manager = JupyterProcessesManager(
+            tempfile.mkdtemp(),
+            int_output_buffer_bytes=int_buffer_bytes,
+            seconds_between_samples=None,
+        )
+        process_obj = process_manager.add_function_to_processing(
+            print_lines, int_lines)
+        dict_results[str_mode] = process_obj.result()
+    print()
+    print("Printed %d lines in a process" % int_lines)
+    for str_mode, (float_seconds, int_writes) in dict_results.items():
+        print("%-15s %8.3f sec %12.0f lines/sec %10s write syscalls" % (
+            str_mode, float_seconds, int_lines / float_seconds,
+            "?" if int_writes is None else int_writes))
+
+
+if __name__ == "__main__":
+    main()
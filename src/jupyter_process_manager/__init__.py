@@ -1,11 +1,17 @@
 """Entry point for jupyter_process_manager package"""
 # Standard library imports
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ALL_COMPLETED
 
 # Third party imports
 
 # Local imports
 from jupyter_process_manager.class_processes_manager import \
     JupyterProcessesManager
+from jupyter_process_manager.class_one_process import ProcessFailedError
+from jupyter_process_manager.function_wrapper import ChunkItemError
+from jupyter_process_manager.class_processes_executor import \
+    JupyterProcessesExecutor
 from . import logger
 from .function_wrapper import clear_output
 from .function_wrapper import read_stdout
@@ -19,6 +25,8 @@ JPM = JupyterProcessesManager
 
 __all__ = [
     "JupyterProcessesManager", "JupyterProcessManager", "JPM",
+    "JupyterProcessesExecutor", "ProcessFailedError", "ChunkItemError",
+    "FIRST_COMPLETED", "ALL_COMPLETED",
     "clear_output", "read_stdout",
     "check_if_output_redirected", "redirect_outputs_for_main",
 ]
@@ -0,0 +1,82 @@
+"""Module with class to wait for events on many connections at once"""
+from __future__ import print_function
+# Standard library imports
+from typing import Any, Callable
+import logging
+import threading
+from multiprocessing import Pipe
+from multiprocessing.connection import wait
+
+# Third party imports
+
+# Local imports
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ConnectionsWatcher(object):
+    """Class with one thread which is blocked on all registered handles
+
+    Handles are anything multiprocessing.connection.wait() accepts:
+    Connection objects and process sentinels.
+    When a handle becomes ready its callback is called from the thread
+    with the handle as the only argument.
+    A callback is called every time the handle is ready,
+    so it should read the data or unregister the handle.
+    The thread doesn't wake up while there are no events.
+    """
+
+    def __init__(self) -> None:
+        """Initialize object"""
+        self._dict_callback_by_handle = {}
+        self._lock = threading.Lock()
+        self._conn_wakeup_reader, self._conn_wakeup_writer = Pipe(duplex=False)
+        self._thread = None
+
+    def register(self, handle : Any, callback : Callable) -> None:
+        """Start calling callback every time the handle is ready"""
+        with self._lock:
+            self._dict_callback_by_handle[handle] = callback
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._wait_for_events, daemon=True)
+                self._thread.start()
+        self._wake_up()
+
+    def unregister(self, handle : Any) -> None:
+        """Stop watching the handle"""
+        with self._lock:
+            self._dict_callback_by_handle.pop(handle, None)
+        self._wake_up()
+
+    def _wake_up(self) -> None:
+        """Make the thread re-read the list of handles to wait on"""
+        if threading.current_thread() is self._thread:
+            return None
+        self._conn_wakeup_writer.send_bytes(b"")
+        return None
+
+    def _wait_for_events(self) -> None:
+        """Wait for events on all handles and run callbacks for them"""
+        while True:
+            with self._lock:
+                list_handles = list(self._dict_callback_by_handle)
+            list_handles.append(self._conn_wakeup_reader)
+            try:
+                list_ready = wait(list_handles)
+            except (OSError, ValueError):
+                # Handle was closed right after it was unregistered
+                continue
+            for handle in list_ready:
+                if handle is self._conn_wakeup_reader:
+                    while self._conn_wakeup_reader.poll():
+                        self._conn_wakeup_reader.recv_bytes()
+                    continue
+                with self._lock:
+                    callback = self._dict_callback_by_handle.get(handle)
+                if callback is None:
+                    continue
+                try:
+                    callback(handle)
+                except Exception:
+                    LOGGER.exception("Error in the callback for %s", handle)
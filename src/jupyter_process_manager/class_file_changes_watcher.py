@@ -0,0 +1,218 @@
+"""Module with class to find out which files in a folder were changed"""
+from __future__ import print_function
+# Standard library imports
+from typing import Optional, Iterable
+import ctypes
+import ctypes.util
+import os
+import struct
+import logging
+import threading
+
+# Third party imports
+
+# Local imports
+
+LOGGER = logging.getLogger(__name__)
+
+# Constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+# Writes are watched only for chosen files, the folder is watched only
+# for new files (E.G. after rotation), so writes of other files cost nothing
+INT_FILE_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE
+INT_DIR_WATCH_MASK = IN_MOVED_TO | IN_CREATE
+STRUCT_EVENT = struct.Struct("iIII")
+INT_BYTES_TO_READ = 64 * 1024
+
+
+class FileChangesWatcher(object):
+    """Class to check cheaply if files of the folder were changed
+
+    On Linux files chosen with watch_files() are watched with inotify,
+    so checking a file which wasn't changed doesn't touch the disk at all
+    and writes to other files of the folder don't wake up the watcher.
+    The folder itself is watched only for new files, so a watched file
+    which was replaced (E.G. rotated) is watched again.
+    On other systems (or if inotify is unavailable) and for files
+    which are not watched size and mtime of the file are compared
+    with the ones seen at the previous check.
+    """
+
+    def __init__(self, str_dir_path : str) -> None:
+        """Initialize object
+
+        Args:
+            str_dir_path (str): Folder which files to watch
+        """
+        self.str_dir_path = os.path.abspath(str_dir_path)
+        self._set_changed_names = set()
+        # Names seen before the last queue overflow of inotify
+        self._dict_overflow_num_by_name = {}
+        self._int_overflows = 0
+        self._dict_last_stat_by_path = {}
+        # Names of files to watch and their names by inotify watch descriptors
+        self._set_watched_names = set()
+        self._dict_name_by_wd = {}
+        self._lock = threading.Lock()
+        self._libc = None
+        self.int_fd = None
+        self._int_dir_wd = None
+        self._start_inotify()
+
+    def fileno(self) -> Optional[int]:
+        """Get inotify file descriptor to wait on (None if not used)"""
+        return self.int_fd
+
+    def watch_files(self, iter_file_paths : Iterable[str]) -> None:
+        """Watch writes only to given files of the folder (instead of others)
+
+        Newly watched files are considered as changed on the next check.
+        """
+        if self.int_fd is None:
+            return None
+        set_names = {
+            os.path.basename(str_file_path) for str_file_path in iter_file_paths}
+        with self._lock:
+            if set_names == self._set_watched_names:
+                return None
+            for int_wd in self._dict_name_by_wd:
+                self._libc.inotify_rm_watch(self.int_fd, int_wd)
+            self._dict_name_by_wd = {}
+            self._set_watched_names = set_names
+            for str_name in set_names:
+                self._add_file_watch(str_name)
+                self._set_changed_names.add(str_name)
+        return None
+
+    def is_changed(self, str_file_path : str) -> bool:
+        """Check if the file was changed since the previous check of it
+
+        The first check of the file always says that it was changed.
+        """
+        str_name = os.path.basename(str_file_path)
+        if self.int_fd is None or str_name not in self._set_watched_names:
+            return self._is_stat_changed(str_file_path)
+        self.read_events()
+        with self._lock:
+            int_overflow_num = self._dict_overflow_num_by_name.get(str_name)
+            self._dict_overflow_num_by_name[str_name] = self._int_overflows
+            if str_name in self._set_changed_names:
+                self._set_changed_names.discard(str_name)
+                return True
+            return int_overflow_num != self._int_overflows
+
+    def read_events(self) -> bool:
+        """Read all new inotify events without blocking
+
+        Returns:
+            bool: Flag if there were any new events
+        """
+        if self.int_fd is None:
+            return False
+        is_any_event = False
+        while True:
+            try:
+                bytes_events = os.read(self.int_fd, INT_BYTES_TO_READ)
+            except BlockingIOError:
+                break
+            except OSError:
+                LOGGER.exception("Unable to read inotify events")
+                break
+            if not bytes_events:
+                break
+            is_any_event = True
+            self._parse_events(bytes_events)
+        return is_any_event
+
+    def close(self) -> None:
+        """Stop watching the folder"""
+        if self.int_fd is not None:
+            os.close(self.int_fd)
+            self.int_fd = None
+            self._dict_name_by_wd = {}
+            self._set_watched_names = set()
+
+    def _parse_events(self, bytes_events : bytes) -> None:
+        """Save names of changed files from the inotify events"""
+        int_pos = 0
+        with self._lock:
+            while int_pos + STRUCT_EVENT.size <= len(bytes_events):
+                int_wd, int_mask, _, int_name_len = STRUCT_EVENT.unpack_from(
+                    bytes_events, int_pos)
+                int_pos += STRUCT_EVENT.size
+                bytes_name = bytes_events[int_pos:int_pos + int_name_len]
+                int_pos += int_name_len
+                if int_mask & IN_Q_OVERFLOW:
+                    # Events were lost, consider all files as changed
+                    self._int_overflows += 1
+                    continue
+                if int_mask & IN_IGNORED:
+                    # Watch was removed (or the watched file was deleted)
+                    self._dict_name_by_wd.pop(int_wd, None)
+                    continue
+                if int_wd != self._int_dir_wd:
+                    str_name = self._dict_name_by_wd.get(int_wd)
+                    if str_name is not None:
+                        self._set_changed_names.add(str_name)
+                    continue
+                str_name = os.fsdecode(bytes_name.rstrip(b"\0"))
+                if str_name in self._set_watched_names:
+                    # Watched file was created or replaced, watch the new one
+                    self._add_file_watch(str_name)
+                    self._set_changed_names.add(str_name)
+
+    def _add_file_watch(self, str_name : str) -> None:
+        """Start watching writes to the file, lock should be acquired"""
+        int_wd = self._libc.inotify_add_watch(
+            self.int_fd,
+            os.fsencode(os.path.join(self.str_dir_path, str_name)),
+            INT_FILE_WATCH_MASK)
+        if int_wd >= 0:
+            self._dict_name_by_wd[int_wd] = str_name
+        # Else the file doesn't exist yet, it's watched when it's created
+
+    def _start_inotify(self) -> None:
+        """Start inotify watching the folder for new files (if possible)"""
+        if not hasattr(os, "uname") or os.uname().sysname != "Linux":
+            return None
+        try:
+            libc = ctypes.CDLL(
+                ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            int_fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if int_fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            int_wd = libc.inotify_add_watch(
+                int_fd, os.fsencode(self.str_dir_path), INT_DIR_WATCH_MASK)
+            if int_wd < 0:
+                os.close(int_fd)
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+        except (OSError, AttributeError):
+            LOGGER.info(
+                "Unable to watch %s with inotify, file sizes will be checked",
+                self.str_dir_path, exc_info=True)
+            return None
+        self._libc = libc
+        self.int_fd = int_fd
+        self._int_dir_wd = int_wd
+        return None
+
+    def _is_stat_changed(self, str_file_path : str) -> bool:
+        """Check if size or mtime of the file changed since the last check"""
+        try:
+            stat_result = os.stat(str_file_path)
+            tuple_stat = (stat_result.st_size, stat_result.st_mtime_ns)
+        except OSError:
+            tuple_stat = None
+        with self._lock:
+            tuple_last_stat = self._dict_last_stat_by_path.get(
+                str_file_path, ())
+            self._dict_last_stat_by_path[str_file_path] = tuple_stat
+        return tuple_stat != tuple_last_stat
+
@@ -0,0 +1,301 @@
+"""Module with class to read only newly appended lines of the output file"""
+from __future__ import print_function
+# Standard library imports
+from typing import Optional, Any
+from collections import deque
+import os
+import time
+import logging
+import threading
+
+# Third party imports
+
+# Local imports
+from .class_rotating_file import STR_DROPPED_OUTPUT_MARKER
+from .class_rotating_file import get_segment_path
+from .class_rotating_file import find_last_segment
+
+LOGGER = logging.getLogger(__name__)
+
+INT_BLOCK_SIZE = 64 * 1024
+# Number of last read bytes which are checked to notice rewrites of the file
+INT_TAIL_CHECK_BYTES = 64
+# Files changed more recently are checked even if their mtime is the same,
+# as the file could be changed again within the precision of mtime
+INT_MTIME_PRECISION_NS = 1000 * 1000 * 1000
+
+
+class FileTailReader(object):
+    """Class to follow the file and keep in memory only last N lines of it
+
+    The reader remembers the byte offset up to which the file was read,
+    so every update reads only bytes appended since the previous update.
+    The file isn't read at all if its size and modification time are the same.
+    If the file was rewritten (E.G. by clear_output() and print() of
+    the line with the same length) last read bytes are different,
+    so the reader starts from scratch.
+    If the file is rotated into segments (see RotatingFile) the reader
+    finishes the segment it was reading and goes on with the next ones.
+    When the output is compressed (see OutputArchive) the reader
+    is switched to the archive and reads only its last members.
+    """
+
+    def __init__(
+            self,
+            str_file_path : str,
+            int_max_lines : int = 1000
+    ) -> None:
+        """Initialize object
+
+        Args:
+            str_file_path (str): Path to the file to follow
+            int_max_lines (int, optional): Max number of last lines to keep
+        """
+        self.str_file_path = str_file_path
+        self.int_max_lines = int_max_lines
+        self.int_offset = 0
+        # Number of the last rotated segment which was seen
+        self.int_last_segment = 0
+        self.deque_lines = deque(maxlen=int_max_lines)
+        self.bytes_partial_line = b""
+        # Number of resets and of complete lines added since the start,
+        # so the caller can ask only for lines added after it looked last time
+        self.int_resets = 0
+        self.int_lines_added = 0
+        # Last read bytes of the file and its (size, mtime) at the last read
+        self.bytes_tail = b""
+        self.tuple_file_state = None
+        # Archive with the output after the file was compressed
+        self.archive = None
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """Forget everything that was read from the file"""
+        self.int_offset = 0
+        self.int_last_segment = 0
+        self.deque_lines.clear()
+        self.bytes_partial_line = b""
+        self.int_resets += 1
+        self.bytes_tail = b""
+        self.tuple_file_state = None
+
+    def update(self) -> int:
+        """Read bytes appended to the file since the last update
+
+        Returns:
+            int: Number of new bytes read
+        """
+        with self._lock:
+            return self._update()
+
+    def set_archive(self, archive : Any) -> None:
+        """Read the rest of the file and read only the archive from now on
+
+        Args:
+            archive (OutputArchive): Archive with the whole output of the file
+        """
+        with self._lock:
+            self._update()
+            self.archive = archive
+            # Everything in the archive was read from the file already
+            self.int_offset = archive.int_size
+
+    def get_lines(self) -> list[str]:
+        """Get list with last N lines of the file (last one can be partial)"""
+        with self._lock:
+            self._update()
+            list_lines = list(self.deque_lines)
+            if self.bytes_partial_line:
+                list_lines.append(self._decode(self.bytes_partial_line))
+        return list_lines
+
+    def get_new_lines(
+            self,
+            tuple_position : Optional[tuple[int, int]] = None
+    ) -> tuple[tuple[int, int], Optional[list[str]], str]:
+        """Get complete lines added after the position and the partial line
+
+        Args:
+            tuple_position (tuple, optional): \
+                Position returned by the previous call, None - from the start
+
+        Returns:
+            tuple: (position now, new complete lines or None if they \
+                can't be continued from the position as the output was \
+                cleared or some of new lines are not kept, partial last line)
+        """
+        with self._lock:
+            self._update()
+            tuple_position_now = (self.int_resets, self.int_lines_added)
+            str_partial_line = self._decode(self.bytes_partial_line)
+            list_lines = list(self.deque_lines)
+        if tuple_position is None:
+            return tuple_position_now, list_lines, str_partial_line
+        int_new_lines = tuple_position_now[1] - tuple_position[1]
+        if (
+                tuple_position[0] != tuple_position_now[0] or
+                not 0 <= int_new_lines <= len(list_lines)
+        ):
+            return tuple_position_now, None, str_partial_line
+        return (
+            tuple_position_now,
+            list_lines[len(list_lines) - int_new_lines:],
+            str_partial_line,
+        )
+
+    def get_text(self) -> str:
+        """Get string with last N lines of the file"""
+        return "\n".join(self.get_lines())
+
+    def _update(self) -> int:
+        """Read new bytes and split them into lines, lock should be acquired"""
+        if self.archive is not None:
+            return self._read_archive()
+        int_last_segment = find_last_segment(self.str_file_path)
+        if int_last_segment < self.int_last_segment:
+            # All segments were deleted (E.G. by clear_output())
+            self.reset()
+        int_bytes_read = 0
+        # The file which was read was moved into the segment after the known
+        for int_segment in range(self.int_last_segment + 1, int_last_segment + 1):
+            str_segment_path = get_segment_path(self.str_file_path, int_segment)
+            try:
+                int_file_size = os.path.getsize(str_segment_path)
+            except OSError:
+                self._add_dropped_output_marker()
+                continue
+            int_bytes_read += self._read_file(str_segment_path, int_file_size)
+            self.int_offset = 0
+            self.bytes_tail = b""
+            self.tuple_file_state = None
+        self.int_last_segment = int_last_segment
+        try:
+            stat_obj = os.stat(self.str_file_path)
+        except OSError:
+            if not int_last_segment:
+                self.reset()
+            # Else the file is being rotated now
+            return int_bytes_read
+        tuple_file_state = (stat_obj.st_size, stat_obj.st_mtime_ns)
+        if (
+                tuple_file_state == self.tuple_file_state and
+                time.time_ns() - stat_obj.st_mtime_ns > INT_MTIME_PRECISION_NS
+        ):
+            return int_bytes_read
+        if stat_obj.st_size < self.int_offset or self._is_rewritten():
+            # File was truncated (E.G. by clear_output()), start from scratch
+            self.reset()
+        int_bytes_read += self._read_file(self.str_file_path, stat_obj.st_size)
+        if self.int_offset == stat_obj.st_size:
+            self.tuple_file_state = tuple_file_state
+        return int_bytes_read
+
+    def _is_rewritten(self) -> bool:
+        """Check if last read bytes of the file are not the same anymore"""
+        if not self.bytes_tail:
+            return False
+        try:
+            with open(self.str_file_path, "rb") as file_handler:
+                file_handler.seek(self.int_offset - len(self.bytes_tail))
+                return file_handler.read(len(self.bytes_tail)) != self.bytes_tail
+        except OSError:
+            return False
+
+    def _read_file(self, str_path : str, int_file_size : int) -> int:
+        """Read bytes of the file after the offset and split them into lines"""
+        if int_file_size <= self.int_offset:
+            return 0
+        try:
+            bytes_new = self._read_new_bytes(str_path, int_file_size)
+        except OSError:
+            # File was rotated just now, it will be read on the next update
+            return 0
+        int_bytes_read = int_file_size - self.int_offset
+        self.int_offset = int_file_size
+        self._add_bytes(bytes_new)
+        return int_bytes_read
+
+    def _read_archive(self) -> int:
+        """Read last lines of the archive which weren't read yet
+
+        Members are decompressed from the end only till enough lines are found.
+        """
+        if self.int_offset >= self.archive.int_size:
+            return 0
+        list_blocks = []
+        int_newlines = 0
+        int_start = self.archive.int_size
+        for int_member_start, bytes_member in \
+                self.archive.iter_members_backward():
+            if int_member_start + len(bytes_member) <= self.int_offset:
+                break
+            bytes_block = bytes_member[max(0, self.int_offset - int_member_start):]
+            list_blocks.append(bytes_block)
+            int_newlines += bytes_block.count(b"\n")
+            int_start = max(int_member_start, self.int_offset)
+            if int_newlines > self.int_max_lines:
+                break
+        bytes_new = b"".join(reversed(list_blocks))
+        if int_start > self.int_offset:
+            # Beginning of the new output was skipped, drop broken first line
+            self.bytes_partial_line = b""
+            bytes_new = bytes_new[bytes_new.find(b"\n") + 1:]
+        int_bytes_read = self.archive.int_size - self.int_offset
+        self.int_offset = self.archive.int_size
+        self._add_bytes(bytes_new)
+        return int_bytes_read
+
+    def _add_bytes(self, bytes_new : bytes) -> None:
+        """Split new bytes into lines and keep the last ones"""
+        list_bytes_lines = (self.bytes_partial_line + bytes_new).split(b"\n")
+        self.bytes_partial_line = list_bytes_lines.pop()
+        self.int_lines_added += len(list_bytes_lines)
+        self.deque_lines.extend(
+            self._decode(bytes_line)
+            for bytes_line in list_bytes_lines[-self.int_max_lines:])
+
+    def _add_dropped_output_marker(self) -> None:
+        """Show that the segment with the next part of output was deleted"""
+        if self.bytes_partial_line:
+            self.deque_lines.append(self._decode(self.bytes_partial_line))
+            self.int_lines_added += 1
+            self.bytes_partial_line = b""
+        if not self.deque_lines or \
+                self.deque_lines[-1] != STR_DROPPED_OUTPUT_MARKER:
+            self.deque_lines.append(STR_DROPPED_OUTPUT_MARKER)
+            self.int_lines_added += 1
+        self.int_offset = 0
+        self.bytes_tail = b""
+
+    def _read_new_bytes(self, str_path : str, int_file_size : int) -> bytes:
+        """Read new bytes from the file, but not more than needed for N lines
+
+        When a lot of new output was appended (E.G. the first read of a huge
+        log) the file is read backwards block by block only until
+        enough lines to fill the buffer are found.
+        """
+        with open(str_path, "rb") as file_handler:
+            int_start = int_file_size
+            list_blocks = []
+            int_newlines = 0
+            while int_start > self.int_offset:
+                int_block_start = max(self.int_offset, int_start - INT_BLOCK_SIZE)
+                file_handler.seek(int_block_start)
+                bytes_block = file_handler.read(int_start - int_block_start)
+                list_blocks.append(bytes_block)
+                int_newlines += bytes_block.count(b"\n")
+                int_start = int_block_start
+                if int_newlines > self.int_max_lines:
+                    break
+        bytes_new = b"".join(reversed(list_blocks))
+        self.bytes_tail = (self.bytes_tail + bytes_new)[-INT_TAIL_CHECK_BYTES:]
+        if int_start > self.int_offset:
+            # Beginning of the new output was skipped, drop broken first line
+            self.bytes_partial_line = b""
+            bytes_new = bytes_new[bytes_new.find(b"\n") + 1:]
+        return bytes_new
+
+    @staticmethod
+    def _decode(bytes_line : bytes) -> str:
+        """Decode one line of the file"""
+        return bytes_line.decode("utf-8", errors="replace").rstrip("\r")
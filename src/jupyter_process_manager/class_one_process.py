@@ -5,22 +5,52 @@ from typing import Optional, Any, Union, Callable
 import sys
 import os
 import logging
+import asyncio
 from multiprocessing import Process
+from multiprocessing import Pipe
+from multiprocessing.connection import wait
 import datetime
 import time
+import threading
 
 # Third party imports
-from local_simple_database import LocalSimpleDatabase
 import psutil
-from round_to_n_significant_digits import rtnsd
 from timedelta_nice_format import timedelta_nice_format
 
 # Local imports
 from .function_wrapper import wrapped_func
+from .function_wrapper import STOP_SIGNAL
+from .function_wrapper import STR_STOP_REQUEST
+from .function_wrapper import STR_STOP_ACKNOWLEDGED
+from .function_wrapper import STR_RESULT_OK
+from .function_wrapper import STR_RESULT_ERROR
+from .function_wrapper import recv_result
+from .class_file_tail_reader import FileTailReader
+from .class_traceback_index import TracebackIndex
+from .class_shared_output import SharedOutputRing
+from .class_shared_output import SharedOutputReader
+from .class_outputs_archive import archive_output_file
+from .class_outputs_archive import INT_MEMBER_BYTES
+from .class_rotating_file import remove_output_files
+from .class_workers_pool import PooledTask
+from .class_resources_sampler import ResourcesSampler
+from .class_resources_sampler import get_nice_memory_str
+from .class_resources_sampler import get_ram_usage
+from .class_resources_sampler import get_descendants_by_pid
+from .class_process_id_allocator import get_ids_allocator
 
 
 LOGGER = logging.getLogger(__name__)
 
+FLOAT_SECONDS_TO_WAIT_FOR_STOP = 5.0
+FLOAT_SECONDS_TO_WAIT_FOR_KILL = 1.0
+
+
+class ProcessFailedError(Exception):
+    """Function run as process raised an error or was stopped without result
+    """
+    pass
+
 
 class OneProcess(object):
     """Class with object to handle all operations related to 1 process
@@ -29,29 +59,84 @@ class OneProcess(object):
     def __init__(
             self,
             str_dir_for_output : str,
-            str_proc_name : str = ""
+            str_proc_name : str = "",
+            int_max_stdout_lines : int = 1000,
+            int_process_id : Optional[int] = None,
+            connections_watcher : Optional[Any] = None,
+            func_on_exit : Optional[Callable] = None,
+            func_on_status_change : Optional[Callable] = None,
+            dict_output_settings : Optional[dict] = None,
+            resources_sampler : Optional[ResourcesSampler] = None,
+            lock_status : Optional[Any] = None
     ) -> None:
         """"""
         self.str_dir_for_output = str_dir_for_output
-        self.int_process_id = self._get_id_for_new_process()
+        # Sampler with cached handles of processes, None - make new one
+        self.resources_sampler = resources_sampler
+        # How to write outputs (see open_output_file()), None - as usual
+        self.dict_output_settings = dict_output_settings
+        if int_process_id is None:
+            int_process_id = self._get_id_for_new_process()
+        self.int_process_id = int_process_id
         self.str_stdout_file = os.path.join(
             self.str_dir_for_output, "stdout_%d.txt" % self.int_process_id)
         self.str_stderr_file = os.path.join(
             self.str_dir_for_output, "stderr_%d.txt" % self.int_process_id)
-        self.str_jpm_stderr_file = os.path.join(
-            self.str_dir_for_output, "jpm_stderr_%d.txt" % self.int_process_id)
 
         with open(self.str_stdout_file, "w"): pass
         with open(self.str_stderr_file, "w"): pass
-
+        self.stdout_reader = FileTailReader(
+            self.str_stdout_file, int_max_lines=int_max_stdout_lines)
+        self.errors_index = TracebackIndex(self.str_stderr_file)
+        # Archives with outputs by paths of compressed output files
+        self.dict_archive_by_file = {}
 
         self.process = None
+        self.conn_stop_requests = None
+        self.conn_results = None
+        # Watcher to receive results and notice exit of the process
+        # in background, None - check it on demand
+        self.connections_watcher = connections_watcher
+        # Function to call (with this object) when the process is over
+        self.func_on_exit = func_on_exit
+        # Function to call with (this object, old status, new status),
+        # it's called under lock_status together with the status change
+        self.func_on_status_change = func_on_status_change
+        self._lock_status = lock_status or threading.RLock()
+        self._tuple_result = None
+        # Result received from the pipe, it's saved when the exit is noticed
+        self._list_received_results = []
+        self._event_result_ready = threading.Event()
+        self._list_done_callbacks = []
+        self._lock = threading.Lock()
+        # Handle of the process and pipes are closed only when the exit
+        # was handled and nobody terminates the process at the moment
+        self._is_exit_handled = False
+        self._is_being_terminated = False
         self.dt_start_time = None
         self.dt_finish_time = None
         self.is_error_happened = None
-        self.str_status = "Not Started"
+        self._str_status = "Not Started"
         self.str_proc_name = str_proc_name
 
+    @property
+    def str_status(self) -> str:
+        """Current status of the process"""
+        return self._str_status
+
+    @str_status.setter
+    def str_status(self, str_new_status : str) -> None:
+        """Change status of the process and tell about it"""
+        with self._lock_status:
+            str_old_status = self._str_status
+            self._str_status = str_new_status
+            if (
+                    str_new_status != str_old_status and
+                    self.func_on_status_change is not None
+            ):
+                self.func_on_status_change(
+                    self, str_old_status, str_new_status)
+
     def __del__(self) -> None:
         """Terminate current process"""
         self.terminate()
@@ -70,17 +155,375 @@ class OneProcess(object):
             **kwargs: All arguments
 
         """
-        new_args = (
-            self.str_stdout_file,
-            self.str_stderr_file,
-            self.str_jpm_stderr_file,
-            func_to_process
-        ) + args
-        new_process = Process(target=wrapped_func, args=new_args, kwargs=kwargs)
-        new_process.daemon = True
-        new_process.start()
+        list_conns = []
+        try:
+            conn_stop_requests, conn_child = Pipe(duplex=True)
+            list_conns.extend([conn_stop_requests, conn_child])
+            conn_results, conn_child_results = Pipe(duplex=False)
+            list_conns.extend([conn_results, conn_child_results])
+            new_args = (
+                self.str_stdout_file,
+                self.str_stderr_file,
+                self._get_output_settings_for_start(),
+                conn_child,
+                conn_child_results,
+                func_to_process
+            ) + args
+            new_process = Process(
+                target=wrapped_func, args=new_args, kwargs=kwargs)
+            new_process.daemon = True
+            new_process.start()
+        except BaseException:
+            # E.G. no free file descriptors, pipes shouldn't leak
+            for conn in list_conns:
+                conn.close()
+            raise
+        conn_child.close()
+        conn_child_results.close()
+        self.conn_stop_requests = conn_stop_requests
+        self.conn_results = conn_results
         self.process = new_process
         self.dt_start_time = datetime.datetime.now()
+        if self.connections_watcher is not None:
+            self.connections_watcher.register(
+                self.conn_results, self._on_result_sent)
+            self.connections_watcher.register(
+                new_process.sentinel, self._on_process_exit)
+
+    def start_process_in_workers_pool(
+            self,
+            workers_pool : Any,
+            func_to_process : Callable,
+            *args : Any,
+            **kwargs : Any
+    ) -> None:
+        """Run given function in a long-lived worker of the pool
+
+        Args:
+            workers_pool (WorkersPool): Pool which workers to use
+            func_to_process (function): Function which to run
+            *args: All arguments
+            **kwargs: All arguments
+        """
+        self.dt_start_time = datetime.datetime.now()
+        self.process = workers_pool.submit(
+            self.int_process_id,
+            self.str_stdout_file,
+            self.str_stderr_file,
+            func_to_process,
+            args,
+            kwargs,
+            func_on_result=self._on_pooled_task_over,
+            dict_output_settings=self._get_output_settings_for_start(),
+        )
+
+    def _get_output_settings_for_start(self) -> Optional[dict]:
+        """Get settings of outputs for the child and create ring if needed
+
+        If STDOUT should be passed through shared memory then the ring
+        is created here and STDOUT is read from it till the process is over.
+        """
+        dict_output_settings = self.dict_output_settings or {}
+        int_ring_bytes = dict_output_settings.get("int_shared_output_bytes")
+        if not int_ring_bytes:
+            return self.dict_output_settings
+        ring = SharedOutputRing(int_bytes=int_ring_bytes)
+        self.stdout_reader = SharedOutputReader(
+            ring, int_max_lines=self.stdout_reader.int_max_lines)
+        return dict(dict_output_settings, str_shared_stdout_name=ring.str_name)
+
+    def _release_shared_output(self) -> None:
+        """Read the rest of the output from the ring and remove it"""
+        if isinstance(self.stdout_reader, SharedOutputReader):
+            self.stdout_reader.release()
+
+    def archive_outputs(
+            self,
+            str_codec : str,
+            int_member_bytes : int = INT_MEMBER_BYTES
+    ) -> None:
+        """Compress output files of the process which is over
+
+        Readers are switched to archives, so outputs and errors are
+        still available, then output files are removed.
+
+        Args:
+            str_codec (str): "gzip", "lzma" or "zstd"
+            int_member_bytes (int, optional): \
+                Uncompressed size of independently compressed parts
+        """
+        for str_file_path, reader in (
+                (self.str_stdout_file, self.stdout_reader),
+                (self.str_stderr_file, self.errors_index),
+        ):
+            archive = archive_output_file(
+                str_file_path, str_codec, int_member_bytes=int_member_bytes)
+            # Output read from shared memory doesn't need the file
+            if hasattr(reader, "set_archive"):
+                reader.set_archive(archive)
+            self.dict_archive_by_file[str_file_path] = archive
+            remove_output_files(str_file_path)
+
+    def save_error_of_start(self, str_error : str) -> None:
+        """Mark process as failed because the function couldn't be started
+
+        If the error can't be written to STDERR file (E.G. there are
+        no free file descriptors) it's still kept as the result.
+        """
+        try:
+            self._release_shared_output()
+            with open(self.str_stderr_file, "a") as file_handler:
+                file_handler.write(str_error)
+        except Exception:
+            LOGGER.exception(
+                "Unable to save error of start of process %d",
+                self.int_process_id)
+        self.dt_finish_time = datetime.datetime.now()
+        self.is_error_happened = True
+        self.str_status = "Error"
+        self.save_result((STR_RESULT_ERROR, str_error))
+
+    def _on_process_exit(self, *_) -> None:
+        """Save state and result of the process the moment it's over"""
+        self.connections_watcher.unregister(self.process.sentinel)
+        # Reap the process, it's over so it doesn't block
+        self.process.join()
+        if self.conn_results is not None:
+            self.connections_watcher.unregister(self.conn_results)
+        self._save_finish_state()
+        self._release_shared_output()
+        self._run_exit_callback()
+        # Result (if any) was sent before the exit, so it's in the pipe
+        self._receive_result(timeout=0, is_to_save=False)
+        with self._lock:
+            self._is_exit_handled = True
+        self._close_process_if_over()
+        self.save_result(
+            self._list_received_results[0]
+            if self._list_received_results else None)
+
+    def _close_process_if_over(self) -> None:
+        """Free the handle and pipes of the process which was reaped
+
+        Nothing is done while the process is being terminated,
+        terminate_processes() calls it again when it's over.
+        """
+        with self._lock:
+            if not self._is_exit_handled or self._is_being_terminated:
+                return None
+            process, self.process = self.process, None
+            list_conns = [self.conn_results, self.conn_stop_requests]
+            self.conn_results = None
+            self.conn_stop_requests = None
+        for conn in list_conns:
+            if conn is not None:
+                conn.close()
+        if process is not None:
+            process.close()
+        return None
+
+    def _start_termination(self) -> bool:
+        """Keep handle of the alive process till terminate_processes() is over
+
+        Returns:
+            bool: True if the process is alive and should be terminated
+        """
+        with self._lock:
+            if self.process is None or not self.process.is_alive():
+                return False
+            self._is_being_terminated = True
+            return True
+
+    def _finish_termination(self) -> None:
+        """Let the handle of the process be closed after termination"""
+        with self._lock:
+            self._is_being_terminated = False
+        self._close_process_if_over()
+
+    def _on_pooled_task_over(self, tuple_result : Optional[tuple]) -> None:
+        """Save state and result of the function run by the pool"""
+        self._save_finish_state()
+        self._release_shared_output()
+        self._run_exit_callback()
+        self.save_result(tuple_result)
+
+    def _save_finish_state(self) -> None:
+        """Save finish time and status of the process which is over"""
+        with self._lock:
+            if self.dt_finish_time:
+                return None
+            self.dt_finish_time = datetime.datetime.now()
+        self.is_error_happened = self._is_error_happened()
+        if self.str_status != "Terminated by user":
+            self.str_status = "Error" if self.is_error_happened else \
+                "Just Finished"
+        return None
+
+    def _run_exit_callback(self) -> None:
+        """Tell the owner of the object that the process is over"""
+        if self.func_on_exit is None:
+            return None
+        try:
+            self.func_on_exit(self)
+        except Exception:
+            LOGGER.exception(
+                "Error in exit callback for process %d", self.int_process_id)
+        return None
+
+    def save_result(self, tuple_result : Optional[tuple]) -> None:
+        """Save (result state, result) of the function
+
+        None means that the process is over without sending the result.
+        """
+        with self._lock:
+            if self._event_result_ready.is_set():
+                return None
+            self._tuple_result = tuple_result
+            self._event_result_ready.set()
+            list_done_callbacks = self._list_done_callbacks
+            self._list_done_callbacks = []
+        for func_callback in list_done_callbacks:
+            self._run_done_callback(func_callback)
+        return None
+
+    def add_done_callback(self, func_callback : Callable) -> None:
+        """Call function (with this object) when the process is over
+
+        If the process is already over then the function is called at once.
+        Otherwise it's called from the thread which noticed the end
+        of the process, so the function should be fast and thread-safe.
+        """
+        with self._lock:
+            if not self._event_result_ready.is_set():
+                self._list_done_callbacks.append(func_callback)
+                return None
+        self._run_done_callback(func_callback)
+        return None
+
+    def remove_done_callback(self, func_callback : Callable) -> None:
+        """Remove the callback which wasn't called yet (if it's there)"""
+        with self._lock:
+            if func_callback in self._list_done_callbacks:
+                self._list_done_callbacks.remove(func_callback)
+
+    def _run_done_callback(self, func_callback : Callable) -> None:
+        """Run one callback for the finished process"""
+        try:
+            func_callback(self)
+        except Exception:
+            LOGGER.exception(
+                "Error in callback for process %d", self.int_process_id)
+
+    def is_result_ready(self) -> bool:
+        """Check if the function is over and result() won't block"""
+        if not self._event_result_ready.is_set() and self.conn_results:
+            if self.connections_watcher is None:
+                self._receive_result(timeout=0)
+        return self._event_result_ready.is_set()
+
+    def result(self, timeout : Optional[float] = None) -> Any:
+        """Wait for the function to finish and get the value it returned
+
+        Args:
+            timeout (float, optional): Max seconds to wait, None - forever
+
+        Raises:
+            TimeoutError: Function is not over in given time
+            ProcessFailedError: Function raised an error or was stopped
+
+        Returns:
+            Any: Value returned by the function
+        """
+        if self.connections_watcher is None and self.conn_results:
+            self._receive_result(timeout=timeout)
+        if not self._event_result_ready.wait(timeout):
+            raise TimeoutError(
+                "Process %d is not over yet" % self.int_process_id)
+        if self._tuple_result is None:
+            raise ProcessFailedError(
+                "Process %d is over without result" % self.int_process_id)
+        str_state, result = self._tuple_result
+        if str_state != STR_RESULT_OK:
+            raise ProcessFailedError(
+                "Process %d failed:\n%s" % (self.int_process_id, result))
+        return result
+
+    def __await__(self) -> Any:
+        """Wait for the function to finish in asyncio and get its value
+
+        await process_obj works as process_obj.result() without blocking
+        the event loop.
+        """
+        return self.result_async().__await__()
+
+    async def result_async(self, timeout : Optional[float] = None) -> Any:
+        """Wait for the function to finish in asyncio and get its value
+
+        Args:
+            timeout (float, optional): Max seconds to wait, None - forever
+
+        Raises:
+            TimeoutError: Function is not over in given time
+            ProcessFailedError: Function raised an error or was stopped
+
+        Returns:
+            Any: Value returned by the function
+        """
+        loop = asyncio.get_running_loop()
+        if self.connections_watcher is None:
+            # Nobody tells when the process is over, wait for it in a thread
+            return await loop.run_in_executor(None, self.result, timeout)
+        if not self._event_result_ready.is_set():
+            future = loop.create_future()
+
+            def on_done(_):
+                call_soon_threadsafe(loop, set_future_done, future)
+
+            self.add_done_callback(on_done)
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(
+                    "Process %d is not over yet" % self.int_process_id)
+            finally:
+                self.remove_done_callback(on_done)
+        return self.result(timeout=0)
+
+    def _on_result_sent(self, conn_results : Any) -> None:
+        """Receive result when the process sent it (or died)
+
+        Big result would block the child till it's read, so it's read now,
+        but it's saved (and callbacks are run) only when the exit is noticed.
+        So whoever waits for the result sees the process which is over.
+        """
+        self.connections_watcher.unregister(conn_results)
+        self._receive_result(timeout=0, is_to_save=False)
+
+    def _receive_result(
+            self,
+            timeout : Optional[float] = None,
+            is_to_save : bool = True
+    ) -> None:
+        """Receive result from the pipe if it's there in given time
+
+        Args:
+            timeout (float, optional): Max seconds to wait, None - forever
+            is_to_save (bool, optional): \
+                Flag if to save the result at once, otherwise it's kept \
+                in _list_received_results till the exit of the process
+        """
+        if self.conn_results is None or not self.conn_results.poll(timeout):
+            return None
+        try:
+            tuple_result = recv_result(self.conn_results)
+        except (EOFError, OSError):
+            tuple_result = None
+        self.conn_results.close()
+        self.conn_results = None
+        self._list_received_results.append(tuple_result)
+        if is_to_save:
+            self.save_result(tuple_result)
+        return None
 
     def debug_run_of_the_func(
             self,
@@ -92,22 +535,40 @@ class OneProcess(object):
         Run given function in the current process to check that it is runnable
         """
         new_args = (
-            self.str_stdout_file, self.str_stderr_file, func_to_process, args)
-        wrapped_func(*new_args, **kwargs)
+            self.str_stdout_file,
+            self.str_stderr_file,
+            # Outputs of the current process shouldn't be flushed in background
+            dict(self.dict_output_settings or {}, int_buffer_bytes=None),
+            None,
+            None,
+            func_to_process,
+        )
+        self.dt_start_time = datetime.datetime.now()
+        result = wrapped_func(*(new_args + args), **kwargs)
+        self.dt_finish_time = datetime.datetime.now()
+        self.str_status = "Finished"
+        self.save_result((STR_RESULT_OK, result))
 
     def is_alive(self) -> bool:
         """Check if process is alive and save current state of the process"""
-        if self.process is None:
-            self.str_status = "Not Started"
+        if self.str_status == "Terminated by user":
+            # Traceback of KeyboardInterrupt (if any) doesn't make it an error
             return False
         if self.is_error_happened:
             self.str_status = "Error"
             return False
-        if self.str_status == "Terminated by user":
-            return False
         if self.dt_finish_time:
+            # Handle of the process is closed (None) when it's over
             self.str_status = "Finished"
             return False
+        if self.process is None:
+            if self.str_status != "Queued":
+                self.str_status = "Not Started"
+            return False
+        if self.connections_watcher is not None:
+            # Exit of the process is noticed in background
+            self.str_status = "Running"
+            return True
         if not self.process.is_alive():
             self.dt_finish_time = datetime.datetime.now()
             self.is_error_happened = self._is_error_happened()
@@ -120,24 +581,31 @@ class OneProcess(object):
         return True
 
     def get_pid(self) -> Optional[int]:
-        """Get current process ID"""
-        if self.is_alive():
-            return self.process.pid
-        return None
+        """Get current process ID (None if process is not running)"""
+        process = self.process
+        if process is None or self.dt_finish_time:
+            return None
+        try:
+            return process.pid
+        except ValueError:
+            # Process is over and its handle was closed just now
+            return None
 
     def get_mem_usage(self) -> str:
-        """Get current process RAM memory usage string in nice format"""
-        if self.dt_finish_time:
+        """Get RAM memory usage of the process and its children in nice format
+
+        PSS (or USS where there is no PSS) is used, so pages shared
+        by processes of the tree are not counted many times.
+        """
+        int_pid = self.get_pid()
+        if int_pid is None:
             return "None"
-        process = psutil.Process(self.get_pid())
-        if not process:
+        resources_sampler = self.resources_sampler or ResourcesSampler()
+        dict_usage = resources_sampler.sample_process_tree(
+            int_pid, is_full_info=True)
+        if dict_usage is None:
             return "None"
-        int_mem_bytes = process.memory_info().rss
-        float_mem_mbytes = int_mem_bytes / 1024.0 / 1024.0
-        if float_mem_mbytes > 1024:
-            float_mem_gbytes = float_mem_mbytes / 1024.0
-            return str(rtnsd(float_mem_gbytes, 2)) + " Gb"
-        return str(rtnsd(float_mem_mbytes, 2)) + " Mb"
+        return get_nice_memory_str(get_ram_usage(dict_usage))
 
     def get_how_long_this_process_is_running(self) -> str:
         """Get string with duration this process is running"""
@@ -151,72 +619,275 @@ class OneProcess(object):
         """Get last N line of STDOUT output of the process"""
         if not self.str_stdout_file:
             return "ERROR: Path to file with stdout is not given"
-        if not os.path.exists(self.str_stdout_file):
+        if (
+                self.str_stdout_file not in self.dict_archive_by_file and
+                not os.path.exists(self.str_stdout_file)
+        ):
             with open(self.str_stdout_file, "w"): pass
             return "STDOUT OUTPUT IS EMPTY"
-        with open(self.str_stdout_file, "r") as file_handler:
-            str_whole_output = file_handler.read()
-        list_lines = str_whole_output.splitlines()
-        if not list_lines:
+        str_output = self.stdout_reader.get_text()
+        if not str_output:
             return "STDOUT OUTPUT IS EMPTY"
-        return str_whole_output
+        return str_output
 
-    def terminate(self) -> None:
-        """Terminate current process"""
-        if self.process.is_alive():
-            LOGGER.info("Closing procees %d", self.int_process_id)
+    def request_stop(self) -> None:
+        """Ask the process to stop by raising KeyboardInterrupt in it
+
+        Doesn't wait for anything, use wait_stop_acknowledgement() or
+        process sentinel to know when the process reacted on it.
+        """
+        if self.process is None or not self.process.is_alive():
+            return None
+        conn_stop_requests = self._get_conn_stop_requests()
+        if conn_stop_requests is None or self.process.pid is None:
+            return None
+        try:
+            conn_stop_requests.send((STR_STOP_REQUEST, self.int_process_id))
+        except OSError:
+            # Worker of the pool is over and its pipes are closed
+            return None
+        if STOP_SIGNAL is not None:
+            os.kill(self.process.pid, STOP_SIGNAL)
+        return None
+
+    def wait_stop_acknowledgement(self, timeout : Optional[float] = None) -> bool:
+        """Wait till the process confirms that it got the stop request
+
+        Args:
+            timeout (float, optional): Max seconds to wait, None - forever
+
+        Returns:
+            bool: True if the process acknowledged the stop request
+        """
+        conn_stop_requests = self._get_conn_stop_requests()
+        if conn_stop_requests is None:
+            return False
+        float_deadline = None
+        if timeout is not None:
+            float_deadline = time.monotonic() + timeout
+        try:
+            while True:
+                float_seconds_left = None
+                if float_deadline is not None:
+                    float_seconds_left = max(
+                        0.0, float_deadline - time.monotonic())
+                if not conn_stop_requests.poll(float_seconds_left):
+                    return False
+                # Skip acknowledgements for previous tasks of the worker
+                if conn_stop_requests.recv() == (
+                        STR_STOP_ACKNOWLEDGED, self.int_process_id):
+                    return True
+        except (EOFError, OSError):
+            return False
+
+    def _get_conn_stop_requests(self) -> Optional[Any]:
+        """Get pipe to send stop requests to the process
+
+        It's None if the process wasn't started or it was reaped already.
+        """
+        if isinstance(self.process, PooledTask):
+            return self.process.conn_stop_requests
+        return self.conn_stop_requests
+
+    def terminate(self, timeout : float = FLOAT_SECONDS_TO_WAIT_FOR_STOP) -> str:
+        """Terminate current process
+
+        Args:
+            timeout (float, optional): \
+                Seconds to wait for the process to stop by KeyboardInterrupt
+
+        Returns:
+            str: How the process was stopped (empty if it wasn't alive)
+        """
+        if self.process is None:
+            return ""
+        str_outcome = terminate_processes([self], timeout=timeout).get(
+            self.int_process_id, "")
+        if str_outcome:
             LOGGER.info(
-                "---> Try to close the process by raising KeyboardInterupt")
-            with open(self.str_jpm_stderr_file, "w") as f:
-                f.write("Stop process by JupyterProcessManager")
-            for _ in range(50):
-                time.sleep(0.1)
-                if not self.process.is_alive():
-                    LOGGER.info("------> Process was stopped.")
-                    break
-            else:
-                LOGGER.info(
-                    "------> Process HASN'T stopped by KeyboardInterupt.")
-                LOGGER.info(
-                    "---> Terminate the process by telling OS to kill it")
-                self.process.terminate()
-            self.str_status = "Terminated by user"
-            self.dt_finish_time = datetime.datetime.now()
+                "Closing procees %d ------> %s", self.int_process_id, str_outcome)
+        return str_outcome
 
     def get_list_all_errors(self) -> list[str]:
         """Get list with all ERRORs from STDERR"""
         if not self.str_stderr_file:
             return []
-        if not os.path.exists(self.str_stderr_file):
-            return []
-        with open(self.str_stderr_file, "r") as file_handler:
-            str_whole_stderr_file = file_handler.read()
-        if not str_whole_stderr_file:
-            return []
-        list_errors = str_whole_stderr_file.split("Traceback ")
-        if len(list_errors) <= 1:
-            return []
-        list_errors_full = [
-            "Traceback " + str_error
-            for str_error in list_errors[1:]
-            if str_error]
-        return list_errors_full
+        return self.errors_index.get_all_errors()
+
+    def get_number_of_errors(self) -> int:
+        """Get number of ERRORs in STDERR"""
+        if not self.str_stderr_file:
+            return 0
+        return self.errors_index.get_number_of_errors()
 
     def get_last_error_msg(self) -> str:
         """Get string with last ERROR message"""
-        list_errors = self.get_list_all_errors()
-        if not list_errors:
+        if not self.str_stderr_file:
             return ""
-        return list_errors[-1]
+        return self.errors_index.get_last_error()
 
     def _is_error_happened(self) -> bool:
         """Check if any ERROR happened with current process"""
-        if self.get_last_error_msg():
-            return True
-        return False
+        return self.get_number_of_errors() > 0
 
     def _get_id_for_new_process(self) -> int:
         """Get unique ID for the current process"""
-        self.LSD = LocalSimpleDatabase(self.str_dir_for_output)
-        self.LSD["int_max_used_process_id"] += 1
-        return self.LSD["int_max_used_process_id"]
+        return get_ids_for_new_processes(self.str_dir_for_output, 1)[0]
+
+
+def get_ids_for_new_processes(
+        str_dir_for_output : str,
+        int_processes : int
+) -> range:
+    """Get unique consecutive IDs for many new processes at once"""
+    return get_ids_allocator(str_dir_for_output).get_ids(int_processes)
+
+
+def call_soon_threadsafe(
+        loop : asyncio.AbstractEventLoop,
+        func_callback : Callable,
+        *args : Any
+) -> None:
+    """Run function in the event loop from another thread if loop is alive"""
+    try:
+        loop.call_soon_threadsafe(func_callback, *args)
+    except RuntimeError:
+        # Loop is already closed, nobody waits for the event
+        pass
+
+
+def set_future_done(future : asyncio.Future) -> None:
+    """Mark asyncio future as done if nobody cancelled it"""
+    if not future.done():
+        future.set_result(None)
+
+
+def terminate_processes(
+        list_processes : list[OneProcess],
+        timeout : float = FLOAT_SECONDS_TO_WAIT_FOR_STOP
+) -> dict[int, str]:
+    """Terminate many processes at once with one common deadline
+
+    1) Stop request is sent to every alive process at once
+    2) All processes are awaited till the common deadline
+    3) Processes which are still alive get SIGTERM and then SIGKILL together
+    4) Descendants of processes (found before the stop request)
+        which outlived their parents get SIGTERM and then SIGKILL together
+
+    Args:
+        list_processes (list): Processes to terminate
+        timeout (float, optional): \
+            Seconds to wait for processes to stop by KeyboardInterrupt
+
+    Returns:
+        dict: How every process was stopped by process ID
+    """
+    # Handles of processes are kept open till the end of the termination
+    list_to_stop = [
+        process_obj for process_obj in list_processes
+        if process_obj._start_termination()]
+    dict_outcome_by_id = {}
+    list_descendants = _get_descendants(list_to_stop)
+    for process_obj in list_to_stop:
+        process_obj.request_stop()
+    list_alive = _wait_processes_to_stop(list_to_stop, timeout)
+    for process_obj in list_to_stop:
+        if process_obj in list_alive:
+            continue
+        if process_obj.wait_stop_acknowledgement(0):
+            str_outcome = "Stopped by KeyboardInterrupt"
+        else:
+            str_outcome = "Stopped"
+        dict_outcome_by_id[process_obj.int_process_id] = str_outcome
+    # Escalate for all processes which are left at once
+    list_to_terminate = list_alive
+    for process_obj in list_to_terminate:
+        process_obj.process.terminate()
+    list_alive = _wait_processes_to_stop(
+        list_to_terminate, FLOAT_SECONDS_TO_WAIT_FOR_KILL)
+    for process_obj in list_to_terminate:
+        if process_obj not in list_alive:
+            dict_outcome_by_id[process_obj.int_process_id] = \
+                "Stopped by SIGTERM"
+    list_to_kill = list_alive
+    for process_obj in list_to_kill:
+        process_obj.process.kill()
+    list_alive = _wait_processes_to_stop(
+        list_to_kill, FLOAT_SECONDS_TO_WAIT_FOR_KILL)
+    for process_obj in list_to_kill:
+        if process_obj in list_alive:
+            dict_outcome_by_id[process_obj.int_process_id] = "Unable to stop"
+        else:
+            dict_outcome_by_id[process_obj.int_process_id] = \
+                "Killed by SIGKILL"
+    _terminate_descendants(list_descendants)
+    dt_now = datetime.datetime.now()
+    for process_obj in list_to_stop:
+        process_obj.str_status = "Terminated by user"
+        process_obj.dt_finish_time = dt_now
+        process_obj._finish_termination()
+    return dict_outcome_by_id
+
+
+def _wait_processes_to_stop(
+        list_processes : list[OneProcess],
+        float_seconds : float
+) -> list[OneProcess]:
+    """Wait till all processes stopped or time is over
+
+    Returns:
+        list: Processes which are still alive
+    """
+    float_deadline = time.monotonic() + float_seconds
+    dict_process_by_sentinel = {
+        process_obj.process.sentinel: process_obj
+        for process_obj in list_processes}
+    while dict_process_by_sentinel:
+        float_seconds_left = float_deadline - time.monotonic()
+        if float_seconds_left <= 0:
+            break
+        for sentinel in wait(list(dict_process_by_sentinel), float_seconds_left):
+            dict_process_by_sentinel.pop(sentinel).process.join()
+    return list(dict_process_by_sentinel.values())
+
+
+def _get_descendants(list_processes : list[OneProcess]) -> list[psutil.Process]:
+    """Get handles for all descendants of given processes"""
+    dict_descendants_by_pid = get_descendants_by_pid(
+        process_obj.process.pid for process_obj in list_processes)
+    list_descendants = []
+    for list_pids in dict_descendants_by_pid.values():
+        for int_pid in list_pids:
+            try:
+                list_descendants.append(psutil.Process(int_pid))
+            except psutil.Error:
+                pass
+    return list_descendants
+
+
+def _terminate_descendants(list_descendants : list[psutil.Process]) -> None:
+    """Terminate (and then kill) descendants which are still alive"""
+    list_alive = []
+    for psutil_process in list_descendants:
+        try:
+            # is_running() also checks that PID wasn't reused
+            if psutil_process.is_running():
+                psutil_process.terminate()
+                list_alive.append(psutil_process)
+        except psutil.Error:
+            pass
+    if not list_alive:
+        return None
+    LOGGER.info("Terminating %d orphaned child processes", len(list_alive))
+    _, list_alive = psutil.wait_procs(
+        list_alive, timeout=FLOAT_SECONDS_TO_WAIT_FOR_KILL)
+    for psutil_process in list_alive:
+        try:
+            psutil_process.kill()
+        except psutil.Error:
+            pass
+    _, list_alive = psutil.wait_procs(
+        list_alive, timeout=FLOAT_SECONDS_TO_WAIT_FOR_KILL)
+    for psutil_process in list_alive:
+        LOGGER.warning("Unable to stop child process %d", psutil_process.pid)
+    return None
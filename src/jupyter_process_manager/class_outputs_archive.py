@@ -0,0 +1,208 @@
+"""Module to compress outputs of finished processes and to read them"""
+from __future__ import print_function
+# Standard library imports
+from typing import Any, Iterator
+from bisect import bisect_right
+import os
+import gzip
+import lzma
+import json
+import queue
+import logging
+import threading
+
+# Third party imports
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Local imports
+from .class_rotating_file import iter_output_bytes
+
+LOGGER = logging.getLogger(__name__)
+
+LIST_CODECS = ["gzip", "lzma", "zstd"]
+DICT_EXTENSION_BY_CODEC = {"gzip": ".gz", "lzma": ".xz", "zstd": ".zst"}
+# Uncompressed size of one independently compressed member of the archive
+INT_MEMBER_BYTES = 1024 * 1024
+STR_INDEX_EXTENSION = ".index"
+
+
+class OutputArchive(object):
+    """Compressed output file which can be read from any position
+
+    The archive is a sequence of independently compressed members
+    (multi-member gzip, multi-stream xz or multi-frame zstd),
+    so any standard tool decompresses it as a whole.
+    The index file ARCHIVE.index has uncompressed and compressed offsets
+    of every member, so reading the end of the output (or any range)
+    decompresses only the members it needs.
+    """
+
+    def __init__(self, str_archive_path : str) -> None:
+        """Initialize object
+
+        Args:
+            str_archive_path (str): Path to the archive with the index near it
+        """
+        self.str_archive_path = str_archive_path
+        with open(str_archive_path + STR_INDEX_EXTENSION) as file_obj:
+            dict_index = json.load(file_obj)
+        self.str_codec = dict_index["str_codec"]
+        self.int_size = dict_index["int_size"]
+        # Uncompressed and compressed offsets of members (and of the end)
+        self.list_int_starts = dict_index["list_int_starts"]
+        self.list_int_compressed_starts = dict_index["list_int_compressed_starts"]
+
+    def read(self, int_start : int = 0, int_end : int = -1) -> bytes:
+        """Read uncompressed bytes [int_start, int_end) of the output"""
+        if int_end < 0 or int_end > self.int_size:
+            int_end = self.int_size
+        list_parts = []
+        for int_member_start, bytes_member in self.iter_members(int_start):
+            if int_member_start >= int_end:
+                break
+            list_parts.append(bytes_member[
+                max(0, int_start - int_member_start):
+                int_end - int_member_start])
+        return b"".join(list_parts)
+
+    def iter_members(self, int_start : int = 0) -> Iterator[tuple[int, bytes]]:
+        """Yield (offset, uncompressed bytes) of members from the one
+        with the given offset till the end, one member at a time
+        """
+        int_member = max(0, bisect_right(self.list_int_starts, int_start) - 1)
+        with open(self.str_archive_path, "rb") as file_obj:
+            file_obj.seek(self.list_int_compressed_starts[int_member])
+            for int_num in range(int_member, len(self.list_int_starts) - 1):
+                bytes_compressed = file_obj.read(
+                    self.list_int_compressed_starts[int_num + 1] -
+                    self.list_int_compressed_starts[int_num])
+                yield (
+                    self.list_int_starts[int_num],
+                    decompress(self.str_codec, bytes_compressed))
+
+    def iter_members_backward(self) -> Iterator[tuple[int, bytes]]:
+        """Yield (offset, uncompressed bytes) of members from the last one"""
+        with open(self.str_archive_path, "rb") as file_obj:
+            for int_num in range(len(self.list_int_starts) - 2, -1, -1):
+                file_obj.seek(self.list_int_compressed_starts[int_num])
+                bytes_compressed = file_obj.read(
+                    self.list_int_compressed_starts[int_num + 1] -
+                    self.list_int_compressed_starts[int_num])
+                yield (
+                    self.list_int_starts[int_num],
+                    decompress(self.str_codec, bytes_compressed))
+
+
+class OutputsArchiver(object):
+    """Class to compress outputs of finished processes in background
+
+    Processes are compressed one by one in a daemon thread,
+    see OneProcess.archive_outputs().
+    """
+
+    def __init__(
+            self,
+            str_codec : str,
+            int_member_bytes : int = INT_MEMBER_BYTES
+    ) -> None:
+        """Initialize object
+
+        Args:
+            str_codec (str): "gzip", "lzma" or "zstd" (needs zstandard)
+            int_member_bytes (int, optional): \
+                Uncompressed size of independently compressed parts
+        """
+        check_codec(str_codec)
+        self.str_codec = str_codec
+        self.int_member_bytes = int_member_bytes
+        self.queue_processes = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def add(self, process_obj : Any) -> None:
+        """Compress outputs of the finished process in background"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._archive_in_loop, daemon=True)
+                self._thread.start()
+        self.queue_processes.put(process_obj)
+
+    def _archive_in_loop(self) -> None:
+        """Compress outputs of processes from the queue one by one"""
+        while True:
+            process_obj = self.queue_processes.get()
+            try:
+                process_obj.archive_outputs(
+                    self.str_codec, int_member_bytes=self.int_member_bytes)
+            except Exception:
+                LOGGER.exception(
+                    "Unable to compress outputs of the process %d",
+                    process_obj.int_process_id)
+
+
+def archive_output_file(
+        str_file_path : str,
+        str_codec : str,
+        int_member_bytes : int = INT_MEMBER_BYTES
+) -> OutputArchive:
+    """Compress the output file (with all its segments) into the archive
+
+    Source files are not removed (see remove_output_files()),
+    readers should be switched to the archive at first.
+    """
+    str_archive_path = str_file_path + DICT_EXTENSION_BY_CODEC[str_codec]
+    list_int_starts = [0]
+    list_int_compressed_starts = [0]
+    with open(str_archive_path + ".tmp", "wb") as file_obj:
+        for bytes_chunk in iter_output_bytes(
+                str_file_path, int_chunk_bytes=int_member_bytes):
+            bytes_compressed = compress(str_codec, bytes_chunk)
+            file_obj.write(bytes_compressed)
+            list_int_starts.append(list_int_starts[-1] + len(bytes_chunk))
+            list_int_compressed_starts.append(
+                list_int_compressed_starts[-1] + len(bytes_compressed))
+    dict_index = {
+        "str_codec": str_codec,
+        "int_size": list_int_starts[-1],
+        "list_int_starts": list_int_starts,
+        "list_int_compressed_starts": list_int_compressed_starts,
+    }
+    with open(str_archive_path + STR_INDEX_EXTENSION + ".tmp", "w") as file_obj:
+        json.dump(dict_index, file_obj)
+    os.replace(
+        str_archive_path + STR_INDEX_EXTENSION + ".tmp",
+        str_archive_path + STR_INDEX_EXTENSION)
+    os.replace(str_archive_path + ".tmp", str_archive_path)
+    return OutputArchive(str_archive_path)
+
+
+def check_codec(str_codec : str) -> None:
+    """Raise error if the codec can't be used"""
+    if str_codec not in LIST_CODECS:
+        raise ValueError(
+            "Unknown codec %s, it should be one of: %s" % (
+                str_codec, ", ".join(LIST_CODECS)))
+    if str_codec == "zstd" and zstandard is None:
+        raise ImportError("Package zstandard is needed for zstd compression")
+
+
+def compress(str_codec : str, bytes_data : bytes) -> bytes:
+    """Compress bytes into one independent member"""
+    if str_codec == "gzip":
+        return gzip.compress(bytes_data)
+    if str_codec == "lzma":
+        return lzma.compress(bytes_data)
+    return zstandard.ZstdCompressor().compress(bytes_data)
+
+
+def decompress(str_codec : str, bytes_data : bytes) -> bytes:
+    """Decompress one member"""
+    if str_codec == "gzip":
+        return gzip.decompress(bytes_data)
+    if str_codec == "lzma":
+        return lzma.decompress(bytes_data)
+    return zstandard.ZstdDecompressor().decompress(bytes_data)
@@ -0,0 +1,128 @@
+"""Module with class to give unique IDs to new processes"""
+from __future__ import print_function
+# Standard library imports
+from contextlib import contextmanager
+import os
+import logging
+import threading
+
+# Third party imports
+
+# Local imports
+
+LOGGER = logging.getLogger(__name__)
+
+STR_MAX_USED_ID_FILENAME = "int_max_used_process_id.txt"
+INT_IDS_BLOCK_SIZE = 100
+# One allocator for every output folder used in this process
+_DICT_ALLOCATOR_BY_DIR = {}
+_LOCK_ALLOCATORS = threading.Lock()
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock_file(file_obj):
+        """Block till the file is locked by this process"""
+        file_obj.seek(0)
+        while True:
+            try:
+                msvcrt.locking(file_obj.fileno(), msvcrt.LK_LOCK, 1)
+                return None
+            except OSError:
+                # LK_LOCK gives up after 10 seconds, try again
+                pass
+
+    def _unlock_file(file_obj):
+        """Unlock the file locked by _lock_file()"""
+        file_obj.seek(0)
+        msvcrt.locking(file_obj.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(file_obj):
+        """Block till the file is locked by this process"""
+        fcntl.flock(file_obj.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(file_obj):
+        """Unlock the file locked by _lock_file()"""
+        fcntl.flock(file_obj.fileno(), fcntl.LOCK_UN)
+
+
+class ProcessIdAllocator(object):
+    """Class to give unique IDs to processes with output in one folder
+
+    Max used ID is kept in the file int_max_used_process_id.txt.
+    IDs are reserved in blocks: the file is locked, the max used ID is
+    increased by the block size and the file is unlocked.
+    All IDs of the block are then given out from memory,
+    so the file is touched only once per block.
+    The file lock makes it safe to use many managers
+    (even from different kernels) with the same folder,
+    IDs not used till the end of the session are skipped.
+    """
+
+    def __init__(
+            self,
+            str_dir_for_output : str,
+            int_block_size : int = INT_IDS_BLOCK_SIZE
+    ) -> None:
+        """Initialize object
+
+        Args:
+            str_dir_for_output (str): Folder with outputs of processes
+            int_block_size (int, optional): Min number of IDs to reserve at once
+        """
+        self.str_file_path = os.path.join(
+            str_dir_for_output, STR_MAX_USED_ID_FILENAME)
+        self.int_block_size = int_block_size
+        # IDs in [int_next_id, int_block_end) are reserved and not used yet
+        self.int_next_id = 0
+        self.int_block_end = 0
+        self._lock = threading.Lock()
+
+    def get_ids(self, int_ids : int = 1) -> range:
+        """Get range with int_ids new unique consecutive IDs"""
+        with self._lock:
+            if self.int_block_end - self.int_next_id < int_ids:
+                self._reserve_block(max(int_ids, self.int_block_size))
+            range_ids = range(self.int_next_id, self.int_next_id + int_ids)
+            self.int_next_id += int_ids
+            return range_ids
+
+    def _reserve_block(self, int_ids : int) -> None:
+        """Reserve new block of IDs in the file, lock should be acquired"""
+        with _open_locked(self.str_file_path) as file_obj:
+            str_max_used_id = file_obj.read().strip()
+            int_max_used_id = int(str_max_used_id) if str_max_used_id else 0
+            file_obj.seek(0)
+            file_obj.truncate()
+            file_obj.write(str(int_max_used_id + int_ids))
+            file_obj.flush()
+        LOGGER.debug(
+            "Process IDs %d-%d reserved",
+            int_max_used_id + 1, int_max_used_id + int_ids)
+        self.int_next_id = int_max_used_id + 1
+        self.int_block_end = int_max_used_id + int_ids + 1
+
+
+def get_ids_allocator(str_dir_for_output : str) -> ProcessIdAllocator:
+    """Get one common allocator for all processes with the output folder"""
+    str_dir_path = os.path.abspath(str_dir_for_output)
+    with _LOCK_ALLOCATORS:
+        allocator = _DICT_ALLOCATOR_BY_DIR.get(str_dir_path)
+        if allocator is None:
+            allocator = ProcessIdAllocator(str_dir_path)
+            _DICT_ALLOCATOR_BY_DIR[str_dir_path] = allocator
+        return allocator
+
+
+@contextmanager
+def _open_locked(str_file_path : str):
+    """Open file for reading and writing and lock it while it's used"""
+    with open(str_file_path, "a+") as file_obj:
+        _lock_file(file_obj)
+        try:
+            file_obj.seek(0)
+            yield file_obj
+        finally:
+            _unlock_file(file_obj)
@@ -0,0 +1,185 @@
+"""Module with concurrent.futures.Executor which runs functions with JPM"""
+from __future__ import print_function
+# Standard library imports
+from typing import Optional, Any, Callable, Iterable, Iterator
+import logging
+import threading
+import time
+from concurrent.futures import Executor
+from concurrent.futures import Future
+
+# Third party imports
+
+# Local imports
+from .class_one_process import OneProcess
+from .class_one_process import ProcessFailedError
+from .function_wrapper import ChunkItemError
+
+LOGGER = logging.getLogger(__name__)
+
+
+class JupyterProcessesExecutor(Executor):
+    """concurrent.futures.Executor running functions as processes of JPM
+
+    Every function is added to the given processes manager,
+    so it gets its own output files and it's shown in the widget.
+    Futures are resolved by done callbacks of processes
+    the moment processes are over. Futures of functions which are
+    still queued (see max_workers) can be cancelled.
+    """
+
+    def __init__(self, process_manager : Any) -> None:
+        """Initialize object
+
+        Args:
+            process_manager (JupyterProcessesManager): Manager to run functions
+        """
+        self.process_manager = process_manager
+        self.list_futures = []
+        self.is_shut_down = False
+        self._lock = threading.Lock()
+
+    def submit(
+            self,
+            fn : Callable,
+            *args : Any,
+            **kwargs : Any
+    ) -> Future:
+        """Run function as process and get future for its value"""
+        with self._lock:
+            if self.is_shut_down:
+                raise RuntimeError("Cannot submit after shutdown")
+            process_obj = self.process_manager.add_function_to_processing(
+                fn, *args, **kwargs)
+            future = ProcessFuture(self.process_manager, process_obj)
+            self.list_futures.append(future)
+        return future
+
+    def map(
+            self,
+            fn : Callable,
+            *iterables : Iterable,
+            timeout : Optional[float] = None,
+            chunksize : int = 1
+    ) -> Iterator:
+        """Run function for every tuple of arguments from iterables
+
+        All processes are added at once, chunksize items are processed
+        one by one in every process.
+
+        Raises:
+            TimeoutError: Not all values are ready in given time
+            ProcessFailedError: Function raised an error or was stopped
+
+        Returns:
+            Iterator: Values returned by the function in order of arguments
+        """
+        with self._lock:
+            if self.is_shut_down:
+                raise RuntimeError("Cannot submit after shutdown")
+            list_processes = self.process_manager.starmap(
+                fn, zip(*iterables), chunksize=chunksize)
+            list_futures = [
+                ProcessFuture(self.process_manager, process_obj)
+                for process_obj in list_processes]
+            self.list_futures.extend(list_futures)
+        float_deadline = None
+        if timeout is not None:
+            float_deadline = time.monotonic() + timeout
+        return _iter_results(list_futures, float_deadline, chunksize > 1)
+
+    def shutdown(
+            self,
+            wait : bool = True,
+            *,
+            cancel_futures : bool = False
+    ) -> None:
+        """Stop accepting new functions and wait for submitted ones
+
+        Running processes are not stopped, the manager still owns them.
+        If cancel_futures is True then functions which are still queued
+        are removed from the queue and their futures are cancelled.
+        """
+        with self._lock:
+            self.is_shut_down = True
+            list_futures = self.list_futures
+            self.list_futures = []
+        if cancel_futures:
+            for future in list_futures:
+                future.cancel()
+        if wait:
+            self.process_manager.wait([
+                future.process_obj for future in list_futures
+                if not future.cancelled()])
+
+
+class ProcessFuture(Future):
+    """Future which is resolved when the process is over
+
+    It stays pending while the function is queued, so it can be cancelled
+    till then. Cancelling removes the function from the queue of the manager.
+    """
+
+    def __init__(self, process_manager : Any, process_obj : OneProcess) -> None:
+        """Initialize object
+
+        Args:
+            process_manager (JupyterProcessesManager): Manager of the process
+            process_obj (OneProcess): Process which runs the function
+        """
+        super().__init__()
+        self.process_manager = process_manager
+        self.process_obj = process_obj
+        self._lock_result = threading.Lock()
+        process_obj.add_done_callback(self._on_process_done)
+
+    def cancel(self) -> bool:
+        """Cancel the future if the function wasn't started yet"""
+        if self.done():
+            return self.cancelled()
+        # Process cancelled from the queue shouldn't resolve the future
+        self.process_obj.remove_done_callback(self._on_process_done)
+        if not self.process_manager.cancel_queued_process(self.process_obj):
+            # It's called at once if the process is over meanwhile
+            self.process_obj.add_done_callback(self._on_process_done)
+            return False
+        return super().cancel()
+
+    def running(self) -> bool:
+        """Check if the function is running now"""
+        return not self.done() and self.process_obj.dt_start_time is not None
+
+    def _on_process_done(self, process_obj : OneProcess) -> None:
+        """Copy value (or error) of the finished process into the future"""
+        with self._lock_result:
+            # Callback can be called twice if cancel() raced with the exit
+            if self.done() or not self.set_running_or_notify_cancel():
+                return None
+            try:
+                self.set_result(process_obj.result(timeout=0))
+            except ProcessFailedError as ex:
+                self.set_exception(ex)
+        return None
+
+
+def _iter_results(
+        list_futures : list[Future],
+        float_deadline : Optional[float],
+        is_chunked : bool
+) -> Iterator:
+    """Yield values of futures in order till the deadline"""
+    for future in list_futures:
+        float_seconds_left = None
+        if float_deadline is not None:
+            float_seconds_left = max(0.0, float_deadline - time.monotonic())
+        result = future.result(float_seconds_left)
+        if not is_chunked:
+            yield result
+            continue
+        for value in result:
+            if isinstance(value, ChunkItemError):
+                raise ProcessFailedError(
+                    "Process %d failed for item of the chunk:\n%s" % (
+                        future.process_obj.int_process_id,
+                        value.str_traceback))
+            yield value
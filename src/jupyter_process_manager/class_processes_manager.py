@@ -1,13 +1,18 @@
 """Main module with class which helps in handing many processes"""
 from __future__ import print_function
 # Standard library imports
-from typing import Optional, Any, Union, Callable
+from typing import Optional, Any, Union, Callable, Iterable, AsyncIterator
 import os
 import logging
+import asyncio
 from collections import OrderedDict
-from time import sleep
+from collections import deque
+import threading
+import traceback
 import datetime
 import atexit
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ALL_COMPLETED
 
 # Third party imports
 from IPython.display import clear_output
@@ -20,9 +25,54 @@ from timedelta_nice_format import timedelta_nice_format
 
 # Local imports
 from .class_one_process import OneProcess
+from .class_one_process import ProcessFailedError
+from .class_one_process import terminate_processes
+from .class_one_process import get_ids_for_new_processes
+from .class_one_process import call_soon_threadsafe
+from .function_wrapper import run_function_for_chunk
+from .function_wrapper import FLOAT_SECONDS_BETWEEN_FLUSHES
+from .class_one_process import FLOAT_SECONDS_TO_WAIT_FOR_STOP
+from .class_connections_watcher import ConnectionsWatcher
+from .class_workers_pool import WorkersPool
+from .class_shared_memory_args import SharedMemoryArgs
+from .class_shared_memory_args import INT_MIN_BYTES_TO_SHARE
+from .class_resources_sampler import ResourcesSampler
+from .class_rotating_file import INT_MAX_SEGMENTS
+from .class_shared_output import INT_SHARED_OUTPUT_BYTES
+from .class_outputs_archive import OutputsArchiver
+from .class_resources_sampler import get_nice_memory_str
+from .class_resources_sampler import get_sparkline_str
+from .class_resources_sampler import get_ram_usage
+from .class_resources_sampler import get_ram_metric
 
 LOGGER = logging.getLogger(__name__)
 
+# Output buffer size if outputs are shown from shared memory
+INT_OUTPUT_BUFFER_BYTES_IF_SHARED = 1024 * 1024
+# State of the process by its status
+DICT_STATE_BY_STATUS = {
+    "Queued": "queued",
+    "Running": "running",
+    "Just Finished": "finished",
+    "Finished": "finished",
+    "Error": "error",
+    "Terminated by user": "terminated",
+}
+LIST_STATES = ["queued", "running", "finished", "error", "terminated"]
+# States of processes to show in the table by name of the filter
+DICT_STATES_BY_FILTER = {
+    "all": None,
+    "alive": ["running"],
+    "queued": ["queued"],
+    "finished": ["finished", "error", "terminated"],
+    "errors": ["error"],
+    "terminated": ["terminated"],
+}
+LIST_TABLE_SORTS = ["id", "memory", "runtime"]
+LIST_TABLE_HEADERS = [
+    "Process Id", "Output Id", "Status", "Runtime", "Children", "CPU",
+    "RAM memory", "Peak RAM", "RAM history"]
+
 
 class JupyterProcessesManager(object):
     """Class to handle creation and showing output for many processes"""
@@ -31,7 +81,22 @@ class JupyterProcessesManager(object):
     def __init__(
             self,
             str_dir_for_output : str,
-            is_to_delete_previous_outputs : bool = True
+            is_to_delete_previous_outputs : bool = True,
+            int_max_stdout_lines : int = 1000,
+            max_workers : Optional[int] = None,
+            is_to_reuse_workers : bool = False,
+            is_to_share_big_args : bool = False,
+            int_min_bytes_to_share : int = INT_MIN_BYTES_TO_SHARE,
+            seconds_between_samples : Optional[float] = None,
+            int_history_size : int = 600,
+            int_max_output_bytes : Optional[int] = None,
+            int_max_output_segments : int = INT_MAX_SEGMENTS,
+            int_output_buffer_bytes : Optional[int] = None,
+            seconds_between_output_flushes : float = \
+                FLOAT_SECONDS_BETWEEN_FLUSHES,
+            is_to_share_outputs : bool = False,
+            int_shared_output_bytes : int = INT_SHARED_OUTPUT_BYTES,
+            str_outputs_compression : Optional[str] = None
     ) -> None:
         """Initialize object
 
@@ -39,8 +104,92 @@ class JupyterProcessesManager(object):
             str_dir_for_output (str): Path to dir where to store output files
             is_to_delete_previous_outputs (bool, optional): \
                 Flag if to delete previous output files
+            int_max_stdout_lines (int, optional): \
+                Max number of last STDOUT lines to keep in memory per process
+            max_workers (int, optional): \
+                Max number of processes running at once, other added \
+                functions are queued. None - no limit
+            is_to_reuse_workers (bool, optional): \
+                Flag if to run functions in max_workers long-lived \
+                processes (by default os.cpu_count()) instead of \
+                starting a new process for every function
+            is_to_share_big_args (bool, optional): \
+                Flag if to give big numpy arrays and bytes-like arguments \
+                to processes through shared memory without copying them
+            int_min_bytes_to_share (int, optional): \
+                Min size of the argument to give it through shared memory
+            seconds_between_samples (float, optional): \
+                Seconds between samples of resources usage of running \
+                processes which are saved in background. Every sample \
+                reads memory maps of all running processes, so it's off \
+                by default. None - don't save
+            int_history_size (int, optional): \
+                Max number of resources usage samples to keep per process
+            int_max_output_bytes (int, optional): \
+                Max size of STDOUT (and STDERR) file of the process, \
+                when it's reached the file is rotated into segments. \
+                None - size of output is not limited
+            int_max_output_segments (int, optional): \
+                Max number of rotated segments to keep per output file, \
+                the first segment (head of the output) is always kept
+            int_output_buffer_bytes (int, optional): \
+                Size of write buffers for outputs of processes, \
+                buffers are flushed in background every \
+                seconds_between_output_flushes. None - line buffering \
+                (every printed line is written to the file at once)
+            seconds_between_output_flushes (float, optional): \
+                Seconds between flushes of output buffers
+            is_to_share_outputs (bool, optional): \
+                Flag if to pass STDOUT of running processes through \
+                ring buffers in shared memory, so it's shown without \
+                waiting for the file system. Output files are still \
+                written, but with block buffering (1 MB by default)
+            int_shared_output_bytes (int, optional): \
+                Size of the ring buffer for STDOUT of every running process
+            str_outputs_compression (str, optional): \
+                Codec to compress output files of finished processes \
+                with in background: "gzip", "lzma" or "zstd" \
+                (needs zstandard package). None - don't compress
         """
+        if max_workers is not None and max_workers < 1:
+            raise ValueError("max_workers should be at least 1")
+        if int_max_output_bytes is not None:
+            if int_max_output_bytes < 1:
+                raise ValueError("int_max_output_bytes should be at least 1")
+            if int_max_output_segments < 2:
+                raise ValueError("int_max_output_segments should be at least 2")
+        if int_output_buffer_bytes is not None and int_output_buffer_bytes < 2:
+            raise ValueError("int_output_buffer_bytes should be at least 2")
+        if is_to_share_outputs and int_output_buffer_bytes is None:
+            # Output is shown from shared memory, files can be written lazily
+            int_output_buffer_bytes = INT_OUTPUT_BUFFER_BYTES_IF_SHARED
+        self.outputs_archiver = None
+        if str_outputs_compression is not None:
+            self.outputs_archiver = OutputsArchiver(str_outputs_compression)
+        # How processes write outputs (see open_output_file())
+        self.dict_output_settings = {
+            "int_max_bytes": int_max_output_bytes,
+            "int_max_segments": int_max_output_segments,
+            "int_buffer_bytes": int_output_buffer_bytes,
+            "float_flush_seconds": seconds_between_output_flushes,
+            "int_shared_output_bytes":
+                int_shared_output_bytes if is_to_share_outputs else None,
+        }
         self.int_processes = 0
+        self.int_max_stdout_lines = int_max_stdout_lines
+        self.connections_watcher = ConnectionsWatcher()
+        self.workers_pool = None
+        if is_to_reuse_workers:
+            if max_workers is None:
+                max_workers = os.cpu_count() or 1
+            self.workers_pool = WorkersPool(
+                max_workers, self.connections_watcher)
+        self.max_workers = max_workers
+        self.shared_memory_args = None
+        if is_to_share_big_args:
+            self.shared_memory_args = SharedMemoryArgs(
+                int_min_bytes_to_share=int_min_bytes_to_share)
+            atexit.register(self.shared_memory_args.remove_all)
         # Create directory where to store processes output
         self.str_dir_for_output = os.path.join(
             str_dir_for_output, "processes_output")
@@ -50,6 +199,22 @@ class JupyterProcessesManager(object):
             self._delete_all_previous_outputs()
         self.dict_all_processes_by_id = OrderedDict()
         self.dict_alive_processes_by_id = OrderedDict()
+        # Rows of the table for processes which are over
+        self._dict_final_row_by_process_id = {}
+        # IDs of processes by their state, updated on every status change
+        self.dict_process_ids_by_state = {
+            str_state: set() for str_state in LIST_STATES}
+        # Status of the process and sets of states are changed together
+        self._lock_states = threading.RLock()
+        self.resources_sampler = ResourcesSampler(
+            int_history_size=int_history_size)
+        self.is_resources_history_on = seconds_between_samples is not None
+        if self.is_resources_history_on:
+            self.resources_sampler.start_background_sampling(
+                self._get_pid_by_process_id, seconds_between_samples)
+        # Functions waiting for a free worker: (process, func, args, kwargs)
+        self.deque_queued_processes = deque()
+        self._lock = threading.RLock()
         self.dt_processes_started_at = None
         from .gui.widget import WidgetProcessesManager
         self.gui_widget = WidgetProcessesManager(self)
@@ -80,19 +245,283 @@ class JupyterProcessesManager(object):
             func_to_process : Callable,
             *args : Any,
             **kwargs : Any
-    ) -> None:
+    ) -> OneProcess:
         """Start running function as process
 
+        If max_workers processes are already running
+        then the function is queued and started when some process is over
+
         Args:
             func_to_process (function): Function to add for processing
+
+        Returns:
+            OneProcess: Object to handle the new process
         """
-        new_process = OneProcess(self.str_dir_for_output)
-        new_process.start_process(func_to_process, *args, **kwargs)
-        if not self.dict_alive_processes_by_id:
-            self.dt_processes_started_at = datetime.datetime.now()
-        self.dict_all_processes_by_id[new_process.int_process_id] = new_process
-        self.dict_alive_processes_by_id[new_process.int_process_id] = new_process
+        return self._add_processes_to_queue(
+            [(func_to_process, args, kwargs)])[0]
+
+    def submit(
+            self,
+            func_to_process : Callable,
+            *args : Any,
+            **kwargs : Any
+    ) -> OneProcess:
+        """Start running function as process (or queue it)
+
+        Returned object can be awaited in asyncio to get value of the function:
+        value = await process_manager.submit(func, *args, **kwargs)
+
+        Args:
+            func_to_process (function): Function to add for processing
+
+        Returns:
+            OneProcess: Object to handle the new process
+        """
+        return self.add_function_to_processing(func_to_process, *args, **kwargs)
+
+    @char
+    def map(
+            self,
+            func_to_process : Callable,
+            iterable : Iterable,
+            chunksize : int = 1,
+            on_done : Optional[Callable] = None
+    ) -> list[OneProcess]:
+        """Run function for every item of the iterable as separate processes
+
+        Args:
+            func_to_process (function): Function to add for processing
+            iterable (Iterable): Items to give one by one to the function
+            chunksize (int, optional): \
+                Number of items to process one by one in one process
+            on_done (function, optional): \
+                Function to call with OneProcess object when it's over
+
+        Returns:
+            list: OneProcess objects, one for every chunk
+        """
+        return self.starmap(
+            func_to_process, ((item,) for item in iterable), chunksize,
+            on_done=on_done)
+
+    @char
+    def starmap(
+            self,
+            func_to_process : Callable,
+            iterable : Iterable,
+            chunksize : int = 1,
+            on_done : Optional[Callable] = None
+    ) -> list[OneProcess]:
+        """Run function for every tuple of arguments as separate processes
+
+        IDs for all processes are taken at once and GUI is updated once.
+
+        Args:
+            func_to_process (function): Function to add for processing
+            iterable (Iterable): Tuples of arguments for the function
+            chunksize (int, optional): \
+                Number of tuples to process one by one in one process
+            on_done (function, optional): \
+                Function to call with OneProcess object when it's over
+
+        Returns:
+            list: OneProcess objects, one for every chunk
+        """
+        if chunksize < 1:
+            raise ValueError("chunksize should be at least 1")
+        list_tuples_args = [tuple(args) for args in iterable]
+        list_tuples_to_process = []
+        for int_start in range(0, len(list_tuples_args), chunksize):
+            list_chunk = list_tuples_args[int_start:int_start + chunksize]
+            if chunksize == 1:
+                list_tuples_to_process.append(
+                    (func_to_process, list_chunk[0], {}))
+            else:
+                list_tuples_to_process.append(
+                    (run_function_for_chunk, (func_to_process, list_chunk), {}))
+        return self._add_processes_to_queue(
+            list_tuples_to_process, on_done=on_done)
+
+    def _add_processes_to_queue(
+            self,
+            list_tuples_to_process : list[tuple],
+            on_done : Optional[Callable] = None
+    ) -> list[OneProcess]:
+        """Create processes for (function, args, kwargs) tuples and queue them
+
+        Args:
+            on_done (function, optional): \
+                Function to call with OneProcess object when it's over
+
+        Returns:
+            list: New OneProcess objects
+        """
+        if not list_tuples_to_process:
+            return []
+        list_new_processes = [
+            OneProcess(
+                self.str_dir_for_output,
+                int_max_stdout_lines=self.int_max_stdout_lines,
+                int_process_id=int_process_id,
+                connections_watcher=self.connections_watcher,
+                func_on_exit=self._on_process_exit,
+                func_on_status_change=self._on_status_change,
+                dict_output_settings=self.dict_output_settings,
+                resources_sampler=self.resources_sampler,
+                lock_status=self._lock_states,
+            )
+            for int_process_id in get_ids_for_new_processes(
+                self.str_dir_for_output, len(list_tuples_to_process))
+        ]
+        if on_done is not None:
+            for new_process in list_new_processes:
+                new_process.add_done_callback(on_done)
+        with self._lock:
+            for new_process, (func_to_process, args, kwargs) in zip(
+                    list_new_processes, list_tuples_to_process):
+                self.dict_all_processes_by_id[new_process.int_process_id] = \
+                    new_process
+                new_process.str_status = "Queued"
+                self.deque_queued_processes.append(
+                    (new_process, func_to_process, args, kwargs))
+            self._start_queued_processes()
         self.gui_widget.update_widget()
+        return list_new_processes
+
+    def _start_queued_processes(self) -> None:
+        """Start queued functions while there are free workers"""
+        with self._lock:
+            while self.deque_queued_processes:
+                if (
+                        self.max_workers is not None and
+                        len(self.dict_alive_processes_by_id) >= self.max_workers
+                ):
+                    break
+                new_process, func_to_process, args, kwargs = \
+                    self.deque_queued_processes.popleft()
+                try:
+                    if self.shared_memory_args is not None:
+                        args, kwargs = self._share_big_args(
+                            new_process, args, kwargs)
+                    if self.workers_pool is not None:
+                        new_process.start_process_in_workers_pool(
+                            self.workers_pool, func_to_process, *args, **kwargs)
+                    else:
+                        new_process.start_process(
+                            func_to_process, *args, **kwargs)
+                except Exception:
+                    LOGGER.warning(
+                        "Unable to start process %d",
+                        new_process.int_process_id)
+                    new_process.save_error_of_start(traceback.format_exc())
+                    continue
+                new_process.str_status = "Running"
+                if not self.dict_alive_processes_by_id:
+                    self.dt_processes_started_at = datetime.datetime.now()
+                self.dict_alive_processes_by_id[new_process.int_process_id] = \
+                    new_process
+                self.resources_sampler.notify_processes_started()
+
+    def cancel_queued_process(self, process_obj : OneProcess) -> bool:
+        """Remove the process from the queue if it wasn't started yet
+
+        Returns:
+            bool: True if the process was cancelled, \
+                False if it was started already
+        """
+        with self._lock:
+            for tuple_queued in self.deque_queued_processes:
+                if tuple_queued[0] is process_obj:
+                    self.deque_queued_processes.remove(tuple_queued)
+                    break
+            else:
+                return False
+        process_obj.str_status = "Terminated by user"
+        process_obj.save_result(None)
+        return True
+
+    def _share_big_args(
+            self,
+            process_obj : OneProcess,
+            args : tuple,
+            kwargs : dict
+    ) -> tuple[tuple, dict]:
+        """Put big arguments into shared memory till the process is over"""
+        args, kwargs, list_names = self.shared_memory_args.share_args(
+            args, kwargs)
+        if list_names:
+            process_obj.add_done_callback(
+                lambda _: self.shared_memory_args.release(list_names))
+        return args, kwargs
+
+    def _get_pid_by_process_id(self) -> dict[int, int]:
+        """Get PIDs of all running processes by process ID"""
+        dict_pid_by_process_id = {}
+        for process_num, process_obj in list(
+                self.dict_alive_processes_by_id.items()):
+            int_pid = process_obj.get_pid()
+            if int_pid is not None:
+                dict_pid_by_process_id[process_num] = int_pid
+        return dict_pid_by_process_id
+
+    def _on_status_change(
+            self,
+            process_obj : OneProcess,
+            str_old_status : str,
+            str_new_status : str
+    ) -> None:
+        """Move process to the set of its new state
+
+        It's called with _lock_states acquired by the status setter.
+        """
+        str_old_state = DICT_STATE_BY_STATUS.get(str_old_status)
+        str_new_state = DICT_STATE_BY_STATUS.get(str_new_status)
+        if str_old_state == str_new_state:
+            return None
+        with self._lock_states:
+            if str_old_state is not None:
+                self.dict_process_ids_by_state[str_old_state].discard(
+                    process_obj.int_process_id)
+            if str_new_state is not None:
+                self.dict_process_ids_by_state[str_new_state].add(
+                    process_obj.int_process_id)
+        return None
+
+    def get_number_of_processes_by_state(self) -> dict[str, int]:
+        """Get number of processes in every state
+
+        States are: queued, running, finished, error, terminated
+        """
+        with self._lock_states:
+            return {
+                str_state: len(set_ids)
+                for str_state, set_ids in self.dict_process_ids_by_state.items()}
+
+    def get_process_ids_by_state(self, str_state : str) -> list[int]:
+        """Get sorted IDs of processes in the state"""
+        with self._lock_states:
+            return sorted(self.dict_process_ids_by_state[str_state])
+
+    def remove_process(self, int_process_id : int) -> None:
+        """Forget the process which is over (its output files are kept)"""
+        process_obj = self.dict_all_processes_by_id.pop(int_process_id, None)
+        if process_obj is None:
+            return None
+        with self._lock_states:
+            process_obj.func_on_status_change = None
+            for set_ids in self.dict_process_ids_by_state.values():
+                set_ids.discard(int_process_id)
+        self._dict_final_row_by_process_id.pop(int_process_id, None)
+        self.resources_sampler.remove_history(int_process_id)
+        return None
+
+    def _on_process_exit(self, process_obj : OneProcess) -> None:
+        """Forget finished process and start queued functions instead of it"""
+        with self._lock:
+            self.dict_alive_processes_by_id.pop(process_obj.int_process_id, None)
+            self._start_queued_processes()
+        if self.outputs_archiver is not None:
+            self.outputs_archiver.add(process_obj)
 
     # @char
     # def remove_process(
@@ -117,6 +546,23 @@ class JupyterProcessesManager(object):
 
 
 
+    def results(self) -> OrderedDict:
+        """Get values returned by all successfully finished functions
+
+        Returns:
+            OrderedDict: Returned values by process ID
+        """
+        dict_results_by_id = OrderedDict()
+        for process_num, process_obj in list(
+                self.dict_all_processes_by_id.items()):
+            if not process_obj.is_result_ready():
+                continue
+            try:
+                dict_results_by_id[process_num] = process_obj.result(timeout=0)
+            except ProcessFailedError:
+                continue
+        return dict_results_by_id
+
     @char
     def debug_run_of_1_function(
             self,
@@ -127,10 +573,147 @@ class JupyterProcessesManager(object):
         """
         Run given function in the current process to check that it is runnable
         """
-        new_process = OneProcess(self.str_dir_for_output)
+        new_process = OneProcess(
+            self.str_dir_for_output,
+            int_max_stdout_lines=self.int_max_stdout_lines,
+            func_on_status_change=self._on_status_change,
+            dict_output_settings=self.dict_output_settings,
+            lock_status=self._lock_states)
         new_process.debug_run_of_the_func(func_to_process, *args, **kwargs)
         self.dict_all_processes_by_id[new_process.int_process_id] = new_process
-        self.dict_alive_processes_by_id[new_process.int_process_id] = new_process
+
+    def wait(
+            self,
+            list_processes : Optional[Iterable[OneProcess]] = None,
+            timeout : Optional[float] = None,
+            return_when : str = ALL_COMPLETED
+    ) -> tuple[list[OneProcess], list[OneProcess]]:
+        """Wait till given processes are over without polling them
+
+        Args:
+            list_processes (Iterable, optional): \
+                Processes to wait for, None - all added processes
+            timeout (float, optional): Max seconds to wait, None - forever
+            return_when (str, optional): \
+                FIRST_COMPLETED - return when any process is over, \
+                ALL_COMPLETED - return when all processes are over
+
+        Returns:
+            tuple: (processes which are over, processes which are not over)
+        """
+        if return_when not in (FIRST_COMPLETED, ALL_COMPLETED):
+            raise ValueError("Unsupported return_when: %s" % return_when)
+        if list_processes is None:
+            list_processes = list(self.dict_all_processes_by_id.values())
+        else:
+            list_processes = list(list_processes)
+        condition_done = threading.Condition()
+        set_done_ids = set()
+
+        def on_done(process_obj):
+            with condition_done:
+                set_done_ids.add(id(process_obj))
+                condition_done.notify_all()
+
+        for process_obj in list_processes:
+            process_obj.add_done_callback(on_done)
+        int_to_wait = len(list_processes)
+        if return_when == FIRST_COMPLETED:
+            int_to_wait = min(1, int_to_wait)
+        try:
+            with condition_done:
+                condition_done.wait_for(
+                    lambda: len(set_done_ids) >= int_to_wait, timeout)
+                set_done_ids = set(set_done_ids)
+        finally:
+            # Callbacks of processes which are not over aren't needed anymore
+            for process_obj in list_processes:
+                process_obj.remove_done_callback(on_done)
+        list_done = [
+            process_obj for process_obj in list_processes
+            if id(process_obj) in set_done_ids]
+        list_not_done = [
+            process_obj for process_obj in list_processes
+            if id(process_obj) not in set_done_ids]
+        return list_done, list_not_done
+
+    async def wait_async(
+            self,
+            list_processes : Optional[Iterable[OneProcess]] = None,
+            timeout : Optional[float] = None,
+            return_when : str = ALL_COMPLETED
+    ) -> tuple[list[OneProcess], list[OneProcess]]:
+        """Wait till given processes are over without blocking the event loop
+
+        Arguments are the same as for wait(...)
+
+        Returns:
+            tuple: (processes which are over, processes which are not over)
+        """
+        if return_when not in (FIRST_COMPLETED, ALL_COMPLETED):
+            raise ValueError("Unsupported return_when: %s" % return_when)
+        if list_processes is None:
+            list_processes = list(self.dict_all_processes_by_id.values())
+        else:
+            list_processes = list(list_processes)
+        try:
+            async for _ in self.as_completed(list_processes, timeout=timeout):
+                if return_when == FIRST_COMPLETED:
+                    break
+        except TimeoutError:
+            pass
+        list_done = [
+            process_obj for process_obj in list_processes
+            if process_obj.is_result_ready()]
+        list_not_done = [
+            process_obj for process_obj in list_processes
+            if not process_obj.is_result_ready()]
+        return list_done, list_not_done
+
+    async def as_completed(
+            self,
+            list_processes : Optional[Iterable[OneProcess]] = None,
+            timeout : Optional[float] = None
+    ) -> AsyncIterator[OneProcess]:
+        """Get processes one by one in the order they are over
+
+        Usage: async for process_obj in process_manager.as_completed(): ...
+
+        Args:
+            list_processes (Iterable, optional): \
+                Processes to wait for, None - all added processes
+            timeout (float, optional): \
+                Max seconds to wait for all processes, None - forever
+
+        Raises:
+            TimeoutError: Not all processes are over in given time
+        """
+        if list_processes is None:
+            list_processes = list(self.dict_all_processes_by_id.values())
+        else:
+            list_processes = list(list_processes)
+        loop = asyncio.get_running_loop()
+        queue_done = asyncio.Queue()
+
+        def on_done(process_obj):
+            call_soon_threadsafe(loop, queue_done.put_nowait, process_obj)
+
+        for process_obj in list_processes:
+            process_obj.add_done_callback(on_done)
+        float_deadline = None if timeout is None else loop.time() + timeout
+        try:
+            for _ in range(len(list_processes)):
+                float_seconds_left = None
+                if float_deadline is not None:
+                    float_seconds_left = max(0.0, float_deadline - loop.time())
+                try:
+                    yield await asyncio.wait_for(
+                        queue_done.get(), float_seconds_left)
+                except asyncio.TimeoutError:
+                    raise TimeoutError("Not all processes are over in time")
+        finally:
+            for process_obj in list_processes:
+                process_obj.remove_done_callback(on_done)
 
     @char
     def wait_till_all_processes_are_over(
@@ -140,6 +723,8 @@ class JupyterProcessesManager(object):
     ) -> None:
         """Wait while processes are running and print information during it
 
+        It returns the moment the last process is over.
+
         Args:
             int_seconds_step (int,): Seconds to update processes info
             int_max_processes_to_show (int): \
@@ -150,13 +735,17 @@ class JupyterProcessesManager(object):
             int_max_processes_to_show=int_max_processes_to_show)
         try:
             while True:
-                if not self.dict_alive_processes_by_id:
+                list_not_done = [
+                    process_obj
+                    for process_obj in list(
+                        self.dict_all_processes_by_id.values())
+                    if not process_obj.is_result_ready()]
+                if not list_not_done:
                     break
                 with yaspin() as spinner_obj:
-                    for i in range(int_seconds_step):
-                        spinner_obj.text = "Updating in {} seconds".format(
-                            int_seconds_step - i)
-                        sleep(1)
+                    spinner_obj.text = "Waiting for {} processes".format(
+                        len(list_not_done))
+                    self.wait(list_not_done, timeout=int_seconds_step)
                 clear_output(wait=True)
                 self.print_info_about_running_processes(
                     int_max_processes_to_show=int_max_processes_to_show)
@@ -168,87 +757,304 @@ class JupyterProcessesManager(object):
         print("All processes were finished")
 
     @char
-    def terminate_all_alive_processes(self) -> None:
-        """Terminate all alive processes"""
+    def terminate_all_alive_processes(
+            self,
+            timeout : float = FLOAT_SECONDS_TO_WAIT_FOR_STOP
+    ) -> dict[int, str]:
+        """Terminate all alive processes at once
+
+        Workers of the pool (if any) are stopped too,
+        new ones are started only when new functions are added.
+
+        Args:
+            timeout (float, optional): \
+                Seconds to wait for processes to stop by KeyboardInterrupt \
+                before killing them
+
+        Returns:
+            dict: How every process was stopped by process ID
+        """
         print("Terminating all alive processes")
+        with self._lock:
+            while self.deque_queued_processes:
+                process_obj = self.deque_queued_processes.popleft()[0]
+                process_obj.str_status = "Terminated by user"
+                process_obj.save_result(None)
+        dict_outcome_by_id = terminate_processes(
+            list(self.dict_alive_processes_by_id.values()), timeout=timeout)
+        for process_num, str_outcome in dict_outcome_by_id.items():
+            print("---> Process %d: %s" % (process_num, str_outcome))
         for process_num in list(self.dict_alive_processes_by_id):
-            print("---> Terminate process: ", process_num + 1)
             process_obj = self.dict_alive_processes_by_id[process_num]
-            process_obj.terminate()
             if not process_obj.is_alive():
                 self.dict_alive_processes_by_id.pop(process_num, None)
-                print("------> Done")
+        self._shutdown_workers_pool()
+        print("------> Done")
         self.gui_widget.update_widget()
+        return dict_outcome_by_id
+
+    def _shutdown_workers_pool(self) -> None:
+        """Stop all workers of the pool and replace it with an empty one"""
+        with self._lock:
+            workers_pool = self.workers_pool
+            if workers_pool is None:
+                return None
+            self.workers_pool = WorkersPool(
+                workers_pool.int_workers, self.connections_watcher)
+        workers_pool.shutdown()
+        return None
 
     @char
     def print_info_about_running_processes(
             self,
-            int_max_processes_to_show : int = 20
+            int_max_processes_to_show : int = 20,
+            int_page : int = 0,
+            str_filter : str = "all",
+            str_sort_by : str = "id"
     ) -> None:
-        """Print information string about current processes"""
+        """Print information string about current processes
+
+        Args:
+            int_max_processes_to_show (int, optional): \
+                Max number of processes to show at once in the table
+            int_page (int, optional): Number of the page of the table to show
+            str_filter (str, optional): \
+                Which processes to show: \
+                all, alive, queued, finished, errors, terminated
+            str_sort_by (str, optional): \
+                How to sort processes: id, memory, runtime
+        """
         display(HTML("<h2>Processes conditions:</h2>"))
         # print("Conditions of the processes:")
-        if self.dt_processes_started_at is not None:
-            timedelta = datetime.datetime.now() - self.dt_processes_started_at
-            print("Working for:", timedelta_nice_format(timedelta))
+        str_working_time = self.get_working_time_str()
+        if str_working_time:
+            print(str_working_time)
 
 
         self._print_table_with_conditions(
-            int_max_processes_to_show=int_max_processes_to_show)
+            int_max_processes_to_show=int_max_processes_to_show,
+            int_page=int_page,
+            str_filter=str_filter,
+            str_sort_by=str_sort_by,
+        )
+
 
+        print(self.get_summary_str())
 
-        print(
-            "ALIVE PROCESSES: ",
-            len(self.dict_alive_processes_by_id), "/",
+    def get_working_time_str(self) -> str:
+        """Get string with time since processes were started"""
+        if self.dt_processes_started_at is None:
+            return ""
+        timedelta = datetime.datetime.now() - self.dt_processes_started_at
+        return "Working for: " + timedelta_nice_format(timedelta)
+
+    def get_summary_str(self) -> str:
+        """Get string with numbers of processes in every state"""
+        str_summary = "ALIVE PROCESSES:  %d / %d" % (
+            len(self.dict_alive_processes_by_id),
             len(self.dict_all_processes_by_id))
+        dict_number_by_state = self.get_number_of_processes_by_state()
+        str_states = ", ".join(
+            "%s: %d" % (str_state.upper(), dict_number_by_state[str_state])
+            for str_state in LIST_STATES
+            if dict_number_by_state[str_state])
+        if str_states:
+            str_summary += "\n" + str_states
+        return str_summary
 
     @char
     def _print_table_with_conditions(
             self,
-            int_max_processes_to_show : int = 20
+            int_max_processes_to_show : int = 20,
+            int_page : int = 0,
+            str_filter : str = "all",
+            str_sort_by : str = "id"
     ) -> None:
-        """Print table with processes conditions"""
-        list_list_processes_info = []
-        list_headers = [
-            "Process Id", "Output Id", "Status", "Runtime", "RAM memory"]
-        for process_num in list(self.dict_all_processes_by_id):
-            list_process_info = []
-            process_obj = self.dict_all_processes_by_id[process_num]
-            # Delete if process is not alive
-            if process_num in self.dict_alive_processes_by_id:
-                if not process_obj.is_alive():
-                    self.dict_alive_processes_by_id.pop(process_num, None)
-
-
-
-            # "Process Id"
-            list_process_info.append(process_obj.get_pid())
-            # "Output Id"
-            list_process_info.append(process_num)
-            # "Status"
-            list_process_info.append(process_obj.str_status)
-            # "Runtime"
-            str_runtime = process_obj.get_how_long_this_process_is_running()
-            list_process_info.append(str_runtime)
-            list_list_processes_info.append(list_process_info)
-            # "RAM memory"
-            list_process_info.append(process_obj.get_mem_usage())
-        if len(list_list_processes_info) > int_max_processes_to_show:
-            list_list_additional_columns = []
-            list_list_additional_columns.append(["---", "---", "---"])
-            str_num = str(
-                len(list_list_processes_info) - int_max_processes_to_show)
-            list_list_additional_columns.append(
-                ["Processes", "Hidden", str_num])
-            list_list_additional_columns.append(["---", "---", "---"])
-            list_list_processes_info = \
-                list_list_additional_columns + list_list_processes_info[:20]
+        """Print one page of the table with processes conditions"""
+        list_list_processes_info, str_info = self.get_table_with_conditions(
+            int_max_processes_to_show=int_max_processes_to_show,
+            int_page=int_page,
+            str_filter=str_filter,
+            str_sort_by=str_sort_by,
+        )
         # github  psql  orgtbl  pretty
         if list_list_processes_info:
             print(tabulate(
-                list_list_processes_info, headers=list_headers, tablefmt="pretty"))
+                list_list_processes_info,
+                headers=LIST_TABLE_HEADERS,
+                tablefmt="pretty"))
+        if str_info:
+            print(str_info)
+
+    @char
+    def get_table_with_conditions(
+            self,
+            int_max_processes_to_show : int = 20,
+            int_page : int = 0,
+            str_filter : str = "all",
+            str_sort_by : str = "id"
+    ) -> tuple[list[list], str]:
+        """Get rows of one page of the table with processes conditions
+
+        Rows are computed only for processes on the page,
+        rows of processes which are over are computed only once.
+        Columns are the same as in LIST_TABLE_HEADERS.
+
+        Returns:
+            tuple: Rows, string with info about pages (or why it's empty)
+        """
+        if int_max_processes_to_show < 1:
+            raise ValueError("int_max_processes_to_show should be at least 1")
+        if str_filter not in DICT_STATES_BY_FILTER:
+            raise ValueError("Unknown filter: %s" % str_filter)
+        if str_sort_by not in LIST_TABLE_SORTS:
+            raise ValueError("Unknown sorting: %s" % str_sort_by)
+        list_states = DICT_STATES_BY_FILTER[str_filter]
+        if list_states is None:
+            list_processes = list(self.dict_all_processes_by_id.values())
         else:
-            print("No Processes started yet")
+            list_process_ids = []
+            for str_state in list_states:
+                list_process_ids.extend(self.get_process_ids_by_state(str_state))
+            list_processes = [
+                self.dict_all_processes_by_id[process_num]
+                for process_num in sorted(list_process_ids)
+                if process_num in self.dict_all_processes_by_id]
+        if not list_processes:
+            if self.dict_all_processes_by_id:
+                return [], "No processes to show for filter: " + str_filter
+            return [], "No Processes started yet"
+        # Only alive processes use resources, get usage of all of them
+        # if it's needed for sorting, otherwise only for shown ones
+        dict_usage_by_process_id = {}
+        if str_sort_by == "memory":
+            dict_usage_by_process_id = \
+                self._get_resources_usage_by_process_id()
+            list_processes.sort(
+                key=lambda process_obj: get_ram_usage(
+                    dict_usage_by_process_id.get(process_obj.int_process_id)),
+                reverse=True)
+        elif str_sort_by == "runtime":
+            list_processes.sort(key=_get_runtime, reverse=True)
+        int_pages = (
+            (len(list_processes) - 1) // int_max_processes_to_show + 1)
+        int_page = min(max(int_page, 0), int_pages - 1)
+        int_first = int_page * int_max_processes_to_show
+        list_processes_to_show = list_processes[
+            int_first:int_first + int_max_processes_to_show]
+        if str_sort_by != "memory":
+            dict_usage_by_process_id = \
+                self._get_resources_usage_by_process_id(
+                    process_obj.int_process_id
+                    for process_obj in list_processes_to_show)
+        list_list_processes_info = [
+            self._get_table_row(
+                process_obj,
+                dict_usage_by_process_id.get(process_obj.int_process_id))
+            for process_obj in list_processes_to_show]
+        str_info = ""
+        if int_pages > 1:
+            str_info = "Page %d / %d, processes %d-%d of %d" % (
+                int_page + 1, int_pages, int_first + 1,
+                int_first + len(list_processes_to_show), len(list_processes))
+        return list_list_processes_info, str_info
+
+    def _get_table_row(
+            self,
+            process_obj : OneProcess,
+            dict_usage : Optional[dict]
+    ) -> list:
+        """Get row of the table with conditions of the process
+
+        Row of the process which is over is saved and reused
+        while the status of the process is the same.
+        """
+        process_num = process_obj.int_process_id
+        str_status = process_obj.str_status
+        tuple_cached = self._dict_final_row_by_process_id.get(process_num)
+        if tuple_cached is not None and tuple_cached[0] == str_status:
+            return tuple_cached[1]
+        history = self.resources_sampler.get_history(process_num)
+        list_process_info = []
+        # "Process Id"
+        list_process_info.append(process_obj.get_pid())
+        # "Output Id"
+        list_process_info.append(process_num)
+        # "Status"
+        list_process_info.append(str_status)
+        # "Runtime"
+        str_runtime = process_obj.get_how_long_this_process_is_running()
+        list_process_info.append(str_runtime)
+        # "Children"
+        if dict_usage is None:
+            list_process_info.append("None")
+        else:
+            list_process_info.append(int(dict_usage["num_processes"]) - 1)
+        # "CPU"
+        if dict_usage is None:
+            list_process_info.append("None")
+        else:
+            list_process_info.append("%.0f%%" % dict_usage["cpu_percent"])
+        # "RAM memory"
+        if dict_usage is None:
+            list_process_info.append("None")
+        else:
+            # PSS doesn't count memory shared by children twice
+            list_process_info.append(
+                get_nice_memory_str(get_ram_usage(dict_usage)))
+        # "Peak RAM" and "RAM history"
+        if history is None:
+            list_process_info.extend(["None", ""])
+        else:
+            str_metric = get_ram_metric(history)
+            list_process_info.append(
+                get_nice_memory_str(history.get_peak(str_metric)))
+            list_process_info.append(
+                get_sparkline_str(history.get_values(str_metric)))
+        if process_obj.dt_finish_time is not None:
+            self._dict_final_row_by_process_id[process_num] = \
+                (str_status, list_process_info)
+        return list_process_info
+
+    def _get_resources_usage_by_process_id(
+            self,
+            iter_process_ids : Optional[Iterable[int]] = None
+    ) -> dict[int, dict]:
+        """Get last resources usage of running processes at once
+
+        If resources usage is saved in background then the last saved
+        sample is used, otherwise all processes are sampled now.
+
+        Args:
+            iter_process_ids (Iterable, optional): \
+                IDs of processes to get usage for, None - all running
+        """
+        dict_pid_by_process_id = self._get_pid_by_process_id()
+        if iter_process_ids is not None:
+            dict_pid_by_process_id = {
+                process_num: dict_pid_by_process_id[process_num]
+                for process_num in iter_process_ids
+                if process_num in dict_pid_by_process_id}
+        dict_usage_by_process_id = {}
+        if self.is_resources_history_on:
+            for process_num in dict_pid_by_process_id:
+                history = self.resources_sampler.get_history(process_num)
+                if history is None or not len(history):
+                    continue
+                dict_usage_by_process_id[process_num] = {
+                    "cpu_percent": history.get_last("cpu_percent"),
+                    "rss": history.get_last("rss"),
+                    "uss": history.get_last("uss"),
+                    "pss": history.get_last("pss"),
+                    "num_processes": history.get_last("num_processes"),
+                }
+            return dict_usage_by_process_id
+        dict_usage_by_pid = self.resources_sampler.sample(
+            dict_pid_by_process_id.values(), is_full_info=True)
+        for process_num, int_pid in dict_pid_by_process_id.items():
+            if int_pid in dict_usage_by_pid:
+                dict_usage_by_process_id[process_num] = dict_usage_by_pid[int_pid]
+        return dict_usage_by_process_id
 
     def _delete_all_previous_outputs(self) -> None:
         """Delete outputs of all previous processes"""
@@ -262,3 +1068,12 @@ class JupyterProcessesManager(object):
                 except Exception as ex:
                     print("Cant DELETE previous thread file: ", str_filename)
                     print(ex)
+
+
+
+def _get_runtime(process_obj : OneProcess) -> datetime.timedelta:
+    """Get how long the process is (or was) running"""
+    if process_obj.dt_start_time is None:
+        return datetime.timedelta(0)
+    dt_finish_time = process_obj.dt_finish_time or datetime.datetime.now()
+    return dt_finish_time - process_obj.dt_start_time
@@ -0,0 +1,361 @@
+"""Module with class to get resources usage of many processes at once"""
+from __future__ import print_function
+# Standard library imports
+from typing import Iterable, Optional, Callable
+import logging
+import threading
+import time
+
+# Third party imports
+import psutil
+from round_to_n_significant_digits import rtnsd
+
+# Local imports
+from .class_ring_buffer import RingBuffer
+
+LOGGER = logging.getLogger(__name__)
+
+# Metrics which are kept in the history of every process
+LIST_METRICS = [
+    "cpu_percent", "rss", "uss", "pss", "num_threads", "num_processes",
+    "read_bytes", "write_bytes"]
+STR_SPARKLINE_CHARS = "▁▂▃▄▅▆▇█"
+# Metrics of RAM usage from the best to the worst one. PSS (Linux only)
+# and USS don't count pages shared by processes of the tree many times
+LIST_RAM_METRICS = ["pss", "uss", "rss"]
+
+
+class ResourcesHistory(object):
+    """Class with last N samples of resources usage of one process
+
+    Every metric is stored in its own array-backed ring buffer.
+    Peak values are kept for the whole life of the process.
+    """
+
+    def __init__(self, int_size : int) -> None:
+        """Initialize object
+
+        Args:
+            int_size (int): Max number of samples to keep
+        """
+        self.ring_times = RingBuffer(int_size)
+        self.dict_ring_by_metric = {
+            str_metric: RingBuffer(int_size) for str_metric in LIST_METRICS}
+        self.dict_peak_by_metric = {
+            str_metric: 0.0 for str_metric in LIST_METRICS}
+
+    def __len__(self) -> int:
+        """Get number of samples in the history"""
+        return len(self.ring_times)
+
+    def add_sample(self, float_time : float, dict_usage : dict) -> None:
+        """Add one sample of resources usage"""
+        self.ring_times.append(float_time)
+        for str_metric in LIST_METRICS:
+            float_value = float(dict_usage.get(str_metric, 0.0))
+            self.dict_ring_by_metric[str_metric].append(float_value)
+            if float_value > self.dict_peak_by_metric[str_metric]:
+                self.dict_peak_by_metric[str_metric] = float_value
+
+    def get_values(self, str_metric : str) -> list[float]:
+        """Get all kept values of the metric from the oldest to the newest"""
+        return self.dict_ring_by_metric[str_metric].get_values()
+
+    def get_last(self, str_metric : str) -> float:
+        """Get the newest value of the metric"""
+        return self.dict_ring_by_metric[str_metric].get_last()
+
+    def get_peak(self, str_metric : str) -> float:
+        """Get the max value of the metric for the whole process life"""
+        return self.dict_peak_by_metric[str_metric]
+
+
+class ResourcesSampler(object):
+    """Class to collect CPU and RAM usage of many processes in one pass
+
+    psutil.Process handles are cached between samples, so every sample
+    costs only one oneshot() read per process and CPU usage is measured
+    since the previous sample.
+    Optionally samples are taken in background and saved
+    into ResourcesHistory of every process.
+    """
+
+    def __init__(self, int_history_size : int = 600) -> None:
+        """Initialize object
+
+        Args:
+            int_history_size (int, optional): \
+                Max number of samples to keep in the history of the process
+        """
+        self.int_history_size = int_history_size
+        self._dict_psutil_process_by_pid = {}
+        self._dict_history_by_process_id = {}
+        self._lock = threading.Lock()
+        self._event_processes_started = threading.Event()
+        self._thread = None
+
+    def sample(
+            self,
+            iter_pids : Iterable[int],
+            is_full_info : bool = False,
+            is_with_children : bool = True
+    ) -> dict[int, dict]:
+        """Get resources usage for all given processes
+
+        Usage of every process is summed with usage of all its descendants
+        (E.G. subprocesses or multiprocessing pools started by it).
+        Descendants of all processes are found with one scan of the system.
+
+        Args:
+            iter_pids (Iterable): PIDs of processes to sample
+            is_full_info (bool, optional): \
+                Flag if to get also USS, PSS, threads and I/O counters
+            is_with_children (bool, optional): \
+                Flag if to add usage of descendants of the process
+
+        Returns:
+            dict: {"cpu_percent": float, "rss": int, ...} by PID
+                (dead processes are skipped)
+        """
+        dict_usage_by_pid = {}
+        with self._lock:
+            set_pids = set(iter_pids)
+            dict_descendants_by_pid = {}
+            if is_with_children and set_pids:
+                dict_descendants_by_pid = get_descendants_by_pid(set_pids)
+            set_pids_to_keep = set(set_pids)
+            for list_descendants in dict_descendants_by_pid.values():
+                set_pids_to_keep.update(list_descendants)
+            for int_pid in list(self._dict_psutil_process_by_pid):
+                if int_pid not in set_pids_to_keep:
+                    del self._dict_psutil_process_by_pid[int_pid]
+            for int_pid in set_pids:
+                dict_usage = self._measure_tree(
+                    int_pid, dict_descendants_by_pid.get(int_pid, []),
+                    is_full_info)
+                if dict_usage is not None:
+                    dict_usage_by_pid[int_pid] = dict_usage
+        return dict_usage_by_pid
+
+    def sample_process_tree(
+            self,
+            int_pid : int,
+            is_full_info : bool = False
+    ) -> Optional[dict]:
+        """Get resources usage of one process summed with its descendants
+
+        Only descendants of the process are looked for and cached handles
+        of other processes are kept, so it doesn't disturb background sampling.
+
+        Returns:
+            dict: {"cpu_percent": float, "rss": int, ...} \
+                (None if the process is dead)
+        """
+        try:
+            list_descendants = [
+                psutil_child.pid
+                for psutil_child in psutil.Process(int_pid).children(
+                    recursive=True)]
+        except psutil.Error:
+            return None
+        with self._lock:
+            return self._measure_tree(int_pid, list_descendants, is_full_info)
+
+    def _measure_tree(
+            self,
+            int_pid : int,
+            list_descendants : list[int],
+            is_full_info : bool
+    ) -> Optional[dict]:
+        """Get usage of the process summed with usage of its descendants
+
+        Lock should be acquired.
+        """
+        dict_usage = self._measure(int_pid, is_full_info)
+        if dict_usage is None:
+            return None
+        dict_usage["num_processes"] = 1
+        for int_child_pid in list_descendants:
+            dict_child_usage = self._measure(int_child_pid, is_full_info)
+            if dict_child_usage is None:
+                continue
+            dict_usage["num_processes"] += 1
+            for str_key, value in dict_child_usage.items():
+                dict_usage[str_key] = dict_usage.get(str_key, 0) + value
+        return dict_usage
+
+    def _measure(self, int_pid : int, is_full_info : bool) -> Optional[dict]:
+        """Get resources usage of one process, lock should be acquired"""
+        try:
+            psutil_process = self._get_psutil_process(int_pid)
+            with psutil_process.oneshot():
+                dict_usage = {
+                    "cpu_percent": psutil_process.cpu_percent(None),
+                    "rss": psutil_process.memory_info().rss,
+                }
+                if is_full_info:
+                    dict_usage.update(_get_full_info(psutil_process))
+        except psutil.Error:
+            self._dict_psutil_process_by_pid.pop(int_pid, None)
+            return None
+        return dict_usage
+
+    def start_background_sampling(
+            self,
+            func_get_pid_by_process_id : Callable,
+            seconds_between_samples : float
+    ) -> None:
+        """Start thread to save resources usage of running processes
+
+        Thread sleeps while there are no running processes,
+        call notify_processes_started() to wake it up.
+
+        Args:
+            func_get_pid_by_process_id (function): \
+                Function returning dict with PIDs of running processes
+            seconds_between_samples (float): Seconds between samples
+        """
+        if self._thread is not None:
+            return None
+        self._thread = threading.Thread(
+            target=self._sample_in_background,
+            args=(func_get_pid_by_process_id, seconds_between_samples),
+            daemon=True,
+        )
+        self._thread.start()
+        return None
+
+    def notify_processes_started(self) -> None:
+        """Tell background sampling that there are new running processes"""
+        self._event_processes_started.set()
+
+    def get_history(self, int_process_id : int) -> Optional[ResourcesHistory]:
+        """Get history of resources usage of the process (None if no samples)
+        """
+        return self._dict_history_by_process_id.get(int_process_id)
+
+    def remove_history(self, int_process_id : int) -> None:
+        """Forget history of resources usage of the process"""
+        self._dict_history_by_process_id.pop(int_process_id, None)
+
+    def _sample_in_background(
+            self,
+            func_get_pid_by_process_id : Callable,
+            seconds_between_samples : float
+    ) -> None:
+        """Save resources usage of running processes while there are some"""
+        while True:
+            self._event_processes_started.wait()
+            self._event_processes_started.clear()
+            while True:
+                dict_pid_by_process_id = func_get_pid_by_process_id()
+                if not dict_pid_by_process_id:
+                    break
+                float_time = time.time()
+                dict_usage_by_pid = self.sample(
+                    dict_pid_by_process_id.values(), is_full_info=True)
+                for int_process_id, int_pid in dict_pid_by_process_id.items():
+                    if int_pid not in dict_usage_by_pid:
+                        continue
+                    history = self._dict_history_by_process_id.get(
+                        int_process_id)
+                    if history is None:
+                        history = ResourcesHistory(self.int_history_size)
+                        self._dict_history_by_process_id[int_process_id] = \
+                            history
+                    history.add_sample(float_time, dict_usage_by_pid[int_pid])
+                time.sleep(seconds_between_samples)
+
+    def _get_psutil_process(self, int_pid : int) -> psutil.Process:
+        """Get cached psutil handle for the process, lock should be acquired"""
+        psutil_process = self._dict_psutil_process_by_pid.get(int_pid)
+        if psutil_process is None:
+            psutil_process = psutil.Process(int_pid)
+            self._dict_psutil_process_by_pid[int_pid] = psutil_process
+        return psutil_process
+
+
+def get_ram_usage(dict_usage : Optional[dict]) -> float:
+    """Get RAM used by the process tree by the best known metric"""
+    if dict_usage is None:
+        return 0.0
+    for str_metric in LIST_RAM_METRICS:
+        if dict_usage.get(str_metric):
+            return dict_usage[str_metric]
+    return 0.0
+
+
+def get_ram_metric(history : ResourcesHistory) -> str:
+    """Get the best RAM metric which was measured for the process"""
+    for str_metric in LIST_RAM_METRICS:
+        if history.get_peak(str_metric):
+            return str_metric
+    return LIST_RAM_METRICS[-1]
+
+
+def get_nice_memory_str(int_mem_bytes : int) -> str:
+    """Get memory size string in nice format"""
+    float_mem_mbytes = int_mem_bytes / 1024.0 / 1024.0
+    if float_mem_mbytes > 1024:
+        float_mem_gbytes = float_mem_mbytes / 1024.0
+        return str(rtnsd(float_mem_gbytes, 2)) + " Gb"
+    return str(rtnsd(float_mem_mbytes, 2)) + " Mb"
+
+
+def get_sparkline_str(list_values : list[float], int_width : int = 20) -> str:
+    """Get string with small chart of last values"""
+    list_values = list_values[-int_width:]
+    if not list_values:
+        return ""
+    float_min = min(list_values)
+    float_range = max(list_values) - float_min
+    if float_range <= 0:
+        return STR_SPARKLINE_CHARS[0] * len(list_values)
+    int_levels = len(STR_SPARKLINE_CHARS) - 1
+    return "".join(
+        STR_SPARKLINE_CHARS[
+            int(round((float_value - float_min) / float_range * int_levels))]
+        for float_value in list_values)
+
+
+def _get_full_info(psutil_process : psutil.Process) -> dict:
+    """Get USS, PSS, number of threads and I/O counters
+
+    Should be called inside oneshot(). PSS is available only on Linux.
+    """
+    dict_info = {"num_threads": psutil_process.num_threads()}
+    try:
+        memory_full_info = psutil_process.memory_full_info()
+        dict_info["uss"] = memory_full_info.uss
+        if hasattr(memory_full_info, "pss"):
+            dict_info["pss"] = memory_full_info.pss
+    except psutil.AccessDenied:
+        pass
+    if hasattr(psutil_process, "io_counters"):
+        try:
+            io_counters = psutil_process.io_counters()
+            dict_info["read_bytes"] = io_counters.read_bytes
+            dict_info["write_bytes"] = io_counters.write_bytes
+        except psutil.AccessDenied:
+            pass
+    return dict_info
+
+
+def get_descendants_by_pid(iter_pids : Iterable[int]) -> dict[int, list[int]]:
+    """Get PIDs of all descendants of given processes with one system scan"""
+    dict_children_by_ppid = {}
+    for psutil_process in psutil.process_iter(["ppid"]):
+        int_ppid = psutil_process.info["ppid"]
+        if int_ppid:
+            dict_children_by_ppid.setdefault(int_ppid, []).append(
+                psutil_process.pid)
+    dict_descendants_by_pid = {}
+    for int_pid in iter_pids:
+        list_descendants = []
+        list_to_check = [int_pid]
+        while list_to_check:
+            list_children = dict_children_by_ppid.get(list_to_check.pop(), [])
+            list_descendants.extend(list_children)
+            list_to_check.extend(list_children)
+        dict_descendants_by_pid[int_pid] = list_descendants
+    return dict_descendants_by_pid
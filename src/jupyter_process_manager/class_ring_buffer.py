@@ -0,0 +1,51 @@
+"""Module with fixed size ring buffer of numbers"""
+from __future__ import print_function
+# Standard library imports
+from array import array
+
+# Third party imports
+
+# Local imports
+
+
+class RingBuffer(object):
+    """Class with last N numbers stored in compact array
+
+    Memory is taken only for values which were added,
+    but no more than for N values.
+    """
+
+    def __init__(self, int_capacity : int, str_typecode : str = "d") -> None:
+        """Initialize object
+
+        Args:
+            int_capacity (int): Max number of values to keep
+            str_typecode (str, optional): Type code of the array module
+        """
+        self.int_capacity = int_capacity
+        self.array_values = array(str_typecode)
+        # Position of the oldest value when the buffer is full
+        self.int_start = 0
+
+    def __len__(self) -> int:
+        """Get number of values in the buffer"""
+        return len(self.array_values)
+
+    def append(self, value : float) -> None:
+        """Add new value and forget the oldest one if the buffer is full"""
+        if len(self.array_values) < self.int_capacity:
+            self.array_values.append(value)
+            return None
+        self.array_values[self.int_start] = value
+        self.int_start = (self.int_start + 1) % self.int_capacity
+        return None
+
+    def get_values(self) -> list[float]:
+        """Get list with all values from the oldest to the newest"""
+        return (
+            self.array_values[self.int_start:].tolist() +
+            self.array_values[:self.int_start].tolist())
+
+    def get_last(self) -> float:
+        """Get the newest value"""
+        return self.array_values[self.int_start - 1]
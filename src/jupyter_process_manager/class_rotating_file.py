@@ -0,0 +1,290 @@
+"""Module with size-capped output file which is rotated into segments"""
+from __future__ import print_function
+# Standard library imports
+from typing import Optional, Iterator, IO
+import io
+import os
+import logging
+
+# Third party imports
+
+# Local imports
+
+LOGGER = logging.getLogger(__name__)
+
+# Max number of rotated segments to keep (the first one is always kept)
+INT_MAX_SEGMENTS = 4
+INT_CHUNK_BYTES = 1024 * 1024
+STR_DROPPED_OUTPUT_MARKER = \
+    "*** Part of the output was deleted to limit its size ***"
+
+
+class RotatingFile(io.TextIOBase):
+    """Text stream which writes into the file with limited size
+
+    When the file reaches int_max_bytes it is renamed into the segment
+    FILE.1 (then FILE.2, ...) and writing continues into the new FILE.
+    The first segment (head of the output) and int_max_segments - 1
+    last segments are kept, others are deleted.
+    So the output never takes more than (int_max_segments + 1) * int_max_bytes
+    of the disk. Number of the last segment is kept in the file FILE.last,
+    so readers don't need to list the folder to find segments.
+    Readers of the output (FileTailReader, TracebackIndex) follow segments
+    and show STR_DROPPED_OUTPUT_MARKER where they were deleted.
+    """
+
+    def __init__(
+            self,
+            str_file_path : str,
+            int_max_bytes : int,
+            int_max_segments : int = INT_MAX_SEGMENTS,
+            int_buffer_bytes : Optional[int] = None
+    ) -> None:
+        """Initialize object
+
+        Args:
+            str_file_path (str): Path to the file to write to
+            int_max_bytes (int): Max size of the file and of every segment
+            int_max_segments (int, optional): \
+                Max number of rotated segments to keep, at least 2
+            int_buffer_bytes (int, optional): \
+                Size of the write buffer, None - line buffering
+        """
+        super().__init__()
+        if int_max_bytes < 1:
+            raise ValueError("int_max_bytes should be at least 1")
+        if int_max_segments < 2:
+            raise ValueError("int_max_segments should be at least 2")
+        self.str_file_path = str_file_path
+        self.int_max_bytes = int_max_bytes
+        self.int_max_segments = int_max_segments
+        self.int_buffering = int_buffer_bytes or 1
+        self.int_last_segment = find_last_segment(str_file_path)
+        self._file = self._open("a")
+        self.int_size = self._file.tell()
+
+    @property
+    def name(self) -> str:
+        """Path to the file (logging handlers look at it)"""
+        return self.str_file_path
+
+    @property
+    def encoding(self) -> str:
+        """Encoding of the file"""
+        return "utf-8"
+
+    def writable(self) -> bool:
+        """"""
+        return True
+
+    def readable(self) -> bool:
+        """"""
+        return True
+
+    def seekable(self) -> bool:
+        """"""
+        return True
+
+    def isatty(self) -> bool:
+        """"""
+        return False
+
+    def fileno(self) -> int:
+        """File descriptor of the file which is written now"""
+        return self._file.fileno()
+
+    def write(self, str_text : str) -> int:
+        """Write text rotating the file when it gets too big
+
+        Text is split by bytes at character boundaries, so no segment
+        is bigger than int_max_bytes (unless one character is bigger).
+        """
+        bytes_text = str_text.encode("utf-8", errors="replace")
+        while bytes_text:
+            int_room = self.int_max_bytes - self.int_size
+            if int_room <= 0:
+                self._rotate()
+                int_room = self.int_max_bytes
+            int_end = _find_char_boundary(bytes_text, int_room)
+            if int_end == 0:
+                if self.int_size:
+                    # Character doesn't fit, write it into the next segment
+                    self._rotate()
+                    continue
+                int_end = _find_char_boundary(bytes_text, 4, is_backward=False)
+            self._file.write(bytes_text[:int_end].decode("utf-8"))
+            self.int_size += int_end
+            bytes_text = bytes_text[int_end:]
+        return len(str_text)
+
+    def flush(self) -> None:
+        """"""
+        if not self._file.closed:
+            self._file.flush()
+
+    def close(self) -> None:
+        """"""
+        if not self._file.closed:
+            self._file.close()
+        super().close()
+
+    def seek(self, int_offset : int, int_whence : int = 0) -> int:
+        """Only moving to the start (E.G. before read()) is supported"""
+        if (int_offset, int_whence) != (0, 0):
+            raise io.UnsupportedOperation("Only seek(0) is supported")
+        return 0
+
+    def tell(self) -> int:
+        """Size of the file which is written now"""
+        return self.int_size
+
+    def read(self, int_size : Optional[int] = -1) -> str:
+        """Get text of all kept segments and of the file"""
+        self.flush()
+        return read_all_segments(self.str_file_path)
+
+    def truncate(self, int_size : Optional[int] = None) -> int:
+        """Delete all output (only truncate(0) is supported)"""
+        if int_size not in (0, None):
+            raise io.UnsupportedOperation("Only truncate(0) is supported")
+        self._file.close()
+        _remove_file(_get_last_segment_file_path(self.str_file_path))
+        for int_segment in range(1, self.int_last_segment + 1):
+            _remove_file(get_segment_path(self.str_file_path, int_segment))
+        self.int_last_segment = 0
+        self._file = self._open("w")
+        self.int_size = 0
+        return 0
+
+    def _open(self, str_mode : str) -> IO[str]:
+        """Open the file with chosen buffering"""
+        return open(
+            self.str_file_path, str_mode, buffering=self.int_buffering,
+            encoding="utf-8", errors="replace")
+
+    def _rotate(self) -> None:
+        """Move the file into the next segment and start the new file"""
+        self._file.close()
+        try:
+            os.replace(
+                self.str_file_path,
+                get_segment_path(self.str_file_path, self.int_last_segment + 1))
+        except OSError:
+            # E.G. on Windows the file is opened by a reader, try next time
+            LOGGER.warning("Unable to rotate %s", self.str_file_path)
+            self._file = self._open("a")
+            self.int_size = 0
+            return None
+        self.int_last_segment += 1
+        _save_last_segment(self.str_file_path, self.int_last_segment)
+        # Keep the first segment and int_max_segments - 1 last ones
+        int_segment_to_remove = \
+            self.int_last_segment - self.int_max_segments + 1
+        if int_segment_to_remove >= 2:
+            _remove_file(
+                get_segment_path(self.str_file_path, int_segment_to_remove))
+        self._file = self._open("a")
+        self.int_size = 0
+        return None
+
+
+def get_segment_path(str_file_path : str, int_segment : int) -> str:
+    """Get path to the rotated segment of the file"""
+    return "%s.%d" % (str_file_path, int_segment)
+
+
+def find_last_segment(str_file_path : str) -> int:
+    """Get number of the last rotated segment of the file (0 if none)"""
+    try:
+        with open(_get_last_segment_file_path(str_file_path)) as file_obj:
+            return int(file_obj.read() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def read_all_segments(str_file_path : str) -> str:
+    """Get text of all kept segments of the file and of the file itself"""
+    return b"".join(iter_output_bytes(str_file_path)).decode(
+        "utf-8", errors="replace")
+
+
+def iter_output_bytes(
+        str_file_path : str,
+        int_chunk_bytes : int = INT_CHUNK_BYTES
+) -> Iterator[bytes]:
+    """Yield bytes of all kept segments and of the file chunk by chunk
+
+    STR_DROPPED_OUTPUT_MARKER is yielded where segments were deleted.
+    """
+    int_last_segment = find_last_segment(str_file_path)
+    is_previous_kept = True
+    for int_segment in range(1, int_last_segment + 2):
+        str_path = str_file_path
+        if int_segment <= int_last_segment:
+            str_path = get_segment_path(str_file_path, int_segment)
+        try:
+            file_obj = open(str_path, "rb")
+        except OSError:
+            is_previous_kept = False
+            continue
+        with file_obj:
+            if not is_previous_kept:
+                yield ("\n" + STR_DROPPED_OUTPUT_MARKER + "\n").encode()
+            is_previous_kept = True
+            while True:
+                bytes_chunk = file_obj.read(int_chunk_bytes)
+                if not bytes_chunk:
+                    break
+                yield bytes_chunk
+
+
+def remove_output_files(str_file_path : str) -> None:
+    """Remove the file with all its rotated segments"""
+    int_last_segment = find_last_segment(str_file_path)
+    for int_segment in range(1, int_last_segment + 1):
+        _remove_file(get_segment_path(str_file_path, int_segment))
+    _remove_file(_get_last_segment_file_path(str_file_path))
+    _remove_file(str_file_path)
+
+
+def _find_char_boundary(
+        bytes_text : bytes,
+        int_pos : int,
+        is_backward : bool = True
+) -> int:
+    """Get the nearest position of the character start in UTF-8 bytes
+
+    Args:
+        bytes_text (bytes): Text encoded in UTF-8
+        int_pos (int): Position to start search from
+        is_backward (bool, optional): \
+            Flag if to search before the position, otherwise after it
+    """
+    if int_pos >= len(bytes_text):
+        return len(bytes_text)
+    int_step = -1 if is_backward else 1
+    # Continuation bytes of multi-byte characters are 0b10xxxxxx
+    while 0 < int_pos < len(bytes_text) and bytes_text[int_pos] & 0xC0 == 0x80:
+        int_pos += int_step
+    return int_pos
+
+
+def _save_last_segment(str_file_path : str, int_last_segment : int) -> None:
+    """Save number of the last rotated segment of the file"""
+    str_last_segment_path = _get_last_segment_file_path(str_file_path)
+    with open(str_last_segment_path + ".tmp", "w") as file_obj:
+        file_obj.write(str(int_last_segment))
+    os.replace(str_last_segment_path + ".tmp", str_last_segment_path)
+
+
+def _get_last_segment_file_path(str_file_path : str) -> str:
+    """Get path to the file with number of the last rotated segment"""
+    return str_file_path + ".last"
+
+
+def _remove_file(str_file_path : str) -> None:
+    """Remove file if it exists"""
+    try:
+        os.remove(str_file_path)
+    except FileNotFoundError:
+        pass
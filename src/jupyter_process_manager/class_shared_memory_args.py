@@ -0,0 +1,197 @@
+"""Module to pass big arguments to processes through shared memory"""
+from __future__ import print_function
+# Standard library imports
+from typing import Any
+import logging
+import threading
+from multiprocessing import shared_memory
+
+# Third party imports
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Local imports
+
+LOGGER = logging.getLogger(__name__)
+
+INT_MIN_BYTES_TO_SHARE = 1024 * 1024
+# Segments attached by the current (child) process
+LIST_ATTACHED_SEGMENTS = []
+
+
+class SharedArray(object):
+    """Picklable reference to numpy array stored in shared memory"""
+
+    def __init__(self, str_name : str, tuple_shape : tuple, str_dtype : str):
+        """"""
+        self.str_name = str_name
+        self.tuple_shape = tuple_shape
+        self.str_dtype = str_dtype
+
+    def attach(self) -> Any:
+        """Get numpy array which uses shared memory without copying it"""
+        segment = _attach_segment(self.str_name)
+        return np.ndarray(
+            self.tuple_shape, dtype=np.dtype(self.str_dtype), buffer=segment.buf)
+
+
+class SharedBuffer(object):
+    """Picklable reference to bytes-like object stored in shared memory"""
+
+    def __init__(self, str_name : str, int_bytes : int):
+        """"""
+        self.str_name = str_name
+        self.int_bytes = int_bytes
+
+    def attach(self) -> memoryview:
+        """Get memoryview of the shared memory without copying it"""
+        segment = _attach_segment(self.str_name)
+        return segment.buf[:self.int_bytes]
+
+
+class SharedMemoryArgs(object):
+    """Class to put big arguments of functions into shared memory once
+
+    Numpy arrays and bytes-like objects bigger than int_min_bytes_to_share
+    are copied into shared memory segments and replaced with references.
+    Children attach to segments without copying them
+    (bytes-like objects are given to the function as memoryview).
+    The same object given to many processes is stored only once.
+    A segment is removed when all processes using it are over.
+    """
+
+    def __init__(
+            self,
+            int_min_bytes_to_share : int = INT_MIN_BYTES_TO_SHARE
+    ) -> None:
+        """Initialize object
+
+        Args:
+            int_min_bytes_to_share (int, optional): \
+                Min size of the argument to put it into shared memory
+        """
+        self.int_min_bytes_to_share = int_min_bytes_to_share
+        # id(object) -> [object, segment, reference, number of users]
+        self._dict_segment_info_by_obj_id = {}
+        self._dict_obj_id_by_name = {}
+        self._lock = threading.Lock()
+
+    def share_args(
+            self,
+            args : tuple,
+            kwargs : dict
+    ) -> tuple[tuple, dict, list[str]]:
+        """Replace big arguments with references to shared memory
+
+        Returns:
+            tuple: New args, new kwargs, names of segments used by them
+        """
+        list_names = []
+        new_args = tuple(self._share_arg(arg, list_names) for arg in args)
+        new_kwargs = {
+            str_key: self._share_arg(value, list_names)
+            for str_key, value in kwargs.items()}
+        return new_args, new_kwargs, list_names
+
+    def release(self, list_names : list[str]) -> None:
+        """Tell that a process which used given segments is over"""
+        with self._lock:
+            for str_name in list_names:
+                int_obj_id = self._dict_obj_id_by_name.get(str_name)
+                if int_obj_id is None:
+                    continue
+                list_info = self._dict_segment_info_by_obj_id[int_obj_id]
+                list_info[3] -= 1
+                if list_info[3] <= 0:
+                    self._remove_segment(int_obj_id)
+
+    def remove_all(self) -> None:
+        """Remove all segments"""
+        with self._lock:
+            for int_obj_id in list(self._dict_segment_info_by_obj_id):
+                self._remove_segment(int_obj_id)
+
+    def _share_arg(self, arg : Any, list_names : list[str]) -> Any:
+        """Get reference to shared memory for the argument if it's big"""
+        if np is not None and isinstance(arg, np.ndarray):
+            if arg.nbytes < self.int_min_bytes_to_share or arg.dtype.hasobject:
+                return arg
+        elif isinstance(arg, (bytes, bytearray, memoryview)):
+            if memoryview(arg).nbytes < self.int_min_bytes_to_share:
+                return arg
+        else:
+            return arg
+        with self._lock:
+            list_info = self._dict_segment_info_by_obj_id.get(id(arg))
+            if list_info is None:
+                list_info = self._create_segment(arg)
+            list_info[3] += 1
+            list_names.append(list_info[1].name)
+            return list_info[2]
+
+    def _create_segment(self, arg : Any) -> list:
+        """Copy argument into new shared memory segment"""
+        if np is not None and isinstance(arg, np.ndarray):
+            segment = shared_memory.SharedMemory(
+                create=True, size=max(1, arg.nbytes))
+            array_shared = np.ndarray(
+                arg.shape, dtype=arg.dtype, buffer=segment.buf)
+            np.copyto(array_shared, arg, casting="no")
+            del array_shared
+            reference = SharedArray(segment.name, arg.shape, arg.dtype.str)
+        else:
+            memoryview_arg = memoryview(arg).cast("B")
+            segment = shared_memory.SharedMemory(
+                create=True, size=max(1, memoryview_arg.nbytes))
+            segment.buf[:memoryview_arg.nbytes] = memoryview_arg
+            reference = SharedBuffer(segment.name, memoryview_arg.nbytes)
+        LOGGER.debug("Shared memory segment created: %s", segment.name)
+        list_info = [arg, segment, reference, 0]
+        self._dict_segment_info_by_obj_id[id(arg)] = list_info
+        self._dict_obj_id_by_name[segment.name] = id(arg)
+        return list_info
+
+    def _remove_segment(self, int_obj_id : int) -> None:
+        """Close and unlink segment, lock should be acquired"""
+        _, segment, _, _ = self._dict_segment_info_by_obj_id.pop(int_obj_id)
+        self._dict_obj_id_by_name.pop(segment.name, None)
+        segment.close()
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def attach_shared_args(args : tuple, kwargs : dict) -> tuple[tuple, dict]:
+    """Replace references to shared memory with objects using it"""
+    new_args = tuple(_attach_arg(arg) for arg in args)
+    new_kwargs = {
+        str_key: _attach_arg(value) for str_key, value in kwargs.items()}
+    return new_args, new_kwargs
+
+
+def detach_shared_args() -> None:
+    """Close all segments attached by this process (if nothing uses them)"""
+    while LIST_ATTACHED_SEGMENTS:
+        segment = LIST_ATTACHED_SEGMENTS.pop()
+        try:
+            segment.close()
+        except BufferError:
+            # Function kept a reference to the shared object, let it live
+            pass
+
+
+def _attach_arg(arg : Any) -> Any:
+    """Get object using shared memory for the reference"""
+    if isinstance(arg, (SharedArray, SharedBuffer)):
+        return arg.attach()
+    return arg
+
+
+def _attach_segment(str_name : str) -> shared_memory.SharedMemory:
+    """Attach existing shared memory segment and keep it opened"""
+    segment = shared_memory.SharedMemory(name=str_name)
+    LIST_ATTACHED_SEGMENTS.append(segment)
+    return segment
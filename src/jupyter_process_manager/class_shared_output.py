@@ -0,0 +1,371 @@
+"""Module to pass output of the process through shared memory"""
+from __future__ import print_function
+# Standard library imports
+from typing import Optional, IO
+from collections import deque
+from multiprocessing import shared_memory
+import io
+import struct
+import logging
+import threading
+
+# Third party imports
+
+# Local imports
+
+LOGGER = logging.getLogger(__name__)
+
+INT_SHARED_OUTPUT_BYTES = 1024 * 1024
+# Capacity, bytes written, number of clears, bytes written at the last clear
+STRUCT_HEADER = struct.Struct("QQQQ")
+STR_LOST_OUTPUT_MARKER = \
+    "*** Part of the output is not shown, it's only in the output file ***"
+
+
+class SharedOutputRing(object):
+    """Ring buffer in shared memory with the output of one process
+
+    The parent creates the ring and the child attaches to it by name.
+    Only the child writes to the ring, readers remember how many bytes
+    they have read and copy only new ones. If the writer laps a reader
+    then the oldest bytes are lost for it.
+    """
+
+    def __init__(
+            self,
+            int_bytes : int = INT_SHARED_OUTPUT_BYTES,
+            str_name : Optional[str] = None
+    ) -> None:
+        """Initialize object
+
+        Args:
+            int_bytes (int, optional): Size of the ring (for a new ring)
+            str_name (str, optional): Name of existing ring to attach to, \
+                None - create a new ring
+        """
+        if str_name is None:
+            self.segment = shared_memory.SharedMemory(
+                create=True, size=STRUCT_HEADER.size + int_bytes)
+            STRUCT_HEADER.pack_into(self.segment.buf, 0, int_bytes, 0, 0, 0)
+        else:
+            self.segment = shared_memory.SharedMemory(name=str_name)
+        self.int_bytes = STRUCT_HEADER.unpack_from(self.segment.buf, 0)[0]
+
+    @property
+    def str_name(self) -> str:
+        """Name of the shared memory segment"""
+        return self.segment.name
+
+    def get_header(self) -> tuple[int, int, int]:
+        """Get (bytes written, number of clears, bytes written at last clear)
+        """
+        return STRUCT_HEADER.unpack_from(self.segment.buf, 0)[1:]
+
+    def write(self, bytes_data : bytes) -> None:
+        """Append bytes to the ring (only one writer is allowed)"""
+        int_written, int_clears, int_clear_pos = self.get_header()
+        int_new_written = int_written + len(bytes_data)
+        if len(bytes_data) > self.int_bytes:
+            bytes_data = bytes_data[-self.int_bytes:]
+            int_written = int_new_written - self.int_bytes
+        int_pos = int_written % self.int_bytes
+        int_first_part = min(len(bytes_data), self.int_bytes - int_pos)
+        int_data_start = STRUCT_HEADER.size
+        buf = self.segment.buf
+        buf[int_data_start + int_pos:int_data_start + int_pos + int_first_part] = \
+            bytes_data[:int_first_part]
+        int_rest = len(bytes_data) - int_first_part
+        buf[int_data_start:int_data_start + int_rest] = bytes_data[int_first_part:]
+        # Header is updated after the data, so readers never see unwritten bytes
+        STRUCT_HEADER.pack_into(
+            buf, 0, self.int_bytes, int_new_written, int_clears, int_clear_pos)
+
+    def clear(self) -> None:
+        """Tell readers to forget everything written before"""
+        int_written, int_clears, _ = self.get_header()
+        STRUCT_HEADER.pack_into(
+            self.segment.buf, 0,
+            self.int_bytes, int_written, int_clears + 1, int_written)
+
+    def read(self, int_start : int) -> tuple[bytes, int, bool]:
+        """Read bytes written after the first int_start bytes
+
+        Returns:
+            tuple: (new bytes, number of bytes written, \
+                flag if some bytes after int_start were lost)
+        """
+        int_written = self.get_header()[0]
+        int_first = max(int_start, int_written - self.int_bytes)
+        bytes_data = self._copy(int_first, int_written)
+        # Writer could overwrite the oldest of copied bytes meanwhile
+        int_overwritten = self.get_header()[0] - self.int_bytes - int_first
+        if int_overwritten > 0:
+            bytes_data = bytes_data[int_overwritten:]
+        return bytes_data, int_written, int_written - len(bytes_data) > int_start
+
+    def close(self) -> None:
+        """Detach from the ring"""
+        self.segment.close()
+
+    def unlink(self) -> None:
+        """Remove the ring (should be done by the process which created it)"""
+        try:
+            self.segment.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _copy(self, int_start : int, int_end : int) -> bytes:
+        """Copy bytes [int_start, int_end) of the written data"""
+        if int_end <= int_start:
+            return b""
+        int_data_start = STRUCT_HEADER.size
+        int_pos = int_start % self.int_bytes
+        int_first_part = min(int_end - int_start, self.int_bytes - int_pos)
+        buf = self.segment.buf
+        bytes_data = bytes(
+            buf[int_data_start + int_pos:int_data_start + int_pos + int_first_part])
+        int_rest = int_end - int_start - int_first_part
+        if int_rest:
+            bytes_data += bytes(buf[int_data_start:int_data_start + int_rest])
+        return bytes_data
+
+
+class SharedOutputStream(io.TextIOBase):
+    """Text stream writing both into the ring and into the durable file
+
+    The ring gets the output at once, so it can be shown live.
+    The file (usually block-buffered) gets it when its buffer is flushed.
+    Writes are done under the lock, as the ring allows only one writer
+    and threads of the process can print at the same time.
+    """
+
+    def __init__(self, file_stream : IO[str], str_ring_name : str) -> None:
+        """Initialize object
+
+        Args:
+            file_stream (IO[str]): Stream of the file with output
+            str_ring_name (str): Name of SharedOutputRing to write to
+        """
+        super().__init__()
+        self.file_stream = file_stream
+        self.ring = SharedOutputRing(str_name=str_ring_name)
+        # Reentrant, as signal handlers can flush in the middle of a write
+        self._lock = threading.RLock()
+
+    @property
+    def name(self) -> str:
+        """Path to the file (logging handlers look at it)"""
+        return self.file_stream.name
+
+    @property
+    def encoding(self) -> str:
+        """Encoding of the file"""
+        return self.file_stream.encoding
+
+    def writable(self) -> bool:
+        """"""
+        return True
+
+    def readable(self) -> bool:
+        """"""
+        return True
+
+    def seekable(self) -> bool:
+        """"""
+        return True
+
+    def isatty(self) -> bool:
+        """"""
+        return False
+
+    def fileno(self) -> int:
+        """File descriptor of the file"""
+        return self.file_stream.fileno()
+
+    def write(self, str_text : str) -> int:
+        """Write text into the ring and into the file"""
+        bytes_text = str_text.encode("utf-8", errors="replace")
+        with self._lock:
+            self.ring.write(bytes_text)
+            return self.file_stream.write(str_text)
+
+    def flush(self) -> None:
+        """"""
+        with self._lock:
+            if not self.file_stream.closed:
+                self.file_stream.flush()
+
+    def seek(self, int_offset : int, int_whence : int = 0) -> int:
+        """"""
+        return self.file_stream.seek(int_offset, int_whence)
+
+    def tell(self) -> int:
+        """"""
+        return self.file_stream.tell()
+
+    def read(self, int_size : Optional[int] = -1) -> str:
+        """Read the output from the file"""
+        self.file_stream.flush()
+        return self.file_stream.read(int_size)
+
+    def truncate(self, int_size : Optional[int] = None) -> int:
+        """Delete all output (E.G. by clear_output())"""
+        with self._lock:
+            if not int_size:
+                self.ring.clear()
+            return self.file_stream.truncate(int_size)
+
+    def close(self) -> None:
+        """Close the file and detach from the ring"""
+        if not self.closed:
+            self.file_stream.close()
+            self.ring.close()
+        super().close()
+
+
+class SharedOutputReader(object):
+    """Class to keep in memory last N lines of the output from the ring
+
+    It has the same interface as FileTailReader.
+    When the process is over the ring is released and
+    the lines read before are kept.
+    """
+
+    def __init__(
+            self,
+            ring : SharedOutputRing,
+            int_max_lines : int = 1000
+    ) -> None:
+        """Initialize object
+
+        Args:
+            ring (SharedOutputRing): Ring with the output
+            int_max_lines (int, optional): Max number of last lines to keep
+        """
+        self.ring = ring
+        self.int_max_lines = int_max_lines
+        self.int_read_bytes = 0
+        self.int_clears = 0
+        self.int_checked_bytes = None
+        self.deque_lines = deque(maxlen=int_max_lines)
+        self.bytes_partial_line = b""
+        # Number of resets and of complete lines added since the start,
+        # so the caller can ask only for lines added after it looked last time
+        self.int_resets = 0
+        self.int_lines_added = 0
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """Forget all read lines"""
+        self.deque_lines.clear()
+        self.bytes_partial_line = b""
+        self.int_resets += 1
+
+    def update(self) -> int:
+        """Read bytes written to the ring since the last update
+
+        Returns:
+            int: Number of new bytes read
+        """
+        with self._lock:
+            return self._update()
+
+    def is_changed(self) -> bool:
+        """Check if anything was written since the previous check"""
+        with self._lock:
+            int_written = self.int_read_bytes
+            if self.ring is not None:
+                int_written = self.ring.get_header()[0]
+            is_changed = int_written != self.int_checked_bytes
+            self.int_checked_bytes = int_written
+            return is_changed
+
+    def get_lines(self) -> list[str]:
+        """Get list with last N lines of the output (last one can be partial)
+        """
+        with self._lock:
+            self._update()
+            list_lines = list(self.deque_lines)
+            if self.bytes_partial_line:
+                list_lines.append(_decode(self.bytes_partial_line))
+        return list_lines
+
+    def get_new_lines(
+            self,
+            tuple_position : Optional[tuple[int, int]] = None
+    ) -> tuple[tuple[int, int], Optional[list[str]], str]:
+        """Get complete lines added after the position and the partial line
+
+        Args:
+            tuple_position (tuple, optional): \
+                Position returned by the previous call, None - from the start
+
+        Returns:
+            tuple: (position now, new complete lines or None if they \
+                can't be continued from the position as the output was \
+                cleared or some of new lines are not kept, partial last line)
+        """
+        with self._lock:
+            self._update()
+            tuple_position_now = (self.int_resets, self.int_lines_added)
+            str_partial_line = _decode(self.bytes_partial_line)
+            list_lines = list(self.deque_lines)
+        if tuple_position is None:
+            return tuple_position_now, list_lines, str_partial_line
+        int_new_lines = tuple_position_now[1] - tuple_position[1]
+        if (
+                tuple_position[0] != tuple_position_now[0] or
+                not 0 <= int_new_lines <= len(list_lines)
+        ):
+            return tuple_position_now, None, str_partial_line
+        return (
+            tuple_position_now,
+            list_lines[len(list_lines) - int_new_lines:],
+            str_partial_line,
+        )
+
+    def get_text(self) -> str:
+        """Get string with last N lines of the output"""
+        return "\n".join(self.get_lines())
+
+    def release(self) -> None:
+        """Read the rest of the output and remove the ring"""
+        with self._lock:
+            if self.ring is None:
+                return None
+            self._update()
+            self.ring.close()
+            self.ring.unlink()
+            self.ring = None
+        return None
+
+    def _update(self) -> int:
+        """Read new bytes and split them into lines, lock should be acquired"""
+        if self.ring is None:
+            return 0
+        _, int_clears, int_clear_pos = self.ring.get_header()
+        if int_clears != self.int_clears:
+            self.int_clears = int_clears
+            self.reset()
+            self.int_read_bytes = max(self.int_read_bytes, int_clear_pos)
+        bytes_new, int_written, is_lost = self.ring.read(self.int_read_bytes)
+        if is_lost:
+            self.deque_lines.append(STR_LOST_OUTPUT_MARKER)
+            self.int_lines_added += 1
+            # Beginning of the new bytes is a broken line
+            self.bytes_partial_line = b""
+            bytes_new = bytes_new[bytes_new.find(b"\n") + 1:]
+        int_bytes_read = int_written - self.int_read_bytes
+        self.int_read_bytes = int_written
+        list_bytes_lines = (self.bytes_partial_line + bytes_new).split(b"\n")
+        self.bytes_partial_line = list_bytes_lines.pop()
+        self.int_lines_added += len(list_bytes_lines)
+        self.deque_lines.extend(
+            _decode(bytes_line)
+            for bytes_line in list_bytes_lines[-self.int_max_lines:])
+        return int_bytes_read
+
+
+def _decode(bytes_line : bytes) -> str:
+    """Decode one line of the output"""
+    return bytes_line.decode("utf-8", errors="replace").rstrip("\r")
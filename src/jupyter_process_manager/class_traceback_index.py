@@ -0,0 +1,213 @@
+"""Module with class to index tracebacks written to the STDERR file"""
+from __future__ import print_function
+# Standard library imports
+from typing import Any
+import os
+import logging
+import threading
+
+# Third party imports
+
+# Local imports
+from .class_rotating_file import STR_DROPPED_OUTPUT_MARKER
+from .class_rotating_file import get_segment_path
+from .class_rotating_file import find_last_segment
+
+LOGGER = logging.getLogger(__name__)
+
+BYTES_TRACEBACK_MARKER = b"Traceback "
+INT_BLOCK_SIZE = 1024 * 1024
+
+
+class TracebackIndex(object):
+    """Class with offsets of all tracebacks found in the file
+
+    Every update scans only bytes appended since the previous update.
+    Traceback number i starts at its marker and lasts till the start of
+    the next traceback (or till the end of the file for the last one).
+    If the file is rotated (see RotatingFile) then the position of
+    a traceback is (number of the segment, offset in it).
+    The file itself is the segment after the last rotated one.
+    When the output is compressed (see OutputArchive) the archive
+    is scanned member by member and position is (1, offset in the output).
+    """
+
+    def __init__(self, str_file_path : str) -> None:
+        """Initialize object
+
+        Args:
+            str_file_path (str): Path to the file with STDERR output
+        """
+        self.str_file_path = str_file_path
+        self.list_tuple_starts = []
+        self.int_last_segment = 0
+        self.int_scanned_segment = 1
+        self.int_scanned_bytes = 0
+        # Archive with the output after the file was compressed
+        self.archive = None
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """Forget all found tracebacks"""
+        self.list_tuple_starts = []
+        self.int_last_segment = 0
+        self.int_scanned_segment = 1
+        self.int_scanned_bytes = 0
+
+    def update(self) -> int:
+        """Scan new bytes of the file for tracebacks
+
+        Returns:
+            int: Number of tracebacks found in the file
+        """
+        with self._lock:
+            self._update()
+            return len(self.list_tuple_starts)
+
+    def set_archive(self, archive : Any) -> None:
+        """Find tracebacks only in the archive from now on
+
+        Args:
+            archive (OutputArchive): Archive with the whole output of the file
+        """
+        with self._lock:
+            self.reset()
+            self.archive = archive
+
+    def get_number_of_errors(self) -> int:
+        """Get number of tracebacks in the file"""
+        return self.update()
+
+    def get_last_error(self) -> str:
+        """Get text of the last traceback or empty string if there are none"""
+        with self._lock:
+            self._update()
+            if not self.list_tuple_starts:
+                return ""
+            return self._read_errors([len(self.list_tuple_starts) - 1])[0]
+
+    def get_all_errors(self) -> list[str]:
+        """Get list with texts of all tracebacks"""
+        with self._lock:
+            self._update()
+            return self._read_errors(range(len(self.list_tuple_starts)))
+
+    def _update(self) -> None:
+        """Find markers in not scanned bytes, lock should be acquired"""
+        if self.archive is not None:
+            self._scan_archive()
+            return None
+        int_last_segment = find_last_segment(self.str_file_path)
+        if int_last_segment < self.int_last_segment:
+            # All segments were deleted (E.G. by clear_output())
+            self.reset()
+        self.int_last_segment = int_last_segment
+        while True:
+            try:
+                int_file_size = os.path.getsize(
+                    self._get_path(self.int_scanned_segment))
+            except OSError:
+                int_file_size = None
+            if self.int_scanned_segment > self.int_last_segment:
+                # The file itself
+                if int_file_size is None:
+                    if not self.int_last_segment:
+                        self.reset()
+                    return None
+                if int_file_size < self.int_scanned_bytes:
+                    self.reset()
+                self._scan(int_file_size)
+                return None
+            # Segment was deleted by rotation, it can't be scanned anymore
+            if int_file_size is not None:
+                self._scan(int_file_size)
+            self.int_scanned_segment += 1
+            self.int_scanned_bytes = 0
+
+    def _scan(self, int_file_size : int) -> None:
+        """Find markers in not scanned bytes of the scanned segment"""
+        if int_file_size <= self.int_scanned_bytes:
+            return None
+        int_overlap = len(BYTES_TRACEBACK_MARKER) - 1
+        try:
+            file_handler = open(self._get_path(self.int_scanned_segment), "rb")
+        except OSError:
+            # File was rotated just now, it will be scanned on the next update
+            return None
+        with file_handler:
+            int_block_start = max(0, self.int_scanned_bytes - int_overlap)
+            while int_block_start + int_overlap < int_file_size:
+                file_handler.seek(int_block_start)
+                bytes_block = file_handler.read(
+                    min(INT_BLOCK_SIZE, int_file_size - int_block_start))
+                self._find_markers(bytes_block, int_block_start)
+                int_block_start += len(bytes_block) - int_overlap
+        self.int_scanned_bytes = int_file_size
+        return None
+
+    def _scan_archive(self) -> None:
+        """Find markers in not scanned members of the archive"""
+        if self.int_scanned_bytes >= self.archive.int_size:
+            return None
+        int_overlap = len(BYTES_TRACEBACK_MARKER) - 1
+        bytes_previous_end = b""
+        for int_member_start, bytes_member in self.archive.iter_members(
+                self.int_scanned_bytes):
+            # Marker can be split between members
+            self._find_markers(
+                bytes_previous_end + bytes_member,
+                int_member_start - len(bytes_previous_end))
+            bytes_previous_end = bytes_member[-int_overlap:]
+        self.int_scanned_bytes = self.archive.int_size
+        return None
+
+    def _find_markers(self, bytes_block : bytes, int_block_start : int) -> None:
+        """Save positions of all markers in the block which weren't found yet"""
+        int_pos = bytes_block.find(BYTES_TRACEBACK_MARKER)
+        while int_pos != -1:
+            tuple_start = (self.int_scanned_segment, int_block_start + int_pos)
+            if not self.list_tuple_starts or \
+                    tuple_start > self.list_tuple_starts[-1]:
+                self.list_tuple_starts.append(tuple_start)
+            int_pos = bytes_block.find(BYTES_TRACEBACK_MARKER, int_pos + 1)
+
+    def _get_path(self, int_segment : int) -> str:
+        """Get path to the file with the segment"""
+        if int_segment > self.int_last_segment:
+            return self.str_file_path
+        return get_segment_path(self.str_file_path, int_segment)
+
+    def _read_errors(self, iter_error_nums) -> list[str]:
+        """Read texts of tracebacks with given numbers"""
+        list_errors = []
+        for int_error_num in iter_error_nums:
+            tuple_start = self.list_tuple_starts[int_error_num]
+            if int_error_num + 1 < len(self.list_tuple_starts):
+                tuple_end = self.list_tuple_starts[int_error_num + 1]
+            else:
+                tuple_end = (self.int_scanned_segment, self.int_scanned_bytes)
+            list_errors.append(self._read_range(tuple_start, tuple_end))
+        return list_errors
+
+    def _read_range(self, tuple_start : tuple, tuple_end : tuple) -> str:
+        """Read text between two positions which can be in different segments
+        """
+        if self.archive is not None:
+            return self.archive.read(tuple_start[1], tuple_end[1]).decode(
+                "utf-8", errors="replace")
+        list_texts = []
+        for int_segment in range(tuple_start[0], tuple_end[0] + 1):
+            int_start = tuple_start[1] if int_segment == tuple_start[0] else 0
+            int_end = tuple_end[1] if int_segment == tuple_end[0] else None
+            try:
+                with open(self._get_path(int_segment), "rb") as file_handler:
+                    file_handler.seek(int_start)
+                    bytes_text = file_handler.read(
+                        -1 if int_end is None else int_end - int_start)
+            except OSError:
+                str_marker = "\n" + STR_DROPPED_OUTPUT_MARKER + "\n"
+                if not list_texts or list_texts[-1] != str_marker:
+                    list_texts.append(str_marker)
+                continue
+            list_texts.append(bytes_text.decode("utf-8", errors="replace"))
+        return "".join(list_texts)
@@ -0,0 +1,340 @@
+"""Module with pool of long-lived worker processes to run many functions"""
+from __future__ import print_function
+# Standard library imports
+from typing import Optional, Any, Callable
+import logging
+import pickle
+import threading
+from collections import deque
+from multiprocessing import Process
+from multiprocessing import Pipe
+from multiprocessing.connection import wait
+
+# Third party imports
+
+# Local imports
+from .function_wrapper import run_tasks_in_worker
+from .function_wrapper import recv_result
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PooledTask(object):
+    """Handle for one function run by a pool worker
+
+    It has the same interface as multiprocessing.Process
+    (is_alive, pid, sentinel, join, terminate, kill),
+    so OneProcess can handle it as a usual process.
+    terminate() and kill() stop the whole worker, pool will replace it.
+    """
+
+    def __init__(
+            self,
+            int_process_id : int,
+            bytes_task : bytes,
+            func_on_result : Optional[Callable] = None
+    ) -> None:
+        """"""
+        self.int_process_id = int_process_id
+        self.bytes_task = bytes_task
+        self.func_on_result = func_on_result
+        self.worker = None
+        self.exitcode = None
+        self._conn_done_reader = None
+        self._conn_done_writer = None
+        self._lock = threading.Lock()
+
+    @property
+    def sentinel(self) -> Any:
+        """Object to wait on with multiprocessing.connection.wait()
+
+        It's a pipe which is created only when needed,
+        it becomes ready (EOF) when the task is over.
+        """
+        with self._lock:
+            if self._conn_done_reader is None:
+                self._conn_done_reader, self._conn_done_writer = \
+                    Pipe(duplex=False)
+                if self.exitcode is not None:
+                    self._conn_done_writer.close()
+            return self._conn_done_reader
+
+    @property
+    def pid(self) -> Optional[int]:
+        """PID of the worker running the task"""
+        if self.worker is None:
+            return None
+        return self.worker.int_pid
+
+    @property
+    def conn_stop_requests(self) -> Optional[Any]:
+        """Pipe to send stop requests to the worker running the task
+
+        It's None if the task wasn't given to a worker or the worker is over.
+        """
+        if self.worker is None:
+            return None
+        return self.worker.conn_stop_requests
+
+    def is_alive(self) -> bool:
+        """Check if the task is queued or running"""
+        return self.exitcode is None
+
+    def join(self, timeout : Optional[float] = None) -> None:
+        """Wait till the task is over"""
+        if self.exitcode is None:
+            wait([self.sentinel], timeout)
+        self._close_done_pipe()
+
+    def terminate(self) -> None:
+        """Terminate the worker running the task"""
+        if self.worker is not None and self.exitcode is None:
+            self.worker.send_signal("terminate")
+
+    def kill(self) -> None:
+        """Kill the worker running the task"""
+        if self.worker is not None and self.exitcode is None:
+            self.worker.send_signal("kill")
+
+    def _set_done(self, int_exitcode : int) -> None:
+        """Mark the task as over"""
+        with self._lock:
+            self.exitcode = int_exitcode
+            self.bytes_task = b""
+            if self._conn_done_writer is not None:
+                self._conn_done_writer.close()
+                self._conn_done_writer = None
+
+    def _close_done_pipe(self) -> None:
+        """Close the pipe used to wait for the task after it was waited for"""
+        with self._lock:
+            if self.exitcode is None or self._conn_done_reader is None:
+                return None
+            self._conn_done_reader.close()
+            self._conn_done_reader = None
+        return None
+
+
+class _Worker(object):
+    """One worker process of the pool with pipes to talk to it"""
+
+    def __init__(self) -> None:
+        """Start the worker process"""
+        self.conn_tasks, conn_child_tasks = Pipe(duplex=True)
+        self.conn_stop_requests, conn_child_stop = Pipe(duplex=True)
+        self.process = Process(
+            target=run_tasks_in_worker,
+            args=(conn_child_tasks, conn_child_stop),
+            daemon=True,
+        )
+        self.process.start()
+        self.int_pid = self.process.pid
+        conn_child_tasks.close()
+        conn_child_stop.close()
+        self.task = None
+        self._lock = threading.Lock()
+
+    def send_signal(self, str_method : str) -> None:
+        """Call terminate() or kill() of the process if it's not closed"""
+        with self._lock:
+            if self.conn_tasks is not None:
+                getattr(self.process, str_method)()
+
+    def close(self) -> None:
+        """Close pipes and the handle of the worker which was reaped"""
+        with self._lock:
+            list_conns = [self.conn_tasks, self.conn_stop_requests]
+            self.conn_tasks = None
+            self.conn_stop_requests = None
+            if list_conns[0] is None:
+                return None
+            for conn in list_conns:
+                conn.close()
+            self.process.close()
+        return None
+
+
+class WorkersPool(object):
+    """Class with N long-lived processes which run given functions
+
+    Tasks are sent to idle workers over pipes. Worker redirects its
+    stdout/stderr to output files of every task while running it.
+    All pipes and worker sentinels are watched by ConnectionsWatcher,
+    so finished tasks are noticed at once and without polling.
+    """
+
+    def __init__(
+            self,
+            int_workers : int,
+            connections_watcher : Any,
+            func_on_task_done : Optional[Callable] = None
+    ) -> None:
+        """Initialize object
+
+        Args:
+            int_workers (int): Number of worker processes
+            connections_watcher (ConnectionsWatcher): Watcher to use
+            func_on_task_done (function, optional): \
+                Function to call (with PooledTask) when a task is over
+        """
+        self.int_workers = int_workers
+        self.connections_watcher = connections_watcher
+        self.func_on_task_done = func_on_task_done
+        self.deque_tasks = deque()
+        self.list_workers = []
+        self._lock = threading.RLock()
+        self.is_shut_down = False
+
+    def submit(
+            self,
+            int_process_id : int,
+            str_stdout_file : str,
+            str_stderr_file : str,
+            func_to_process : Callable,
+            args : tuple,
+            kwargs : dict,
+            func_on_result : Optional[Callable] = None,
+            dict_output_settings : Optional[dict] = None
+    ) -> PooledTask:
+        """Run function in the first idle worker (or when some is free)
+
+        Args:
+            dict_output_settings (dict, optional): \
+                How to write outputs (see open_output_file())
+            func_on_result (function, optional): Function to call with \
+                (result state, result) when the task is over or \
+                with None if the worker died without sending the result
+
+        Returns:
+            PooledTask: Handle for the task
+        """
+        bytes_task = pickle.dumps((
+            int_process_id, str_stdout_file, str_stderr_file,
+            dict_output_settings, func_to_process, args, kwargs))
+        task = PooledTask(int_process_id, bytes_task, func_on_result)
+        with self._lock:
+            if self.is_shut_down:
+                raise RuntimeError("Workers pool was shut down")
+            self.deque_tasks.append(task)
+            self._start_workers_if_needed()
+            self._send_tasks_to_idle_workers()
+        return task
+
+    def shutdown(self) -> None:
+        """Ask all workers to exit after current tasks and stop them
+
+        Tasks which weren't given to workers yet are finished
+        without result.
+        """
+        with self._lock:
+            self.is_shut_down = True
+            list_workers = self.list_workers
+            self.list_workers = []
+            list_tasks = list(self.deque_tasks)
+            self.deque_tasks.clear()
+        for task in list_tasks:
+            self._finish_task(task, -1)
+        for worker in list_workers:
+            self.connections_watcher.unregister(worker.conn_tasks)
+            self.connections_watcher.unregister(worker.process.sentinel)
+            try:
+                worker.conn_tasks.send(None)
+            except OSError:
+                pass
+        for worker in list_workers:
+            worker.process.join(1.0)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+            with self._lock:
+                task = worker.task
+                worker.task = None
+            if task is not None:
+                self._finish_task(task, -1)
+            worker.close()
+
+    def _start_workers_if_needed(self) -> None:
+        """Start new workers while there are tasks waiting for them"""
+        while len(self.list_workers) < self.int_workers:
+            int_idle = sum(
+                1 for worker in self.list_workers if worker.task is None)
+            if int_idle >= len(self.deque_tasks):
+                break
+            self._add_worker()
+
+    def _add_worker(self) -> None:
+        """Start one new worker and watch it"""
+        worker = _Worker()
+        self.list_workers.append(worker)
+        self.connections_watcher.register(
+            worker.conn_tasks,
+            lambda _, worker=worker: self._on_worker_message(worker))
+        self.connections_watcher.register(
+            worker.process.sentinel,
+            lambda _, worker=worker: self._on_worker_exit(worker))
+
+    def _send_tasks_to_idle_workers(self) -> None:
+        """Give queued tasks to idle workers"""
+        for worker in self.list_workers:
+            if not self.deque_tasks:
+                break
+            if worker.task is not None:
+                continue
+            task = self.deque_tasks.popleft()
+            worker.task = task
+            task.worker = worker
+            worker.conn_tasks.send_bytes(task.bytes_task)
+
+    def _on_worker_message(self, worker : _Worker) -> None:
+        """Process message from the worker that the task is over"""
+        try:
+            int_process_id, str_state, result = recv_result(worker.conn_tasks)
+        except (EOFError, OSError):
+            # Worker is dead, it's handled by _on_worker_exit
+            self.connections_watcher.unregister(worker.conn_tasks)
+            return None
+        with self._lock:
+            task = worker.task
+            worker.task = None
+            self._send_tasks_to_idle_workers()
+        if task is not None and task.int_process_id == int_process_id:
+            self._finish_task(task, 0, (str_state, result))
+        return None
+
+    def _on_worker_exit(self, worker : _Worker) -> None:
+        """Replace dead worker and finish the task it was running"""
+        with self._lock:
+            if worker not in self.list_workers:
+                # Worker is stopped by shutdown()
+                return None
+            self.list_workers.remove(worker)
+        self.connections_watcher.unregister(worker.conn_tasks)
+        self.connections_watcher.unregister(worker.process.sentinel)
+        worker.process.join()
+        with self._lock:
+            task = worker.task
+            worker.task = None
+            if not self.is_shut_down:
+                self._start_workers_if_needed()
+                self._send_tasks_to_idle_workers()
+        int_exitcode = worker.process.exitcode
+        if task is not None:
+            LOGGER.info(
+                "Worker %d running process %d exited with code %s",
+                worker.process.pid, task.int_process_id, int_exitcode)
+            self._finish_task(task, int_exitcode)
+        worker.close()
+        return None
+
+    def _finish_task(
+            self,
+            task : PooledTask,
+            int_exitcode : int,
+            tuple_result : Optional[tuple] = None
+    ) -> None:
+        """Mark task as over and tell about it"""
+        if task.func_on_result is not None:
+            task.func_on_result(tuple_result)
+        task._set_done(int_exitcode)
+        if self.func_on_task_done is not None:
+            self.func_on_task_done(task)
@@ -7,18 +7,34 @@ import logging
 import sys
 import atexit
 import threading
-from functools import partial
-from io import StringIO
+import signal
 import time
+import traceback
+import pickle
+from io import StringIO
 import _thread
+from multiprocessing.connection import Connection
 
 # Third party imports
 from char import char
 from IPython.display import clear_output as clear_output_jupyter
 
 # Local imports
+from .class_shared_memory_args import attach_shared_args
+from .class_shared_memory_args import detach_shared_args
+from .class_rotating_file import RotatingFile
+from .class_shared_output import SharedOutputStream
 
 DICT_STREAMS_PREV_STATE = {}
+# Signal which is used to ask the process to stop (None on Windows)
+STOP_SIGNAL = getattr(signal, "SIGUSR1", None)
+STR_STOP_REQUEST = "stop"
+STR_STOP_ACKNOWLEDGED = "ack"
+# States of the result sent back to the parent
+STR_RESULT_OK = "ok"
+STR_RESULT_ERROR = "error"
+# Seconds between flushes of block-buffered outputs
+FLOAT_SECONDS_BETWEEN_FLUSHES = 0.5
 
 
 
@@ -130,36 +146,379 @@ def redirect_all_stream_loggers(
 
 
 
-def listen_to_jpm_error_file(str_jpm_stderr_file : str) -> None:
-    """"""
-    if os.path.exists(str_jpm_stderr_file):
-        try:
-            os.remove(str_jpm_stderr_file)
-        except Exception:
-            pass
-    while True:
-        time.sleep(1)
-        if os.path.exists(str_jpm_stderr_file):
-            _thread.interrupt_main()
+def install_stop_requests_handler(
+        conn_stop_requests : Connection,
+        func_get_running_process_id : Optional[Callable] = None
+) -> None:
+    """Raise KeyboardInterrupt in the main thread when parent asks to stop
+
+    Parent sends (STR_STOP_REQUEST, process id) over the pipe.
+    On POSIX it then sends STOP_SIGNAL and the handler is run at once.
+    Where there is no such signal the request is received
+    by a thread which is blocked on the pipe (so it wakes up only then).
+    Either way the parent is told that the request was received.
+
+    Args:
+        conn_stop_requests (Connection): Pipe to receive stop requests from
+        func_get_running_process_id (function, optional): \
+            Function returning ID of the process (task) running now, \
+            requests for other IDs are ignored. None - accept all requests
+    """
+    def is_to_stop(tuple_request):
+        if func_get_running_process_id is None:
+            return True
+        int_running_process_id = func_get_running_process_id()
+        if int_running_process_id is None:
+            return False
+        return tuple_request[1] == int_running_process_id
+
+    def acknowledge(tuple_request):
+        conn_stop_requests.send((STR_STOP_ACKNOWLEDGED, tuple_request[1]))
+
+    if STOP_SIGNAL is not None:
+        def handle_stop_signal(*_):
+            list_requests = []
+            while conn_stop_requests.poll():
+                list_requests.append(conn_stop_requests.recv())
+            for tuple_request in list_requests:
+                if is_to_stop(tuple_request):
+                    acknowledge(tuple_request)
+                    raise KeyboardInterrupt(
+                        "Stop process by JupyterProcessManager")
+        signal.signal(STOP_SIGNAL, handle_stop_signal)
+        return None
+
+    def listen_to_stop_requests():
+        while True:
+            try:
+                tuple_request = conn_stop_requests.recv()
+            except (EOFError, OSError):
+                return None
+            if is_to_stop(tuple_request):
+                acknowledge(tuple_request)
+                _thread.interrupt_main()
+    threading.Thread(target=listen_to_stop_requests, daemon=True).start()
+    return None
 
 
 @char
 def wrapped_func(
         str_stdout_file : str,
         str_stderr_file : str,
-        str_jpm_stderr_file : str,
+        dict_output_settings : Optional[dict],
+        conn_stop_requests : Optional[Connection],
+        conn_results : Optional[Connection],
         func_to_process : Callable,
         *args : Any,
         **kwargs : Any
-) -> None:
-    """Wrapper to run function with outputs redirected to files"""
-    stdout_stream = open(str_stdout_file, "r+", buffering=1)
-    stderr_stream = open(str_stderr_file, 'r+', buffering=1)
+) -> Any:
+    """Wrapper to run function with outputs redirected to files
+
+    Value returned by the function (or the traceback of the error)
+    is sent to the parent over conn_results.
+    How outputs are written is set by dict_output_settings
+    (see open_output_file()), None - as usual files with line buffering.
+    """
+    stdout_stream = open_output_file(
+        str_stdout_file, dict_output_settings, is_stdout=True)
+    stderr_stream = open_output_file(str_stderr_file, dict_output_settings)
     redirect_stdout_stderr(stdout_stream, stderr_stream,)
-    threading.Thread(
-        target=partial(listen_to_jpm_error_file, str_jpm_stderr_file),
-        daemon=True,
-    ).start()
+    start_output_flusher(dict_output_settings)
+    if conn_stop_requests is not None:
+        install_stop_requests_handler(conn_stop_requests)
     print("Test that jupyter_process_manager redirected stdout to file")
-    func_to_process(*args, **kwargs)
+    try:
+        args, kwargs = attach_shared_args(args, kwargs)
+        result = func_to_process(*args, **kwargs)
+    except BaseException:
+        if conn_results is not None:
+            send_result(conn_results, (STR_RESULT_ERROR, traceback.format_exc()))
+        raise
+    if conn_results is not None:
+        send_result(conn_results, (STR_RESULT_OK, result))
     return_stdout_stderr_to_usual_state()
+    return result
+
+
+def open_output_file(
+        str_file_path : str,
+        dict_output_settings : Optional[dict] = None,
+        is_stdout : bool = False
+) -> IO[str]:
+    """Open file for output of the process
+
+    Args:
+        str_file_path (str): Path to the file
+        dict_output_settings (dict, optional): Settings of the output:
+            int_max_bytes: Max size of the file, when it's reached \
+                the file is rotated (see RotatingFile), None - no limit
+            int_max_segments: Max number of rotated segments to keep
+            int_buffer_bytes: Size of the write buffer, \
+                None - line buffering (every line is written at once)
+            float_flush_seconds: Seconds between flushes of the buffer
+            str_shared_stdout_name: Name of SharedOutputRing \
+                to write STDOUT into as well (given by the parent)
+        is_stdout (bool, optional): Flag if the file is for STDOUT
+    """
+    dict_output_settings = dict_output_settings or {}
+    int_buffer_bytes = dict_output_settings.get("int_buffer_bytes")
+    if dict_output_settings.get("int_max_bytes") is None:
+        file_stream = open(
+            str_file_path, "r+", buffering=int_buffer_bytes or 1)
+    else:
+        file_stream = RotatingFile(
+            str_file_path,
+            dict_output_settings["int_max_bytes"],
+            int_max_segments=dict_output_settings["int_max_segments"],
+            int_buffer_bytes=int_buffer_bytes,
+        )
+    str_ring_name = dict_output_settings.get("str_shared_stdout_name")
+    if is_stdout and str_ring_name is not None:
+        return SharedOutputStream(file_stream, str_ring_name)
+    return file_stream
+
+
+def start_output_flusher(dict_output_settings : Optional[dict]) -> None:
+    """Flush block-buffered stdout and stderr in background
+
+    Outputs are flushed every float_flush_seconds, so the widget
+    shows them nearly live while most prints cost no syscall.
+    They are also flushed when the process is terminated with SIGTERM.
+    Nothing is done if outputs are line-buffered.
+    """
+    dict_output_settings = dict_output_settings or {}
+    if not dict_output_settings.get("int_buffer_bytes"):
+        return None
+    float_flush_seconds = dict_output_settings.get(
+        "float_flush_seconds") or FLOAT_SECONDS_BETWEEN_FLUSHES
+
+    def flush_periodically():
+        while True:
+            time.sleep(float_flush_seconds)
+            flush_stdout_stderr()
+    threading.Thread(target=flush_periodically, daemon=True).start()
+
+    sigterm = getattr(signal, "SIGTERM", None)
+    if sigterm is not None and os.name != "nt":
+        def flush_and_terminate(*_):
+            flush_stdout_stderr()
+            signal.signal(sigterm, signal.SIG_DFL)
+            os.kill(os.getpid(), sigterm)
+        signal.signal(sigterm, flush_and_terminate)
+    return None
+
+
+def flush_stdout_stderr() -> None:
+    """Flush current stdout and stderr (they can be closed or switched)"""
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except (ValueError, OSError):
+            pass
+
+
+def send_result(conn : Connection, tuple_result : tuple) -> None:
+    """Send tuple ending with (result state, result) over the pipe
+
+    Pickle protocol 5 is used, so big buffers (E.G. numpy arrays)
+    are sent as separate messages straight from memory.
+    If the result can't be pickled then error state is sent instead.
+    """
+    list_buffers = []
+    try:
+        bytes_main = pickle.dumps(
+            tuple_result, protocol=5, buffer_callback=list_buffers.append)
+    except Exception:
+        list_buffers = []
+        bytes_main = pickle.dumps(tuple_result[:-2] + (
+            STR_RESULT_ERROR,
+            "Unable to send result to the main process\n" +
+            traceback.format_exc()
+        ))
+    list_memoryviews = [buffer_obj.raw() for buffer_obj in list_buffers]
+    conn.send([len(bytes_main)] + [mv.nbytes for mv in list_memoryviews])
+    conn.send_bytes(bytes_main)
+    for memoryview_obj in list_memoryviews:
+        conn.send_bytes(memoryview_obj)
+
+
+def recv_result(conn : Connection) -> tuple:
+    """Receive tuple sent by send_result()"""
+    list_sizes = conn.recv()
+    list_buffers = []
+    for int_size in list_sizes:
+        bytearray_buffer = bytearray(int_size)
+        if int_size:
+            conn.recv_bytes_into(bytearray_buffer)
+        else:
+            conn.recv_bytes()
+        list_buffers.append(bytearray_buffer)
+    return pickle.loads(list_buffers[0], buffers=list_buffers[1:])
+
+
+class ChunkItemError(object):
+    """Error of the function for one item of the chunk
+
+    It's put into the list of values of the chunk instead of the value,
+    so values of other items of the chunk are not lost.
+    """
+
+    def __init__(self, str_traceback : str) -> None:
+        """"""
+        self.str_traceback = str_traceback
+
+    def __repr__(self) -> str:
+        """"""
+        list_lines = self.str_traceback.strip().splitlines() or [""]
+        return "ChunkItemError(%r)" % list_lines[-1]
+
+
+def run_function_for_chunk(
+        func_to_process : Callable,
+        list_tuples_args : list[tuple]
+) -> list[Any]:
+    """Run function for every tuple of arguments in the chunk one by one
+
+    If the function raised an error for some item then the traceback
+    is printed to stderr (so the process is shown with error)
+    and other items are still processed.
+
+    Returns:
+        list: Values returned by the function for every tuple of arguments, \
+            ChunkItemError for items which raised an error
+    """
+    list_values = []
+    for args in list_tuples_args:
+        try:
+            list_values.append(func_to_process(*args))
+        except Exception:
+            traceback.print_exc()
+            list_values.append(ChunkItemError(traceback.format_exc()))
+    return list_values
+
+
+def run_tasks_in_worker(
+        conn_tasks : Connection,
+        conn_stop_requests : Connection
+) -> None:
+    """Run tasks received from the parent one by one in this process
+
+    Every task is a tuple: (process ID, stdout file, stderr file,
+        output settings, function, args, kwargs)
+    While a task is running its outputs are redirected to its own files.
+    When the task is over (process ID, result state, result)
+    is sent back to the parent with send_result().
+    None instead of a task means that the worker should exit.
+    """
+    dict_running_task = {"int_process_id": None}
+    install_stop_requests_handler(
+        conn_stop_requests,
+        func_get_running_process_id=lambda: dict_running_task["int_process_id"]
+    )
+    DICT_STREAMS_PREV_STATE["stdout"] = sys.stdout
+    DICT_STREAMS_PREV_STATE["stderr"] = sys.stderr
+    # Streams of the worker are switched between files of tasks,
+    # so handlers created by tasks never keep a closed file
+    stdout_proxy = WorkerStream(sys.stdout)
+    stderr_proxy = WorkerStream(sys.stderr)
+    _switch_streams(stdout_proxy, stderr_proxy, _find_std_stream_handlers())
+    # All tasks of the pool have the same output settings
+    is_flusher_started = False
+    while True:
+        try:
+            tuple_task = conn_tasks.recv()
+        except EOFError:
+            break
+        if tuple_task is None:
+            break
+        (
+            int_process_id, str_stdout_file, str_stderr_file,
+            dict_output_settings, func_to_process, args, kwargs
+        ) = tuple_task
+        if not is_flusher_started:
+            start_output_flusher(dict_output_settings)
+            is_flusher_started = True
+        with open_output_file(
+                str_stdout_file, dict_output_settings, is_stdout=True) \
+                as stdout_stream, \
+                open_output_file(str_stderr_file, dict_output_settings) \
+                as stderr_stream:
+            stdout_proxy.stream = stdout_stream
+            stderr_proxy.stream = stderr_stream
+            try:
+                dict_running_task["int_process_id"] = int_process_id
+                print("Test that jupyter_process_manager redirected stdout to file")
+                args, kwargs = attach_shared_args(args, kwargs)
+                tuple_result = (
+                    STR_RESULT_OK, func_to_process(*args, **kwargs))
+            except BaseException:
+                dict_running_task["int_process_id"] = None
+                traceback.print_exc()
+                tuple_result = (STR_RESULT_ERROR, traceback.format_exc())
+            finally:
+                dict_running_task["int_process_id"] = None
+                del args, kwargs
+                detach_shared_args()
+                stdout_proxy.stream = DICT_STREAMS_PREV_STATE["stdout"]
+                stderr_proxy.stream = DICT_STREAMS_PREV_STATE["stderr"]
+        send_result(conn_tasks, (int_process_id,) + tuple_result)
+
+
+class WorkerStream(object):
+    """Stream of the worker which writes to the stream of the running task
+
+    sys.stdout, sys.stderr and logging handlers of the worker
+    (also ones created by tasks) keep this object all the time,
+    only the stream it writes to is switched between tasks.
+    """
+
+    def __init__(self, stream : IO[str]) -> None:
+        """Initialize object
+
+        Args:
+            stream (IO[str]): Stream to write to
+        """
+        self.stream = stream
+
+    def write(self, str_text : str) -> int:
+        """"""
+        return self.stream.write(str_text)
+
+    def flush(self) -> None:
+        """"""
+        self.stream.flush()
+
+    def __getattr__(self, str_name : str) -> Any:
+        """Take all other attributes from the current stream"""
+        return getattr(self.stream, str_name)
+
+
+def _find_std_stream_handlers() -> tuple[list, list]:
+    """Find logging handlers which write to stdout and to stderr"""
+    list_stdout_handlers = []
+    list_stderr_handlers = []
+    for logger_tmp in list(logging.Logger.manager.loggerDict.values()):
+        for handler_obj in getattr(logger_tmp, "handlers", []):
+            if not isinstance(handler_obj, logging.StreamHandler):
+                continue
+            str_stream_name = getattr(handler_obj.stream, "name", None)
+            if str_stream_name == "<stdout>":
+                list_stdout_handlers.append(handler_obj)
+            if str_stream_name == "<stderr>":
+                list_stderr_handlers.append(handler_obj)
+    return list_stdout_handlers, list_stderr_handlers
+
+
+def _switch_streams(
+        stdout_stream : IO[str],
+        stderr_stream : IO[str],
+        tuple_handlers : tuple[list, list]
+) -> None:
+    """Switch stdout, stderr and given stream handlers to given streams"""
+    sys.stdout = stdout_stream
+    sys.stderr = stderr_stream
+    list_stdout_handlers, list_stderr_handlers = tuple_handlers
+    for handler_obj in list_stdout_handlers:
+        handler_obj.stream = stdout_stream
+    for handler_obj in list_stderr_handlers:
+        handler_obj.stream = stderr_stream
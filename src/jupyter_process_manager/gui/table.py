@@ -0,0 +1,83 @@
+"""Module with table widget which updates only changed rows"""
+from __future__ import print_function
+# Standard library imports
+from typing import Any
+import html
+
+# Third party imports
+import ipywidgets
+from ipywidgets import VBox
+
+# Local imports
+
+STR_ROW_STYLE = (
+    "display: grid; grid-template-columns: repeat({int_columns}, {str_width});"
+    " font-family: monospace; white-space: nowrap; {str_extra_style}")
+STR_CELL_STYLE = "padding: 1px 4px; overflow: hidden; text-overflow: ellipsis;"
+
+
+class WidgetTable(VBox):
+    """Table where every row is a separate HTML widget
+
+    On update only rows which HTML changed are sent to the browser,
+    and the list of row widgets is changed only when number of rows changes.
+    """
+
+    def __init__(
+            self,
+            list_headers : list[str],
+            str_column_width : str = "110px"
+    ) -> None:
+        """Initialize object
+
+        Args:
+            list_headers (list): Names of columns
+            str_column_width (str, optional): CSS width of every column
+        """
+        super().__init__()
+        self.int_columns = len(list_headers)
+        self.str_column_width = str_column_width
+        self.html_header = ipywidgets.HTML(
+            self._get_row_html(list_headers, is_header=True))
+        self.html_info = ipywidgets.HTML("")
+        self.list_html_rows = []
+        self.children = [self.html_header, self.html_info]
+
+    def update_rows(self, list_rows : list[list], str_info : str = "") -> None:
+        """Show new rows sending only the changed ones
+
+        Args:
+            list_rows (list): Rows, every row is a list of cell values
+            str_info (str, optional): Text to show under the table
+        """
+        list_str_htmls = [self._get_row_html(list_row) for list_row in list_rows]
+        is_number_changed = len(list_str_htmls) != len(self.list_html_rows)
+        while len(self.list_html_rows) < len(list_str_htmls):
+            self.list_html_rows.append(ipywidgets.HTML(""))
+        del self.list_html_rows[len(list_str_htmls):]
+        for html_row, str_html in zip(self.list_html_rows, list_str_htmls):
+            if html_row.value != str_html:
+                html_row.value = str_html
+        str_info_html = html.escape(str_info)
+        if self.html_info.value != str_info_html:
+            self.html_info.value = str_info_html
+        if is_number_changed:
+            self.children = (
+                [self.html_header] + self.list_html_rows + [self.html_info])
+
+    def _get_row_html(
+            self,
+            list_row : list[Any],
+            is_header : bool = False
+    ) -> str:
+        """Get HTML for one row of the table"""
+        str_row_style = STR_ROW_STYLE.format(
+            int_columns=self.int_columns,
+            str_width=self.str_column_width,
+            str_extra_style="font-weight: bold;" if is_header else "",
+        )
+        str_cells = "".join(
+            '<div style="%s">%s</div>' % (
+                STR_CELL_STYLE, html.escape("" if value is None else str(value)))
+            for value in list_row)
+        return '<div style="%s">%s</div>' % (str_row_style, str_cells)
@@ -2,6 +2,8 @@
 from __future__ import print_function
 # Standard library imports
 from typing import Optional, Any, Union
+import asyncio
+import html
 import time
 import threading
 
@@ -14,7 +16,15 @@ from ipywidgets_toggle_buttons import ToggleButtonsAutoSize
 # Local imports
 from .layouts import MAIN_VBOX_LAYOUT
 from .layouts import HBOX_LAYOUT
+from .table import WidgetTable
+from ..class_file_changes_watcher import FileChangesWatcher
+from ..class_shared_output import SharedOutputReader
 from ..class_processes_manager import JupyterProcessesManager
+from ..class_processes_manager import LIST_TABLE_HEADERS
+
+# Seconds to wait for more writes before showing new output
+FLOAT_DEBOUNCE_SECONDS = 0.2
+FLOAT_MIN_SECONDS_BETWEEN_REFRESHES = 1.0
 
 
 class WidgetProcessesManager(VBox):
@@ -28,18 +38,41 @@ class WidgetProcessesManager(VBox):
         """
         super().__init__()
         self.process_manager_obj = process_manager_obj
+        # Output is read again only when its files were changed,
+        # only files of the shown process are watched
+        self.file_changes_watcher = FileChangesWatcher(
+            process_manager_obj.str_dir_for_output)
+        self._handle_scheduled_refresh = None
+        self._float_last_refresh = 0.0
         self.create_widget()
-
-        threading.Thread(
-            target=self._start_thread_auto_output_update,
-            daemon=True,
-        ).start()
         self._is_to_update_output = True
+        try:
+            # Jupyter kernel runs asyncio loop, update widget inside it
+            loop = asyncio.get_running_loop()
+            loop.create_task(self._auto_output_update_in_loop())
+            if self.file_changes_watcher.fileno() is not None:
+                loop.add_reader(
+                    self.file_changes_watcher.fileno(),
+                    self._on_output_files_changed)
+        except RuntimeError:
+            threading.Thread(
+                target=self._start_thread_auto_output_update,
+                daemon=True,
+            ).start()
 
     def init_all_widgets(self) -> None:
         """"""
-        self.OUTPUT_PROCESSES_CONDITIONS = ipywidgets.Output()
+        self.HTML_PROCESSES_SUMMARY = ipywidgets.HTML()
+        self.TABLE_PROCESSES_CONDITIONS = WidgetTable(LIST_TABLE_HEADERS)
+        self.OUTPUT_PROCESSES_CONDITIONS = VBox([
+            ipywidgets.HTML("<h2>Processes conditions:</h2>"),
+            self.HTML_PROCESSES_SUMMARY,
+            self.TABLE_PROCESSES_CONDITIONS,
+        ])
         self.OUTPUT = ipywidgets.Output()
+        # (process id, output type, number of errors or for STDOUT:
+        # (reader position, shown partial line, number of shown lines))
+        self._tuple_shown_output = None
         self.BUTTONS_CHOOSE_PROCESS = ToggleButtonsAutoSize()
         self.button_stop_all_processes = ipywidgets.Button(
             description='STOP ALL processes',
@@ -177,7 +210,17 @@ class WidgetProcessesManager(VBox):
         """"""
         if clear_output_at_first:
             self.OUTPUT.clear_output(wait=True)
+        self._tuple_shown_output = None
+        self._float_last_refresh = time.monotonic()
         output_type = self.togbut_select_what_to_show.value
+        process_obj = self.process_manager_obj.dict_all_processes_by_id.get(
+            self.BUTTONS_CHOOSE_PROCESS.value)
+        if process_obj is not None:
+            # Only writes to outputs of the shown process wake up the widget
+            self.file_changes_watcher.watch_files([
+                process_obj.str_stdout_file, process_obj.str_stderr_file])
+            # Only changes made after this moment should trigger refresh
+            self._is_output_changed(process_obj, output_type)
         if output_type == "Show process STDOUT":
             self._show_stdout()
         elif output_type == "Show LAST ERROR":
@@ -226,8 +269,7 @@ class WidgetProcessesManager(VBox):
         self._is_to_update_output = False
         self.OUTPUT.clear_output(wait=True)
         int_chosen_process = self.BUTTONS_CHOOSE_PROCESS.value
-        self.process_manager_obj.dict_all_processes_by_id.pop(
-            int_chosen_process, None)
+        self.process_manager_obj.remove_process(int_chosen_process)
 
 
     def _show_stdout(self, *_) -> None:
@@ -243,10 +285,22 @@ class WidgetProcessesManager(VBox):
 
         process_obj = \
             self.process_manager_obj.dict_all_processes_by_id[int_chosen_process]
-        str_output = process_obj.get_stdout()
+        tuple_position, list_lines, str_partial_line = \
+            process_obj.stdout_reader.get_new_lines()
+        str_output = "".join(
+            str_line + "\n" for str_line in list_lines) + str_partial_line
+        if not str_output:
+            # Placeholder can't be continued, all output is shown from scratch
+            tuple_position = None
+            str_output = "STDOUT OUTPUT IS EMPTY"
         with self.OUTPUT:
             # print("STDOUT:")
-            print(str_output.strip())
+            print(str_output, end="")
+        self._tuple_shown_output = (
+            int_chosen_process,
+            "Show process STDOUT",
+            (tuple_position, str_partial_line, len(list_lines)),
+        )
 
     def _show_last_error(self, *_) -> None:
         """"""
@@ -261,7 +315,9 @@ class WidgetProcessesManager(VBox):
 
         process_obj = \
             self.process_manager_obj.dict_all_processes_by_id[int_chosen_process]
-        int_errors_happened = len(process_obj.get_list_all_errors())
+        int_errors_happened = process_obj.get_number_of_errors()
+        self._tuple_shown_output = (
+            int_chosen_process, "Show LAST ERROR", int_errors_happened)
         with self.OUTPUT:
             print("Last Error:")
             print("ERRORs found: ", int_errors_happened)
@@ -280,6 +336,8 @@ class WidgetProcessesManager(VBox):
         process_obj = \
             self.process_manager_obj.dict_all_processes_by_id[int_chosen_process]
         all_errors = process_obj.get_list_all_errors()
+        self._tuple_shown_output = (
+            int_chosen_process, "Show ALL ERRORs", len(all_errors))
         with self.OUTPUT:
             print("All Errors:")
             print("ERRORs found: ", len(all_errors))
@@ -292,10 +350,153 @@ class WidgetProcessesManager(VBox):
         """"""
         while True:
             time.sleep(1)
-            self.OUTPUT_PROCESSES_CONDITIONS.clear_output(wait=True)
-            with self.OUTPUT_PROCESSES_CONDITIONS:
-                self.process_manager_obj.print_info_about_running_processes(
-                    int_max_processes_to_show=10)
+            self._update_processes_conditions()
             time.sleep(1)
             if self._is_to_update_output:
+                self._update_output_incrementally()
+
+    async def _auto_output_update_in_loop(self) -> None:
+        """Same as _start_thread_auto_output_update but in asyncio loop"""
+        while True:
+            await asyncio.sleep(1)
+            self._update_processes_conditions()
+            await asyncio.sleep(1)
+            if self._is_to_update_output:
+                self._update_output_incrementally()
+
+    def _update_processes_conditions(self) -> None:
+        """Update changed parts of the table with processes conditions"""
+        list_lines = [
+            self.process_manager_obj.get_working_time_str(),
+            self.process_manager_obj.get_summary_str(),
+        ]
+        str_summary = "<br>".join(
+            html.escape(str_line).replace("\n", "<br>")
+            for str_line in list_lines if str_line)
+        if self.HTML_PROCESSES_SUMMARY.value != str_summary:
+            self.HTML_PROCESSES_SUMMARY.value = str_summary
+        list_rows, str_info = \
+            self.process_manager_obj.get_table_with_conditions(
+                int_max_processes_to_show=10)
+        self.TABLE_PROCESSES_CONDITIONS.update_rows(list_rows, str_info)
+
+    def _update_output_incrementally(self) -> None:
+        """Send to the browser only new output of the shown process
+
+        New STDOUT lines are appended to the shown ones (the reader
+        counts added lines, so only lines after the shown ones are taken),
+        errors are shown again only if their number changed.
+        Everything is redrawn if the shown text can't be continued
+        or if the browser has twice more lines than the reader keeps.
+        """
+        if self._tuple_shown_output is None:
+            self._update_output(clear_output_at_first=True)
+            return None
+        int_shown_process, str_shown_type, shown_value = \
+            self._tuple_shown_output
+        int_chosen_process = self.BUTTONS_CHOOSE_PROCESS.value
+        output_type = self.togbut_select_what_to_show.value
+        process_obj = self.process_manager_obj.dict_all_processes_by_id.get(
+            int_chosen_process)
+        if (
+                process_obj is None or
+                int_shown_process != int_chosen_process or
+                str_shown_type != output_type
+        ):
+            self._update_output(clear_output_at_first=True)
+            return None
+        if not self._is_output_changed(process_obj, output_type):
+            return None
+        self._float_last_refresh = time.monotonic()
+        if output_type != "Show process STDOUT":
+            if process_obj.get_number_of_errors() != shown_value:
                 self._update_output(clear_output_at_first=True)
+            return None
+        tuple_shown_position, str_shown_partial_line, int_shown_lines = \
+            shown_value
+        if tuple_shown_position is None:
+            self._update_output(clear_output_at_first=True)
+            return None
+        stdout_reader = process_obj.stdout_reader
+        tuple_position, list_new_lines, str_partial_line = \
+            stdout_reader.get_new_lines(tuple_shown_position)
+        if (
+                tuple_position == tuple_shown_position and
+                str_partial_line == str_shown_partial_line
+        ):
+            return None
+        # Previously partial line is continued by the first new line
+        str_continued_line = (list_new_lines or [str_partial_line])[0]
+        if (
+                list_new_lines is None or
+                not str_continued_line.startswith(str_shown_partial_line) or
+                int_shown_lines + len(list_new_lines) >
+                2 * stdout_reader.int_max_lines
+        ):
+            self._update_output(clear_output_at_first=True)
+            return None
+        str_new_output = str_partial_line
+        if list_new_lines:
+            str_new_output = "".join(
+                str_line + "\n" for str_line in list_new_lines) + \
+                str_partial_line
+        with self.OUTPUT:
+            # Frontend appends the stream message to the shown output
+            print(str_new_output[len(str_shown_partial_line):], end="")
+        self._tuple_shown_output = (
+            int_chosen_process,
+            output_type,
+            (
+                tuple_position,
+                str_partial_line,
+                int_shown_lines + len(list_new_lines),
+            ),
+        )
+        return None
+
+    def _is_output_changed(self, process_obj : Any, output_type : str) -> bool:
+        """Check if the output changed since the previous check
+
+        STDOUT passed through shared memory is checked without
+        touching the file system.
+        """
+        if (
+                output_type == "Show process STDOUT" and
+                isinstance(process_obj.stdout_reader, SharedOutputReader)
+        ):
+            return process_obj.stdout_reader.is_changed()
+        return self.file_changes_watcher.is_changed(
+            _get_file_with_output(process_obj, output_type))
+
+    def _on_output_files_changed(self) -> None:
+        """Schedule refresh of the output when files of outputs changed
+
+        Refresh is delayed to wait for more writes
+        and to refresh not more often than once in a second.
+        """
+        if not self.file_changes_watcher.read_events():
+            return None
+        if not self._is_to_update_output:
+            return None
+        if self._handle_scheduled_refresh is not None:
+            return None
+        float_delay = max(
+            FLOAT_DEBOUNCE_SECONDS,
+            self._float_last_refresh + FLOAT_MIN_SECONDS_BETWEEN_REFRESHES -
+            time.monotonic())
+        self._handle_scheduled_refresh = asyncio.get_running_loop().call_later(
+            float_delay, self._refresh_output_on_change)
+        return None
+
+    def _refresh_output_on_change(self) -> None:
+        """Show new output after changes of files"""
+        self._handle_scheduled_refresh = None
+        if self._is_to_update_output:
+            self._update_output_incrementally()
+
+
+def _get_file_with_output(process_obj : Any, output_type : str) -> str:
+    """Get path to the file which is shown for the type of output"""
+    if output_type == "Show process STDOUT":
+        return process_obj.str_stdout_file
+    return process_obj.str_stderr_file
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+import os
+import gzip
+import time
+import threading
+
+import pytest
+
+from jupyter_process_manager import JupyterProcessesManager
+from jupyter_process_manager import ProcessFailedError
+
+from jupyter_process_manager.class_file_tail_reader import FileTailReader
+from jupyter_process_manager.class_traceback_index import TracebackIndex
+from jupyter_process_manager.class_rotating_file import RotatingFile
+from jupyter_process_manager.class_rotating_file import STR_DROPPED_OUTPUT_MARKER
+from jupyter_process_manager.class_rotating_file import remove_output_files
+from jupyter_process_manager.class_shared_output import SharedOutputRing
+from jupyter_process_manager.class_shared_output import SharedOutputReader
+from jupyter_process_manager.class_shared_output import SharedOutputStream
+from jupyter_process_manager.class_shared_output import STR_LOST_OUTPUT_MARKER
+from jupyter_process_manager.class_outputs_archive import archive_output_file
+from jupyter_process_manager.class_file_changes_watcher import FileChangesWatcher
+
+
+def test_tail_reader_reads_only_appended_lines(tmp_path):
+    """"""
+    str_file = str(tmp_path / "stdout_1.txt")
+    with open(str_file, "w") as file_handler:
+        file_handler.write("line 0\nline 1\npart")
+    tail_reader = FileTailReader(str_file, int_max_lines=2)
+    assert tail_reader.get_lines() == ["line 0", "line 1", "part"]
+    with open(str_file, "a") as file_handler:
+        file_handler.write("ial\nline 3\n")
+    assert tail_reader.update() == len("ial\nline 3\n")
+    assert tail_reader.get_lines() == ["partial", "line 3"]
+    assert tail_reader.update() == 0
+
+
+def test_tail_reader_handles_truncated_and_huge_files(tmp_path):
+    """"""
+    str_file = str(tmp_path / "stdout_1.txt")
+    with open(str_file, "w") as file_handler:
+        for int_line in range(100000):
+            file_handler.write("line %d\n" % int_line)
+    tail_reader = FileTailReader(str_file, int_max_lines=3)
+    assert tail_reader.get_lines() == ["line 99997", "line 99998", "line 99999"]
+    with open(str_file, "w") as file_handler:
+        file_handler.write("new\n")
+    assert tail_reader.get_text() == "new"
+
+    for int_progress in range(3):
+        with open(str_file, "w") as file_handler:
+            file_handler.write("progress %3d\n" % int_progress)
+        assert tail_reader.get_text() == "progress %3d" % int_progress
+
+
+def test_traceback_index_scans_only_new_bytes(tmp_path):
+    """"""
+    str_file = str(tmp_path / "stderr_1.txt")
+    tracebacks_index = TracebackIndex(str_file)
+    with open(str_file, "w") as file_handler:
+        file_handler.write("warning\nTraceback (most recent call last):\n A\n")
+        file_handler.write("Trace")
+    assert tracebacks_index.get_number_of_errors() == 1
+    with open(str_file, "a") as file_handler:
+        file_handler.write("back (most recent call last):\n B\n")
+    assert tracebacks_index.get_number_of_errors() == 2
+    assert tracebacks_index.get_last_error() == \
+        "Traceback (most recent call last):\n B\n"
+    assert tracebacks_index.get_all_errors()[0] == \
+        "Traceback (most recent call last):\n A\n"
+
+
+def test_readers_follow_rotated_segments(tmp_path):
+    """"""
+    str_file = str(tmp_path / "stderr_1.txt")
+    open(str_file, "w").close()
+    tail_reader = FileTailReader(str_file, int_max_lines=2)
+    tracebacks_index = TracebackIndex(str_file)
+    rotating_file = RotatingFile(str_file, 100, int_max_segments=2)
+    rotating_file.write("Traceback (most recent call last):\n A\n")
+    assert tail_reader.get_lines() == ["Traceback (most recent call last):", " A"]
+    for int_line in range(100):
+        rotating_file.write("line %d\n" % int_line)
+    rotating_file.write("Traceback (most recent call last):\n B\n")
+    rotating_file.flush()
+    assert tail_reader.get_lines() == ["Traceback (most recent call last):", " B"]
+    assert tracebacks_index.get_number_of_errors() == 2
+    assert STR_DROPPED_OUTPUT_MARKER in tracebacks_index.get_all_errors()[0]
+    int_disk_bytes = sum(
+        os.path.getsize(str(path)) for path in tmp_path.iterdir())
+    assert int_disk_bytes <= 3 * 100 + 10
+    rotating_file.seek(0)
+    rotating_file.truncate(0)
+    rotating_file.write("new\n")
+    rotating_file.flush()
+    assert tail_reader.get_text() == "new"
+    assert tracebacks_index.get_number_of_errors() == 0
+    rotating_file.close()
+
+
+def test_rotating_file_caps_segments_of_multibyte_text(tmp_path):
+    """"""
+    str_file = str(tmp_path / "stdout_1.txt")
+    rotating_file = RotatingFile(str_file, 10, int_max_segments=100)
+    str_text = "\u0436" * 25 + "\U0001f600" * 7 + "abc\n"
+    rotating_file.write(str_text)
+    rotating_file.flush()
+    list_sizes = [
+        os.path.getsize(str(path)) for path in tmp_path.iterdir()
+        if path.suffix != ".last"]
+    assert max(list_sizes) <= 10
+    assert sum(list_sizes) == len(str_text.encode("utf-8"))
+    tail_reader = FileTailReader(str_file)
+    assert tail_reader.get_lines() == [str_text[:-1]]
+    rotating_file.close()
+
+
+def test_shared_output_reader_reads_ring_without_files():
+    """"""
+    ring = SharedOutputRing(int_bytes=64)
+    shared_reader = SharedOutputReader(ring, int_max_lines=2)
+    try:
+        ring_of_child = SharedOutputRing(str_name=ring.str_name)
+        ring_of_child.write(b"line 0\nline 1\npart")
+        assert shared_reader.get_lines() == ["line 0", "line 1", "part"]
+        ring_of_child.write(b"ial\n" + b"x" * 100 + b"\nlast\n")
+        assert shared_reader.get_lines() == [STR_LOST_OUTPUT_MARKER, "last"]
+        ring_of_child.clear()
+        ring_of_child.write(b"new\n")
+        assert shared_reader.get_text() == "new"
+        ring_of_child.close()
+    finally:
+        shared_reader.release()
+    assert shared_reader.ring is None
+    assert shared_reader.get_text() == "new"
+
+
+def test_shared_output_stream_keeps_lines_of_threads_whole(tmp_path):
+    """"""
+    ring = SharedOutputRing(int_bytes=1024 * 1024)
+    shared_reader = SharedOutputReader(ring, int_max_lines=100000)
+    str_file = str(tmp_path / "stdout_1.txt")
+    try:
+        with open(str_file, "w") as file_handler:
+            shared_stream = SharedOutputStream(file_handler, ring.str_name)
+
+            def print_lines(int_thread):
+                for int_line in range(2000):
+                    shared_stream.write("thread %d line %d\n" % (
+                        int_thread, int_line))
+
+            list_threads = [
+                threading.Thread(target=print_lines, args=(int_thread,))
+                for int_thread in range(4)]
+            for thread_obj in list_threads:
+                thread_obj.start()
+            for thread_obj in list_threads:
+                thread_obj.join()
+            shared_stream.flush()
+            list_lines = shared_reader.get_lines()
+            assert len(list_lines) == 4 * 2000
+            assert all(str_line.startswith("thread ") for str_line in list_lines)
+            with open(str_file) as file_reader:
+                assert file_reader.read().splitlines() == list_lines
+            shared_stream.ring.close()
+    finally:
+        shared_reader.release()
+
+
+def test_readers_switch_to_compressed_archive(tmp_path):
+    """"""
+    str_file = str(tmp_path / "stderr_1.txt")
+    str_text = "Traceback (most recent call last):\n A\n" + "".join(
+        "line %d\n" % int_line for int_line in range(1000))
+    str_text += "Traceback (most recent call last):\n B\n"
+    with open(str_file, "w") as file_handler:
+        file_handler.write(str_text)
+    tail_reader = FileTailReader(str_file, int_max_lines=2)
+    tracebacks_index = TracebackIndex(str_file)
+    assert tracebacks_index.get_number_of_errors() == 2
+    archive = archive_output_file(str_file, "gzip", int_member_bytes=1000)
+    assert len(archive.list_int_starts) > 3
+    tail_reader.set_archive(archive)
+    tracebacks_index.set_archive(archive)
+    remove_output_files(str_file)
+    with gzip.open(archive.str_archive_path) as file_handler:
+        assert file_handler.read() == str_text.encode()
+    assert tail_reader.get_lines() == ["Traceback (most recent call last):", " B"]
+    tail_reader.reset()
+    assert tail_reader.get_lines() == ["Traceback (most recent call last):", " B"]
+    assert tracebacks_index.get_number_of_errors() == 2
+    assert tracebacks_index.get_last_error() == \
+        "Traceback (most recent call last):\n B\n"
+    assert tracebacks_index.get_all_errors()[0].startswith(
+        "Traceback (most recent call last):\n A\nline 0\n")
+
+
+def test_tail_reader_gives_lines_after_position(tmp_path):
+    """"""
+    str_file = str(tmp_path / "stdout_1.txt")
+    open(str_file, "w").close()
+    tail_reader = FileTailReader(str_file, int_max_lines=3)
+    tuple_position, list_lines, str_partial = tail_reader.get_new_lines()
+    assert (list_lines, str_partial) == ([], "")
+    for int_line in range(10):
+        with open(str_file, "a") as file_handler:
+            file_handler.write("line %d\npart" % int_line)
+        tuple_position, list_lines, str_partial = \
+            tail_reader.get_new_lines(tuple_position)
+        assert list_lines == (["part" * bool(int_line) + "line %d" % int_line])
+        assert str_partial == "part"
+    with open(str_file, "a") as file_handler:
+        file_handler.write("\n" + "line\n" * 5)
+    assert tail_reader.get_new_lines(tuple_position)[1] is None
+    with open(str_file, "w") as file_handler:
+        file_handler.write("new\n")
+    assert tail_reader.get_new_lines(tuple_position)[1] is None
+
+
+def test_changes_watcher_wakes_up_only_for_watched_files(tmp_path):
+    """"""
+    str_watched = str(tmp_path / "stdout_1.txt")
+    str_other = str(tmp_path / "stdout_2.txt")
+    for str_file in (str_watched, str_other):
+        open(str_file, "w").close()
+    changes_watcher = FileChangesWatcher(str(tmp_path))
+    changes_watcher.watch_files([str_watched])
+    assert changes_watcher.is_changed(str_watched)
+    assert not changes_watcher.is_changed(str_watched)
+    with open(str_other, "a") as file_handler:
+        file_handler.write("line\n")
+    if changes_watcher.fileno() is not None:
+        assert not changes_watcher.read_events()
+    rotating_file = RotatingFile(str_watched, 10)
+    rotating_file.write("x" * 30)
+    rotating_file.flush()
+    assert changes_watcher.is_changed(str_watched)
+    rotating_file.write("y")
+    rotating_file.flush()
+    assert changes_watcher.is_changed(str_watched)
+    rotating_file.close()
+    changes_watcher.close()
+
+
+def print_line_and_finish(str_mark_file, str_how_to_finish):
+    """"""
+    print("printed at", time.time())
+    with open(str_mark_file, "w"):
+        pass
+    if str_how_to_finish == "raise":
+        raise ValueError("Function crashed")
+    if str_how_to_finish == "sleep":
+        time.sleep(60)
+    return str_how_to_finish
+
+
+def read_file(str_file):
+    """"""
+    with open(str_file) as file_handler:
+        return file_handler.read()
+
+
+@pytest.mark.parametrize("is_to_reuse_workers", [False, True])
+def test_buffered_output_is_flushed_when_process_is_over(
+        tmp_path, is_to_reuse_workers):
+    """"""
+    # Outputs are flushed not by the timer but when functions are over
+    process_manager = JupyterProcessesManager(
+        str(tmp_path / "outputs"), is_to_reuse_workers=is_to_reuse_workers,
+        int_output_buffer_bytes=1024 * 1024,
+        seconds_between_output_flushes=60.0, seconds_between_samples=None)
+    process_ok = process_manager.submit(
+        print_line_and_finish, str(tmp_path / "ok"), "return")
+    process_error = process_manager.submit(
+        print_line_and_finish, str(tmp_path / "error"), "raise")
+    process_terminated = process_manager.submit(
+        print_line_and_finish, str(tmp_path / "terminated"), "sleep")
+    assert process_ok.result(timeout=30) == "return"
+    with pytest.raises(ProcessFailedError):
+        process_error.result(timeout=30)
+    float_deadline = time.monotonic() + 30
+    while not os.path.exists(str(tmp_path / "terminated")):
+        assert time.monotonic() < float_deadline
+        time.sleep(0.05)
+    # SIGTERM is sent without asking the function to stop first
+    process_terminated.process.terminate()
+    process_manager.wait([process_terminated], timeout=30)
+    for process_obj in (process_ok, process_error, process_terminated):
+        assert "printed at" in read_file(process_obj.str_stdout_file)
+    assert "Function crashed" in read_file(process_error.str_stderr_file)
+
+
+def test_buffered_output_is_visible_within_flush_interval(tmp_path):
+    """"""
+    float_flush_seconds = 0.2
+    process_manager = JupyterProcessesManager(
+        str(tmp_path / "outputs"), int_output_buffer_bytes=1024 * 1024,
+        seconds_between_output_flushes=float_flush_seconds,
+        seconds_between_samples=None)
+    process_obj = process_manager.submit(
+        print_line_and_finish, str(tmp_path / "printed"), "sleep")
+    float_deadline = time.monotonic() + 30
+    while "printed at" not in read_file(process_obj.str_stdout_file):
+        assert time.monotonic() < float_deadline
+        time.sleep(0.02)
+    float_seen = time.time()
+    float_printed = float(read_file(process_obj.str_stdout_file).split()[-1])
+    assert process_obj.process.is_alive()
+    assert float_seen - float_printed < float_flush_seconds + 1.0
+    process_manager.terminate_all_alive_processes(timeout=1.0)
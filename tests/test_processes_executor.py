@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+from jupyter_process_manager import JupyterProcessesManager
+from jupyter_process_manager import JupyterProcessesExecutor
+from jupyter_process_manager import ProcessFailedError
+
+
+def sleep_and_return(float_seconds):
+    """"""
+    time.sleep(float_seconds)
+    return float_seconds
+
+
+def test_executor_cancels_only_queued_futures(tmp_path):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), max_workers=1, seconds_between_samples=None)
+    executor = JupyterProcessesExecutor(process_manager)
+    future_running = executor.submit(sleep_and_return, 1.0)
+    future_queued = executor.submit(sleep_and_return, 0.0)
+    future_last = executor.submit(sleep_and_return, 0.0)
+    assert future_running.running() and not future_queued.running()
+    assert not future_running.cancel()
+    assert future_queued.cancel()
+    assert future_queued.cancelled()
+    assert future_queued.process_obj.str_status == "Terminated by user"
+    assert future_running.result(timeout=30) == 1.0
+    assert future_last.result(timeout=30) == 0.0
+    assert not future_last.cancel()
+
+
+def test_executor_shutdown_cancels_queued_futures(tmp_path):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), max_workers=1, seconds_between_samples=None)
+    executor = JupyterProcessesExecutor(process_manager)
+    list_futures = [
+        executor.submit(sleep_and_return, 0.5) for _ in range(4)]
+    executor.shutdown(wait=True, cancel_futures=True)
+    assert list_futures[0].result(timeout=0) == 0.5
+    assert all(future.cancelled() for future in list_futures[1:])
+    assert not process_manager.deque_queued_processes
+
+
+def fail_for_item(int_value):
+    """"""
+    if int_value == 4:
+        raise ValueError("Item %d failed" % int_value)
+    return int_value
+
+
+def test_executor_map_gives_values_before_failed_item(tmp_path):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), max_workers=2, seconds_between_samples=None)
+    with JupyterProcessesExecutor(process_manager) as executor:
+        iterator_values = executor.map(fail_for_item, range(8), chunksize=3)
+        list_values = []
+        with pytest.raises(ProcessFailedError, match="Item 4 failed"):
+            for value in iterator_values:
+                list_values.append(value)
+        assert list_values == [0, 1, 2, 3]
+        assert list(executor.map(
+            fail_for_item, [5, 6, 7], chunksize=2, timeout=60)) == [5, 6, 7]
@@ -0,0 +1,537 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import errno
+import asyncio
+import signal
+import logging
+import threading
+import multiprocessing
+
+import numpy as np
+import pytest
+import psutil
+
+from jupyter_process_manager import JupyterProcessesManager
+from jupyter_process_manager import FIRST_COMPLETED
+from jupyter_process_manager import ChunkItemError
+from jupyter_process_manager import ProcessFailedError
+from jupyter_process_manager.class_one_process import OneProcess
+from jupyter_process_manager.class_processes_manager import \
+    DICT_STATE_BY_STATUS
+from jupyter_process_manager.class_processes_manager import LIST_STATES
+from jupyter_process_manager.class_processes_manager import _get_runtime
+from jupyter_process_manager.class_process_id_allocator import \
+    ProcessIdAllocator
+from jupyter_process_manager.function_wrapper import STR_RESULT_OK
+from jupyter_process_manager.function_wrapper import recv_result
+from jupyter_process_manager.function_wrapper import send_result
+
+
+def log_to_new_stream_handler(int_value):
+    """"""
+    logger = logging.getLogger("test_processes_manager")
+    logger.addHandler(logging.StreamHandler())
+    logger.warning("value %d", int_value)
+    return int_value
+
+
+def test_reused_worker_handlers_do_not_keep_closed_files(tmp_path):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), max_workers=1, is_to_reuse_workers=True,
+        seconds_between_samples=None)
+    list_processes = [
+        process_manager.submit(log_to_new_stream_handler, int_value)
+        for int_value in range(3)]
+    assert [process_obj.result() for process_obj in list_processes] == \
+        [0, 1, 2]
+    for process_obj in list_processes:
+        assert process_obj.get_number_of_errors() == 0
+        with open(process_obj.str_stderr_file) as file_handler:
+            assert "Logging error" not in file_handler.read()
+    process_manager.terminate_all_alive_processes()
+
+
+def sleep_and_return(float_seconds):
+    """"""
+    time.sleep(float_seconds)
+    return float_seconds
+
+
+def test_wait_returns_when_processes_are_over(tmp_path):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), seconds_between_samples=None)
+    list_processes = [
+        process_manager.submit(sleep_and_return, 0.0) for _ in range(5)]
+    list_done, list_not_done = process_manager.wait()
+    assert len(list_done) == 5 and not list_not_done
+    assert not process_manager.dict_alive_processes_by_id
+    for process_obj in list_processes:
+        assert process_obj.dt_finish_time is not None
+        assert process_obj.str_status in ("Just Finished", "Finished")
+    assert process_manager.get_number_of_processes_by_state()["finished"] == 5
+
+
+def test_wait_first_completed_and_timeout(tmp_path):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), seconds_between_samples=None)
+    process_slow = process_manager.submit(sleep_and_return, 30.0)
+    process_fast = process_manager.submit(sleep_and_return, 0.0)
+    list_done, list_not_done = process_manager.wait(
+        return_when=FIRST_COMPLETED)
+    assert list_done == [process_fast] and list_not_done == [process_slow]
+    float_start = time.monotonic()
+    for _ in range(3):
+        assert process_manager.wait([process_slow], timeout=0.1) == \
+            ([], [process_slow])
+    assert time.monotonic() - float_start < 5.0
+    # Callbacks of returned wait() calls don't pile up
+    assert not process_slow._list_done_callbacks
+    process_manager.terminate_all_alive_processes(timeout=1.0)
+    assert process_manager.wait([process_slow], timeout=10.0)[0] == \
+        [process_slow]
+
+
+@pytest.mark.parametrize("is_to_reuse_workers", [False, True])
+def test_processes_are_awaited_in_asyncio(tmp_path, is_to_reuse_workers):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), max_workers=3, is_to_reuse_workers=is_to_reuse_workers,
+        seconds_between_samples=None)
+
+    async def await_processes():
+        process_obj = process_manager.submit(sleep_and_return, 0.2)
+        float_value = await process_obj
+        list_processes = [
+            process_manager.submit(sleep_and_return, float_seconds)
+            for float_seconds in (0.6, 0.0, 0.3)]
+        list_in_order = [
+            process_obj
+            async for process_obj in process_manager.as_completed(
+                list_processes, timeout=30)]
+        list_done, list_not_done = await process_manager.wait_async(
+            list_processes, timeout=30)
+        return float_value, list_processes, list_in_order, list_done, \
+            list_not_done
+
+    float_value, list_processes, list_in_order, list_done, list_not_done = \
+        asyncio.run(await_processes())
+    assert float_value == 0.2
+    assert list_in_order == [
+        list_processes[1], list_processes[2], list_processes[0]]
+    assert list_done == list_processes and not list_not_done
+    for process_obj in list_processes:
+        assert not process_obj._list_done_callbacks
+
+
+def test_asyncio_waiting_stops_at_timeout(tmp_path):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), seconds_between_samples=None)
+    process_slow = process_manager.submit(sleep_and_return, 30.0)
+    process_fast = process_manager.submit(sleep_and_return, 0.0)
+
+    async def wait_with_timeouts():
+        with pytest.raises(TimeoutError):
+            await process_slow.result_async(timeout=0.2)
+        list_in_order = []
+        with pytest.raises(TimeoutError):
+            async for process_obj in process_manager.as_completed(
+                    [process_slow, process_fast], timeout=2.0):
+                list_in_order.append(process_obj)
+        tuple_waited = await process_manager.wait_async(
+            [process_slow, process_fast], timeout=0.2)
+        tuple_first = await process_manager.wait_async(
+            [process_slow, process_fast], return_when=FIRST_COMPLETED)
+        return list_in_order, tuple_waited, tuple_first
+
+    float_start = time.monotonic()
+    list_in_order, tuple_waited, tuple_first = \
+        asyncio.run(wait_with_timeouts())
+    assert time.monotonic() - float_start < 10.0
+    assert list_in_order == [process_fast]
+    assert tuple_waited == ([process_fast], [process_slow])
+    assert tuple_first == ([process_fast], [process_slow])
+    # Callbacks of waits which timed out don't pile up
+    assert not process_slow._list_done_callbacks
+    process_manager.terminate_all_alive_processes(timeout=1.0)
+    with pytest.raises(ProcessFailedError):
+        asyncio.run(process_slow.result_async(timeout=10.0))
+
+
+def ignore_keyboard_interrupt(is_to_ignore_sigterm):
+    """"""
+    if is_to_ignore_sigterm:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    while True:
+        try:
+            time.sleep(60)
+        except KeyboardInterrupt:
+            pass
+
+
+def test_terminate_escalates_for_processes_left_together(tmp_path):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), seconds_between_samples=None)
+    list_processes = [
+        process_manager.submit(sleep_and_return, 60.0),
+        process_manager.submit(ignore_keyboard_interrupt, False),
+        process_manager.submit(ignore_keyboard_interrupt, True),
+    ]
+    # Let functions start and set their signal handlers
+    time.sleep(1.0)
+    float_start = time.monotonic()
+    dict_outcome_by_id = process_manager.terminate_all_alive_processes(
+        timeout=1.0)
+    # Processes which are left share one deadline and are escalated together
+    assert time.monotonic() - float_start < 10.0
+    assert [
+        dict_outcome_by_id[process_obj.int_process_id]
+        for process_obj in list_processes
+    ] == ["Stopped by KeyboardInterrupt", "Stopped by SIGTERM",
+          "Killed by SIGKILL"]
+    assert not process_manager.dict_alive_processes_by_id
+    for process_obj in list_processes:
+        assert not process_obj.is_alive()
+        assert process_obj.str_status == "Terminated by user"
+
+
+def get_ids_many_times(str_dir, int_block_size, int_times):
+    """"""
+    allocator = ProcessIdAllocator(str_dir, int_block_size=int_block_size)
+    list_ids = []
+    for int_ids in range(int_times):
+        list_ids.extend(allocator.get_ids(int_ids % 3 + 1))
+    return list_ids
+
+
+def test_ids_allocator_gives_unique_ids_to_processes(tmp_path):
+    """"""
+    str_dir = str(tmp_path)
+    with multiprocessing.Pool(2) as pool:
+        list_async_results = [
+            pool.apply_async(get_ids_many_times, (str_dir, int_block_size, 300))
+            for int_block_size in (1, 5)]
+        list_ids = get_ids_many_times(str_dir, 3, 300)
+        for async_result in list_async_results:
+            list_ids.extend(async_result.get(timeout=60))
+    assert len(list_ids) == 3 * 600
+    assert len(set(list_ids)) == len(list_ids)
+
+
+def test_handles_of_finished_processes_are_closed(tmp_path):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), max_workers=4, seconds_between_samples=None)
+    list_processes = process_manager.map(sleep_and_return, [0.0] * 20)
+    list_done, _ = process_manager.wait(list_processes, timeout=60)
+    assert len(list_done) == 20
+    for process_obj in list_processes:
+        assert process_obj.process is None
+        assert process_obj.conn_results is None
+        assert not process_obj.is_alive()
+        assert process_obj.str_status == "Finished"
+        assert process_obj.get_pid() is None
+        assert process_obj.result() == 0.0
+        assert process_obj.terminate() == ""
+
+
+def test_failed_starts_do_not_leave_processes_queued(tmp_path, monkeypatch):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), max_workers=1, seconds_between_samples=None)
+    process_first = process_manager.submit(sleep_and_return, 0.5)
+    list_queued = process_manager.map(sleep_and_return, [0.0] * 3)
+    assert all(
+        process_obj.str_status == "Queued" for process_obj in list_queued)
+
+    def start_process(self, *args, **kwargs):
+        raise OSError(errno.EMFILE, "Too many open files")
+
+    monkeypatch.setattr(OneProcess, "start_process", start_process)
+    # Error of the start can't be written into STDERR file either
+    for process_obj in list_queued:
+        process_obj.str_stderr_file = str(tmp_path / "missing" / "stderr.txt")
+    list_done, list_not_done = process_manager.wait(
+        [process_first] + list_queued, timeout=30)
+    assert not list_not_done
+    assert not process_manager.deque_queued_processes
+    for process_obj in list_queued:
+        assert process_obj.str_status == "Error"
+        with pytest.raises(ProcessFailedError, match="Too many open files"):
+            process_obj.result(timeout=0)
+    assert process_manager.get_number_of_processes_by_state()["error"] == 3
+
+
+@pytest.mark.skipif(
+    not os.path.isdir("/proc/self/fd"), reason="Needs /proc/self/fd")
+@pytest.mark.parametrize("is_to_reuse_workers", [False, True])
+def test_finished_processes_do_not_keep_open_files(
+        tmp_path, is_to_reuse_workers):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), max_workers=4, is_to_reuse_workers=is_to_reuse_workers,
+        seconds_between_samples=None)
+    process_manager.wait(process_manager.map(sleep_and_return, [0.0] * 4))
+    int_open_files = len(os.listdir("/proc/self/fd"))
+    list_processes = process_manager.map(sleep_and_return, [0.0] * 40)
+    list_done, _ = process_manager.wait(list_processes, timeout=60)
+    assert len(list_done) == 40
+    if not is_to_reuse_workers:
+        for process_obj in list_processes:
+            assert process_obj._get_conn_stop_requests() is None
+    assert len(os.listdir("/proc/self/fd")) <= int_open_files + 4
+    process_manager.terminate_all_alive_processes()
+
+
+def test_no_workers_are_left_after_shutdown(tmp_path):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), max_workers=2, is_to_reuse_workers=True,
+        seconds_between_samples=None)
+    list_processes = process_manager.map(sleep_and_return, [0.0] * 4)
+    process_manager.wait(list_processes)
+    process_slow = process_manager.submit(sleep_and_return, 60.0)
+    workers_pool = process_manager.workers_pool
+    list_workers = list(workers_pool.list_workers)
+    assert len(list_workers) == 2
+    process_manager.terminate_all_alive_processes(timeout=1.0)
+    assert process_slow.str_status == "Terminated by user"
+    # Pipe to wait for the task is closed when it was waited for
+    assert process_slow.process._conn_done_reader is None
+    assert workers_pool.is_shut_down and not workers_pool.list_workers
+    for worker in list_workers:
+        assert not psutil.pid_exists(worker.int_pid)
+        assert worker.conn_tasks is None and worker.conn_stop_requests is None
+    # Manager is still usable, workers are started again when needed
+    assert process_manager.workers_pool is not workers_pool
+    assert not process_manager.workers_pool.list_workers
+    assert process_manager.submit(sleep_and_return, 0.0).result(30) == 0.0
+    process_manager.terminate_all_alive_processes()
+
+
+def raise_error():
+    """"""
+    raise ValueError("Error in the function")
+
+
+def test_table_pages_filters_and_sorts_processes(tmp_path, monkeypatch):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), max_workers=2, seconds_between_samples=None)
+    process_manager.wait(process_manager.map(sleep_and_return, [0.0] * 3))
+    process_manager.wait([process_manager.submit(raise_error)])
+    list_running = process_manager.map(sleep_and_return, [30.0] * 2)
+    process_queued = process_manager.submit(sleep_and_return, 0.0)
+    assert process_queued.str_status == "Queued"
+
+    list_rows, str_info = process_manager.get_table_with_conditions(
+        int_max_processes_to_show=3)
+    assert [list_row[1] for list_row in list_rows] == \
+        list(process_manager.dict_all_processes_by_id)[:3]
+    assert str_info == "Page 1 / 3, processes 1-3 of 7"
+    # Page after the last one shows the last page
+    list_rows, str_info = process_manager.get_table_with_conditions(
+        int_max_processes_to_show=3, int_page=5)
+    assert len(list_rows) == 1 and list_rows[0][1] == \
+        process_queued.int_process_id
+    assert str_info == "Page 3 / 3, processes 7-7 of 7"
+
+    dict_rows_number_by_filter = {
+        "all": 7, "alive": 2, "queued": 1, "finished": 4, "errors": 1,
+        "terminated": 0}
+    for str_filter, int_rows in dict_rows_number_by_filter.items():
+        list_rows, str_info = process_manager.get_table_with_conditions(
+            str_filter=str_filter)
+        assert len(list_rows) == int_rows, str_filter
+        if not int_rows:
+            assert str_info == "No processes to show for filter: terminated"
+    list_rows, _ = process_manager.get_table_with_conditions(
+        str_filter="errors")
+    assert list_rows[0][2] == "Error"
+
+    set_running_ids = {
+        process_obj.int_process_id for process_obj in list_running}
+    # Finished processes could run longer than the running ones so far
+    dt_max_finished = max(
+        _get_runtime(process_obj)
+        for process_obj in process_manager.dict_all_processes_by_id.values()
+        if process_obj.dt_finish_time is not None)
+    while min(map(_get_runtime, list_running)) <= dt_max_finished:
+        time.sleep(0.05)
+    for str_sort_by in ("memory", "runtime"):
+        list_rows, _ = process_manager.get_table_with_conditions(
+            str_sort_by=str_sort_by)
+        assert {list_row[1] for list_row in list_rows[:2]} == \
+            set_running_ids, str_sort_by
+
+    with pytest.raises(ValueError):
+        process_manager.get_table_with_conditions(int_max_processes_to_show=0)
+    with pytest.raises(ValueError):
+        process_manager.get_table_with_conditions(str_filter="unknown")
+    with pytest.raises(ValueError):
+        process_manager.get_table_with_conditions(str_sort_by="unknown")
+
+    # Rendering of the table doesn't start queued processes
+    def start_queued_processes():
+        raise AssertionError("Queue shouldn't be drained by the table")
+
+    monkeypatch.setattr(
+        process_manager, "_start_queued_processes", start_queued_processes)
+    process_manager.print_info_about_running_processes(str_filter="queued")
+    assert process_queued.str_status == "Queued"
+    monkeypatch.undo()
+    process_manager.terminate_all_alive_processes(timeout=1.0)
+
+
+def test_counters_of_states_stay_consistent_across_threads(tmp_path):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), max_workers=4, seconds_between_samples=None)
+    list_processes = process_manager.map(sleep_and_return, [0.01] * 40)
+    list_statuses = ["Running", "Just Finished", "Error", "Queued"]
+    is_to_stop = [False]
+
+    def change_statuses(int_thread):
+        while not is_to_stop[0]:
+            for int_process, process_obj in enumerate(list_processes):
+                process_obj.is_alive()
+                if int_process % 5 == int_thread:
+                    process_obj.str_status = \
+                        list_statuses[int_process % len(list_statuses)]
+
+    list_threads = [
+        threading.Thread(
+            target=change_statuses, args=(int_thread,), daemon=True)
+        for int_thread in range(5)]
+    int_switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in list_threads:
+            thread.start()
+        # Statuses are changed while processes are finished by the watcher
+        time.sleep(0.3)
+    finally:
+        # Threads are stopped first, otherwise they could starve the test
+        is_to_stop[0] = True
+        for thread in list_threads:
+            thread.join()
+        sys.setswitchinterval(int_switch_interval)
+    process_manager.terminate_all_alive_processes(timeout=1.0)
+    # Every process is counted only in the state of its status
+    dict_ids_by_state = {str_state: [] for str_state in LIST_STATES}
+    for process_obj in list_processes:
+        str_state = DICT_STATE_BY_STATUS.get(process_obj.str_status)
+        if str_state is not None:
+            dict_ids_by_state[str_state].append(process_obj.int_process_id)
+    for str_state, list_ids in dict_ids_by_state.items():
+        assert process_manager.get_process_ids_by_state(str_state) == \
+            sorted(list_ids), str_state
+
+
+def divide_or_fail(int_value, int_divisor=1):
+    """"""
+    if int_value == 4:
+        raise ValueError("Item %d failed" % int_value)
+    return int_value // int_divisor
+
+
+@pytest.mark.parametrize("is_to_reuse_workers", [False, True])
+def test_map_splits_items_into_chunks_in_order(tmp_path, is_to_reuse_workers):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), max_workers=2, is_to_reuse_workers=is_to_reuse_workers,
+        seconds_between_samples=None)
+    list_processes = process_manager.map(divide_or_fail, range(8), chunksize=3)
+    list_star_processes = process_manager.starmap(
+        divide_or_fail, [(int_value, 2) for int_value in range(5)])
+    process_manager.wait(timeout=60)
+    assert len(list_processes) == 3 and len(list_star_processes) == 5
+    assert list_processes[0].result(timeout=0) == [0, 1, 2]
+    assert list_processes[2].result(timeout=0) == [6, 7]
+    # Error of one item doesn't hide values of other items of the chunk
+    list_values = list_processes[1].result(timeout=0)
+    assert list_values[0] == 3 and list_values[2] == 5
+    assert isinstance(list_values[1], ChunkItemError)
+    assert "Item 4 failed" in list_values[1].str_traceback
+    assert list_processes[1].str_status == "Error"
+    assert list_processes[0].str_status in ("Just Finished", "Finished")
+    # Without chunks every process gives the value of one item
+    assert [
+        process_obj.result(timeout=0)
+        for process_obj in list_star_processes[:4]] == [0, 0, 1, 1]
+    with pytest.raises(ProcessFailedError, match="Item 4 failed"):
+        list_star_processes[4].result(timeout=0)
+    dict_results = process_manager.results()
+    assert list(dict_results) == [
+        process_obj.int_process_id
+        for process_obj in list_processes + list_star_processes[:4]]
+
+
+def make_big_result(int_items):
+    """"""
+    return {
+        "array": np.arange(int_items, dtype=np.float64),
+        "bytearray": bytearray(b"x" * int_items),
+    }
+
+
+def test_big_result_is_sent_with_out_of_band_buffers():
+    """"""
+    conn_reader, conn_writer = multiprocessing.Pipe(duplex=False)
+    dict_result = make_big_result(2 * 1024 * 1024)
+    # Big result fills the pipe, so it's sent while it's being received
+    thread_sender = threading.Thread(
+        target=send_result, args=(conn_writer, (STR_RESULT_OK, dict_result)))
+    thread_sender.start()
+    str_state, dict_received = recv_result(conn_reader)
+    thread_sender.join()
+    assert str_state == STR_RESULT_OK
+    assert np.array_equal(dict_received["array"], dict_result["array"])
+    assert dict_received["bytearray"] == dict_result["bytearray"]
+    # Array uses the received buffer without copying it
+    assert not dict_received["array"].flags.owndata
+
+
+@pytest.mark.parametrize("is_to_reuse_workers", [False, True])
+def test_big_result_is_received_from_process(tmp_path, is_to_reuse_workers):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), is_to_reuse_workers=is_to_reuse_workers,
+        seconds_between_samples=None)
+    process_obj = process_manager.submit(make_big_result, 4 * 1024 * 1024)
+    dict_result = process_obj.result(timeout=60)
+    assert np.array_equal(
+        dict_result["array"], np.arange(4 * 1024 * 1024, dtype=np.float64))
+    assert dict_result["bytearray"] == bytearray(b"x" * 4 * 1024 * 1024)
+    assert process_obj.str_status in ("Just Finished", "Finished")
+
+
+def exit_without_result():
+    """"""
+    os._exit(3)
+
+
+@pytest.mark.parametrize("is_to_reuse_workers", [False, True])
+def test_process_dead_before_sending_result_has_no_result(
+        tmp_path, is_to_reuse_workers):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), is_to_reuse_workers=is_to_reuse_workers,
+        seconds_between_samples=None)
+    float_start = time.monotonic()
+    process_obj = process_manager.submit(exit_without_result)
+    with pytest.raises(ProcessFailedError, match="without result"):
+        process_obj.result(timeout=30)
+    assert time.monotonic() - float_start < 10.0
+    assert process_obj.is_result_ready() and process_obj._tuple_result is None
+    assert process_obj.dt_finish_time is not None
+    assert not process_manager.dict_alive_processes_by_id
+    # Pool replaces dead worker, so next functions still get results
+    assert process_manager.submit(sleep_and_return, 0.0).result(
+        timeout=30) == 0.0
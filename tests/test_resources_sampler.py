@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+import subprocess
+
+import psutil
+import pytest
+
+from jupyter_process_manager import JupyterProcessesManager
+from jupyter_process_manager.class_resources_sampler import ResourcesHistory
+from jupyter_process_manager.class_resources_sampler import ResourcesSampler
+from jupyter_process_manager.class_resources_sampler import STR_SPARKLINE_CHARS
+from jupyter_process_manager.class_resources_sampler import get_ram_metric
+from jupyter_process_manager.class_resources_sampler import get_ram_usage
+from jupyter_process_manager.class_resources_sampler import get_sparkline_str
+
+
+def sleep_and_return(float_seconds):
+    """"""
+    time.sleep(float_seconds)
+    return float_seconds
+
+
+def test_history_keeps_last_samples_and_peaks():
+    """"""
+    history = ResourcesHistory(3)
+    for int_sample, int_rss in enumerate([5, 50, 7, 8, 9]):
+        history.add_sample(float(int_sample), {"rss": int_rss, "uss": 1})
+    assert len(history) == 3
+    assert history.get_values("rss") == [7.0, 8.0, 9.0]
+    assert history.get_last("rss") == 9.0
+    # Peak is kept for the whole life of the process, not only for samples
+    assert history.get_peak("rss") == 50.0
+    # Metrics which weren't measured are saved as zeros
+    assert history.get_values("pss") == [0.0, 0.0, 0.0]
+    assert get_ram_metric(history) == "uss"
+
+
+def test_sparkline_shows_values_relative_to_min_and_max():
+    """"""
+    assert get_sparkline_str([]) == ""
+    assert get_sparkline_str([3.0] * 4) == STR_SPARKLINE_CHARS[0] * 4
+    str_sparkline = get_sparkline_str([0.0, 7.0, 14.0])
+    assert str_sparkline == (
+        STR_SPARKLINE_CHARS[0] + STR_SPARKLINE_CHARS[4] +
+        STR_SPARKLINE_CHARS[-1])
+    assert len(get_sparkline_str(list(range(100)), int_width=20)) == 20
+
+
+def test_history_is_saved_in_background_and_dropped_with_process(tmp_path):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), seconds_between_samples=0.05)
+    process_obj = process_manager.submit(sleep_and_return, 1.0)
+    process_obj.result(timeout=30)
+    int_process_id = process_obj.int_process_id
+    history = process_manager.resources_sampler.get_history(int_process_id)
+    assert history is not None and len(history) >= 2
+    str_metric = get_ram_metric(history)
+    assert history.get_peak(str_metric) > 0
+    assert history.get_peak(str_metric) >= max(history.get_values(str_metric))
+    process_manager.remove_process(int_process_id)
+    assert process_manager.resources_sampler.get_history(int_process_id) is None
+
+
+STR_START_CHILDREN = (
+    "import subprocess, sys, time\n"
+    "list_children = [\n"
+    "    subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+    "    for _ in range(2)]\n"
+    "time.sleep(60)\n"
+)
+
+
+def test_ram_of_process_tree_is_summed_without_shared_pages():
+    """"""
+    popen_parent = subprocess.Popen([sys.executable, "-c", STR_START_CHILDREN])
+    try:
+        psutil_parent = psutil.Process(popen_parent.pid)
+        float_deadline = time.monotonic() + 30
+        while len(psutil_parent.children()) < 2:
+            assert time.monotonic() < float_deadline
+            time.sleep(0.1)
+        list_pids = [popen_parent.pid] + [
+            psutil_child.pid for psutil_child in psutil_parent.children()]
+        resources_sampler = ResourcesSampler()
+        dict_usage = resources_sampler.sample_process_tree(
+            popen_parent.pid, is_full_info=True)
+        dict_usage_by_pid = resources_sampler.sample(
+            list_pids, is_full_info=True, is_with_children=False)
+        # One system scan for many processes gives the same tree
+        dict_usage_scanned = resources_sampler.sample(
+            [popen_parent.pid], is_full_info=True)[popen_parent.pid]
+        resources_sampler.sample([popen_parent.pid], is_with_children=False)
+        resources_sampler.sample_process_tree(list_pids[1])
+        # Handles of other processes are kept for measuring their CPU usage
+        assert popen_parent.pid in \
+            resources_sampler._dict_psutil_process_by_pid
+    finally:
+        for psutil_process in psutil_parent.children(recursive=True):
+            psutil_process.kill()
+        popen_parent.kill()
+        popen_parent.wait()
+    assert dict_usage["num_processes"] == 3
+    assert dict_usage_scanned["num_processes"] == 3
+    for str_metric in ("rss", "uss", "pss"):
+        if str_metric not in dict_usage:
+            continue
+        float_sum = sum(
+            dict_usage_by_pid[int_pid][str_metric] for int_pid in list_pids)
+        assert dict_usage[str_metric] == pytest.approx(float_sum, rel=0.2)
+    # Pages shared by processes of the tree are counted once
+    assert get_ram_usage(dict_usage) < dict_usage["rss"]
+    assert get_ram_usage(dict_usage) == \
+        (dict_usage.get("pss") or dict_usage["uss"])
+
+
+def test_memory_of_process_is_measured_with_sampler_of_manager(tmp_path):
+    """"""
+    process_manager = JupyterProcessesManager(str(tmp_path))
+    process_obj = process_manager.submit(sleep_and_return, 5.0)
+    time.sleep(0.5)
+    assert process_obj.resources_sampler is process_manager.resources_sampler
+    assert process_obj.get_mem_usage().endswith("Mb")
+    process_manager.terminate_all_alive_processes(timeout=1.0)
+    assert process_obj.get_mem_usage() == "None"
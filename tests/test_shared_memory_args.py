@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import errno
+import hashlib
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from jupyter_process_manager import JupyterProcessesManager
+from jupyter_process_manager import ProcessFailedError
+from jupyter_process_manager.class_one_process import OneProcess
+
+
+def describe_args(array, bytes_data):
+    """"""
+    return (
+        type(array).__name__,
+        float(array.sum()),
+        type(bytes_data).__name__,
+        hashlib.sha1(bytes_data).hexdigest(),
+    )
+
+
+def record_shared_names(process_manager):
+    """"""
+    list_names = []
+    func_share_args = process_manager.shared_memory_args.share_args
+
+    def share_args(args, kwargs):
+        new_args, new_kwargs, list_new_names = func_share_args(args, kwargs)
+        list_names.extend(list_new_names)
+        return new_args, new_kwargs, list_new_names
+
+    process_manager.shared_memory_args.share_args = share_args
+    return list_names
+
+
+def assert_segments_are_unlinked(process_manager, list_names):
+    """"""
+    assert not process_manager.shared_memory_args._dict_obj_id_by_name
+    for str_name in list_names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=str_name)
+
+
+def test_big_args_are_shared_once_and_unlinked_when_processes_are_over(
+        tmp_path):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), is_to_share_big_args=True, int_min_bytes_to_share=1024,
+        seconds_between_samples=None)
+    list_names = record_shared_names(process_manager)
+    array = np.arange(100000, dtype=np.float64)
+    bytes_data = bytes(range(256)) * 100
+    list_processes = [
+        process_manager.submit(describe_args, array, bytes_data)
+        for _ in range(3)]
+    process_manager.wait(list_processes, timeout=60)
+    for process_obj in list_processes:
+        assert process_obj.result(timeout=0) == (
+            "ndarray", float(array.sum()), "memoryview",
+            hashlib.sha1(bytes_data).hexdigest())
+    # The same objects given to many processes are copied only once
+    assert len(set(list_names)) == 2 and len(list_names) == 6
+    assert_segments_are_unlinked(process_manager, list_names)
+
+
+def test_shared_args_are_unlinked_when_start_fails(tmp_path, monkeypatch):
+    """"""
+    process_manager = JupyterProcessesManager(
+        str(tmp_path), is_to_share_big_args=True, int_min_bytes_to_share=1024,
+        seconds_between_samples=None)
+    list_names = record_shared_names(process_manager)
+
+    def start_process(self, *args, **kwargs):
+        raise OSError(errno.EMFILE, "Too many open files")
+
+    monkeypatch.setattr(OneProcess, "start_process", start_process)
+    process_obj = process_manager.submit(
+        describe_args, np.ones(10000), b"x" * 10000)
+    process_manager.wait([process_obj], timeout=30)
+    with pytest.raises(ProcessFailedError):
+        process_obj.result(timeout=0)
+    assert len(list_names) == 2
+    assert_segments_are_unlinked(process_manager, list_names)